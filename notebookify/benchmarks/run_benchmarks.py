@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""
+Benchmarks for notebook conversion and batch processing.
+
+Measures single-notebook latency and peak memory of `MarkdownConverter.convert`
+and the throughput of `process_batch_notebooks` over a synthetic tree, with
+uploads going to the fake Drive server from the tests. Results are written as
+JSON; `--compare` checks them against an earlier run:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --output after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+import nbformat  # noqa: E402
+import assets  # noqa: E402
+import drive  # noqa: E402
+import utils  # noqa: E402
+from fake_drive import FakeDrive, FOLDER_MIME_TYPE  # noqa: E402
+from markdown_converter import (  # noqa: E402
+    MarkdownConverter,
+    process_batch_notebooks,
+)
+from profiler import enable_profiling, percentile  # noqa: E402
+from scheduler import configure_scheduler  # noqa: E402
+from synthetic import DEFAULT_MIME_MIX, generate_notebook, write_tree  # noqa
+
+TEMPLATE_DIR = os.path.join(ROOT, "templates")
+
+# Metrics checked by --compare, and whether larger values are better.
+COMPARED_METRICS = {
+    "single.seconds.p50": False,
+    "single.peak_memory_bytes": False,
+    "batch.notebooks_per_second": True,
+    "batch.peak_rss_bytes": False,
+}
+DEFAULT_THRESHOLD = 0.10
+
+
+def _folder_size(path):
+    return sum(
+        os.path.getsize(os.path.join(folder, name))
+        for folder, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def _peak_rss():
+    """Peak resident memory of this process and its children, in bytes."""
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_single(workdir, runs, notebook_options):
+    """
+    Converts one notebook `runs` times into fresh output folders, after a
+    warm-up run, and once more under tracemalloc for its peak memory.
+    """
+    notebook_path = os.path.join(workdir, "single.ipynb")
+    with open(notebook_path, "w", encoding="utf-8") as f:
+        nbformat.write(generate_notebook(**notebook_options), f)
+    converter = MarkdownConverter(TEMPLATE_DIR)
+
+    def convert(run):
+        output_dir = os.path.join(workdir, f"single_{run}")
+        # Forget assets written by earlier runs so every run writes them.
+        assets._known_assets.clear()
+        converter.convert(notebook_path, os.path.join(output_dir, "out.md"))
+        return output_dir
+
+    shutil.rmtree(convert("warmup"))
+    timings = []
+    for run in range(runs):
+        started = time.perf_counter()
+        output_dir = convert(run)
+        timings.append(time.perf_counter() - started)
+        output_bytes = _folder_size(output_dir)
+        shutil.rmtree(output_dir)
+
+    tracemalloc.start()
+    try:
+        shutil.rmtree(convert("traced"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": runs,
+        "notebook_bytes": os.path.getsize(notebook_path),
+        "output_bytes": output_bytes,
+        "seconds": {
+            "min": round(min(timings), 6),
+            "p50": round(percentile(timings, 0.5), 6),
+            "p95": round(percentile(timings, 0.95), 6),
+            "mean": round(sum(timings) / len(timings), 6),
+        },
+        "peak_memory_bytes": peak,
+    }
+
+
+def bench_batch(workdir, notebooks, depth, fanout, jobs, upload, options):
+    """
+    Converts a synthetic tree with `process_batch_notebooks`, uploading to a
+    fake Drive server unless `upload` is false.
+    """
+    tree = os.path.join(workdir, "tree")
+    paths = write_tree(tree, notebooks, depth, fanout, **options)
+    input_bytes = sum(os.path.getsize(p) for p in paths)
+    assets._known_assets.clear()
+
+    with contextlib.ExitStack() as stack:
+        service_factory = None
+        server = None
+        if upload:
+            server = stack.enter_context(FakeDrive())
+            # Keep Drive metadata out of the real metadata database, and let
+            # the local server take calls as fast as they come.
+            metadata_path = os.path.join(workdir, "drive_metadata.json")
+            stack.callback(
+                setattr, utils, "get_metadata_path", utils.get_metadata_path
+            )
+            stack.callback(configure_scheduler)
+            utils.get_metadata_path = lambda: metadata_path
+            drive._folder_cache = None
+            root = server.add_file("root", mime_type=FOLDER_MIME_TYPE)
+            drive.get_folder_cache().set("root_folder_id", root["id"])
+            configure_scheduler(rate=1e6, burst=10**6)
+            url = server.url
+            service_factory = lambda: drive.build_drive_service(  # noqa
+                api_endpoint=url
+            )
+
+        profiler = enable_profiling()
+        started = time.perf_counter()
+        summary = process_batch_notebooks(
+            paths,
+            None,
+            TEMPLATE_DIR,
+            service_factory=service_factory,
+            jobs=jobs,
+            force=True,
+            converter_options={},
+            sync_folders=upload,
+        )
+        elapsed = time.perf_counter() - started
+        report = profiler.report()
+        enable_profiling(False)
+        api_calls = server.count() if server else 0
+        drive._folder_cache = None
+
+    return {
+        "notebooks": notebooks,
+        "failed": len(summary.failed),
+        "jobs": jobs,
+        "upload": upload,
+        "input_bytes": input_bytes,
+        "seconds": round(elapsed, 6),
+        "notebooks_per_second": round(notebooks / elapsed, 4),
+        "megabytes_per_second": round(input_bytes / elapsed / 2**20, 4),
+        "drive_requests": api_calls,
+        "peak_rss_bytes": _peak_rss(),
+        "profile": report,
+    }
+
+
+def _lookup(results, path):
+    value = results.get("results", {})
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Prints each compared metric with its relative change. Returns the
+    metrics that got worse by more than `threshold`.
+    """
+    regressions = []
+    print(f"Compared with {baseline.get('commit') or 'baseline'}:")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        before = _lookup(baseline, metric)
+        after = _lookup(current, metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(
+            f"  {metric:<30} {before:>14g} -> {after:<14g} {change:+.1%}{flag}"
+        )
+    return regressions
+
+
+def run(args):
+    notebook_options = {
+        "cells": args.cells,
+        "outputs_per_cell": args.outputs_per_cell,
+        "output_bytes": args.output_bytes,
+        "images": args.images,
+        "image_side": args.image_side,
+        "mime_mix": json.loads(args.mime_mix) if args.mime_mix else None,
+    }
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="notebookify-bench-")
+    quiet = (
+        contextlib.nullcontext()
+        if args.verbose
+        else contextlib.redirect_stdout(open(os.devnull, "w"))
+    )
+    try:
+        with quiet:
+            if "single" in args.scenarios:
+                results["single"] = bench_single(
+                    workdir, args.runs, notebook_options
+                )
+            if "batch" in args.scenarios:
+                results["batch"] = bench_batch(
+                    workdir,
+                    args.notebooks,
+                    args.depth,
+                    args.fanout,
+                    args.jobs,
+                    not args.no_upload,
+                    notebook_options,
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": dict(
+            notebook_options,
+            mime_mix=notebook_options["mime_mix"] or DEFAULT_MIME_MIX,
+            runs=args.runs,
+            notebooks=args.notebooks,
+            depth=args.depth,
+            fanout=args.fanout,
+            jobs=args.jobs,
+        ),
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown reported as a regression (default 0.10)",
+    )
+    parser.add_argument(
+        "--scenarios",
+        default="single,batch",
+        type=lambda value: value.split(","),
+    )
+    parser.add_argument("--cells", type=int, default=200)
+    parser.add_argument("--outputs-per-cell", type=int, default=1)
+    parser.add_argument("--output-bytes", type=int, default=1024)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--image-side", type=int, default=128)
+    parser.add_argument(
+        "--mime-mix", help='JSON shares per type, e.g. {"stream": 1}'
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--notebooks", type=int, default=40)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=2)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--no-upload", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Synthetic notebooks and notebook trees for benchmarks.
+"""
+
+import base64
+import os
+import random
+
+import nbformat
+import numpy as np
+
+from plotly_svg import encode_png
+
+# Share of outputs per MIME type; "stream" and "error" are output types.
+DEFAULT_MIME_MIX = {
+    "text/plain": 0.4,
+    "stream": 0.3,
+    "text/html": 0.15,
+    "image/png": 0.1,
+    "application/vnd.plotly.v1+json": 0.05,
+}
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def _text(rng, size):
+    """About `size` bytes of word-like text."""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def _png(rng, side):
+    """A noisy `side` x `side` PNG, unique per call so it is not deduplicated."""
+    pixels = np.random.default_rng(rng.getrandbits(32)).integers(
+        0, 256, (side, side, 3), dtype=np.uint8
+    )
+    return base64.b64encode(encode_png(pixels)).decode("ascii")
+
+
+def _figure(rng, points):
+    x = np.arange(points)
+    y = np.cumsum(
+        np.random.default_rng(rng.getrandbits(32)).normal(size=points)
+    )
+    return {
+        "data": [{"type": "scatter", "x": x.tolist(), "y": y.tolist()}],
+        "layout": {"title": {"text": "Synthetic"}},
+    }
+
+
+def _output(rng, kind, output_bytes, image_side):
+    if kind == "stream":
+        return nbformat.v4.new_output(
+            "stream", name="stdout", text=_text(rng, output_bytes)
+        )
+    if kind == "error":
+        return nbformat.v4.new_output(
+            "error",
+            ename="ValueError",
+            evalue="synthetic",
+            traceback=[
+                _text(rng, 80) for _ in range(max(1, output_bytes // 80))
+            ],
+        )
+    if kind == "image/png":
+        data = {"image/png": _png(rng, image_side), "text/plain": "<Figure>"}
+        return nbformat.v4.new_output("display_data", data=data)
+    if kind == "application/vnd.plotly.v1+json":
+        data = {kind: _figure(rng, max(2, output_bytes // 16))}
+        return nbformat.v4.new_output("display_data", data=data)
+    if kind == "text/html":
+        data = {
+            kind: f"<p>{_text(rng, output_bytes)}</p>",
+            "text/plain": "<HTML>",
+        }
+        return nbformat.v4.new_output("display_data", data=data)
+    return nbformat.v4.new_output(
+        "execute_result",
+        data={"text/plain": _text(rng, output_bytes)},
+        execution_count=1,
+    )
+
+
+def generate_notebook(
+    cells=50,
+    outputs_per_cell=1,
+    output_bytes=512,
+    images=0,
+    image_side=64,
+    mime_mix=None,
+    markdown_ratio=0.3,
+    seed=0,
+):
+    """
+    Builds a notebook with a controlled shape.
+
+    Args:
+        cells (int): Number of cells.
+        outputs_per_cell (int): Outputs on each code cell.
+        output_bytes (int): Approximate size of each text output.
+        images (int): PNG outputs added on top of `mime_mix`, spread evenly
+            over the code cells.
+        image_side (int): Width and height of generated PNGs in pixels.
+        mime_mix (dict, optional): Share of outputs per MIME or output type
+            (see DEFAULT_MIME_MIX).
+        markdown_ratio (float): Share of Markdown cells.
+        seed (int): Seed, so the same arguments produce the same notebook.
+
+    Returns:
+        NotebookNode: The notebook.
+    """
+    rng = random.Random(seed)
+    mix = mime_mix or DEFAULT_MIME_MIX
+    kinds, weights = list(mix), list(mix.values())
+    notebook = nbformat.v4.new_notebook()
+    code_cells = []
+    for index in range(cells):
+        if rng.random() < markdown_ratio:
+            notebook.cells.append(
+                nbformat.v4.new_markdown_cell(
+                    f"## Section {index}\n\n{_text(rng, 200)}"
+                )
+            )
+            continue
+        outputs = [
+            _output(rng, kind, output_bytes, image_side)
+            for kind in rng.choices(kinds, weights, k=outputs_per_cell)
+        ]
+        cell = nbformat.v4.new_code_cell(
+            f"result_{index} = compute({index})", outputs=outputs
+        )
+        notebook.cells.append(cell)
+        code_cells.append(cell)
+    for index in range(images if code_cells else 0):
+        cell = code_cells[index * len(code_cells) // images]
+        cell.outputs.append(_output(rng, "image/png", 0, image_side))
+    return notebook
+
+
+def write_tree(root, notebooks=20, depth=3, fanout=2, **notebook_options):
+    """
+    Writes `notebooks` synthetic notebooks spread over a directory tree
+    `depth` levels deep with `fanout` subdirectories per level, below a
+    ``.git`` root so uploads mirror the tree on Drive.
+
+    Returns:
+        list: Paths of the notebooks written.
+    """
+    os.makedirs(os.path.join(root, ".git"), exist_ok=True)
+    leaves = [root]
+    for level in range(depth):
+        leaves = [
+            os.path.join(parent, f"level{level}_{branch}")
+            for parent in leaves
+            for branch in range(fanout)
+        ]
+    seed = notebook_options.pop("seed", 0)
+    paths = []
+    for index in range(notebooks):
+        folder = leaves[index % len(leaves)]
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"notebook_{index}.ipynb")
+        notebook = generate_notebook(seed=seed + index, **notebook_options)
+        with open(path, "w", encoding="utf-8") as f:
+            nbformat.write(notebook, f)
+        paths.append(path)
+    return paths
@@ -7,12 +7,23 @@ setup(
     package_dir={"": "src"},
     include_package_data=True,  # Ensures static files like templates are included
     install_requires=[
-        "nbconvert",
         "nbformat",
         "jinja2",
-        "plotly",
-        "selenium",
+        "colorama",
+        "numpy",
     ],
+    # Google Drive uploads, browser snapshots and Pillow-based image resizing
+    # are optional and imported only when used, so conversion-only installs
+    # stay small and fast.
+    extras_require={
+        "drive": [
+            "google-api-python-client",
+            "google-auth",
+            "google-auth-httplib2",
+        ],
+        "browser": ["selenium"],
+        "images": ["Pillow"],
+    },
     package_data={
         "": ["../templates/*.jinja2"],  # Ensure templates are included
     },
@@ -0,0 +1,162 @@
+import base64
+import hashlib
+import os
+import tempfile
+
+from utils import safe_create_folder, file_mode
+from profiler import get_profiler
+from logger import log_message, ERROR
+
+ASSETS_DIR = "images"
+
+# Binary image outputs that are extracted to files, with their extensions.
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+}
+
+# Asset paths known to exist on disk, shared by every writer in the process so
+# repeated plots across a batch are only checked and written once.
+_known_assets = set()
+
+
+def forget_known_assets():
+    """
+    Clears the known-asset set, so files deleted since they were written
+    are written again. Long-running processes call this between jobs.
+    """
+    _known_assets.clear()
+
+
+def content_hash(payload):
+    """Short content hash used to name asset files."""
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class AssetWriter:
+    """
+    Writes notebook outputs to content-addressed files next to the Markdown.
+
+    Each payload is stored as ``<assets_dir>/<sha256 prefix>.<ext>``, so identical
+    images are written once no matter how many cells or notebooks produce them.
+    With an `optimizer` (see image_optimizer), images it handles are written
+    optimized once `wait` is called.
+    """
+
+    def __init__(self, output_dir, assets_dir=ASSETS_DIR, optimizer=None):
+        self.assets_dir = assets_dir
+        self.optimizer = optimizer
+        self.root = os.path.join(output_dir or ".", assets_dir)
+        self.written = 0
+        self.reused = 0
+        self.failed = 0
+        self._root_ready = False
+        self._pending = {}
+
+    def write_base64(self, data, extension):
+        """
+        Decodes a base64 output payload and stores it. Returns the file name.
+        """
+        if isinstance(data, list):
+            data = "".join(data)
+        return self.write_bytes(base64.b64decode(data), extension)
+
+    def write_bytes(self, payload, extension):
+        """
+        Stores raw bytes under their content hash. Returns the file name.
+        """
+        if self.optimizer is not None and self.optimizer.handles(extension):
+            return self.optimizer.write(self, payload, extension)
+        name = f"{content_hash(payload)}.{extension}"
+        path = os.path.join(self.root, name)
+        if path in _known_assets or os.path.exists(path):
+            self.reused += 1
+            get_profiler().count("assets", label="reused")
+        else:
+            self._write_atomic(path, payload)
+            self.written += 1
+            get_profiler().count("assets", label="written")
+            get_profiler().count("bytes_written", len(payload))
+        _known_assets.add(path)
+        return name
+
+    def write_deferred(self, key, extension, render):
+        """
+        Stores an asset that is rendered asynchronously, such as a browser
+        snapshot. The file is named after `key` (the source data) so its name
+        is known before rendering finishes.
+
+        Args:
+            key (bytes): Content identifying the asset.
+            extension (str): File extension of the rendered asset.
+            render (callable): Called with a temporary path to render to;
+                returns a Future that completes once the file is written.
+
+        Returns:
+            str: The file name. Call `wait` before publishing references.
+        """
+        name = f"{content_hash(key)}.{extension}"
+        path = os.path.join(self.root, name)
+        if path in self._pending:
+            return name
+        if path in _known_assets or os.path.exists(path):
+            self.reused += 1
+            _known_assets.add(path)
+            return name
+        self._ensure_root()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.root, suffix=f".tmp.{extension}"
+        )
+        os.close(fd)
+        self._pending[path] = (render(tmp_path), tmp_path)
+        return name
+
+    def wait(self):
+        """
+        Waits for deferred assets and moves each into place. Failed renders
+        are logged and counted in `failed`.
+        """
+        pending, self._pending = self._pending, {}
+        for path, (future, tmp_path) in pending.items():
+            try:
+                future.result()
+                os.chmod(tmp_path, file_mode(path))
+                os.replace(tmp_path, path)
+            except Exception as e:
+                self.failed += 1
+                log_message(ERROR, f"Could not render asset {path}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                continue
+            _known_assets.add(path)
+            self.written += 1
+
+    def exists(self, name):
+        """Whether an asset is present in this writer's folder."""
+        path = os.path.join(self.root, name)
+        return path in _known_assets or os.path.exists(path)
+
+    def relpath(self, name):
+        """Path of an asset as referenced from the Markdown file."""
+        return f"{self.assets_dir}/{name}"
+
+    def _ensure_root(self):
+        if not self._root_ready:
+            safe_create_folder(self.root)
+            self._root_ready = True
+
+    def _write_atomic(self, path, payload):
+        # Parallel workers may extract the same image; writing to a temporary
+        # file and renaming keeps readers from seeing partial files.
+        self._ensure_root()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.chmod(tmp_path, file_mode(path))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
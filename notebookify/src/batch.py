@@ -0,0 +1,416 @@
+import itertools
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from threading import Lock
+
+from markdown_converter import get_converter, options_salt, CONVERTER_VERSION
+from manifest import CURRENT, NEEDS_UPLOAD, template_hash
+from profiler import get_profiler, enable_profiling
+from logger import (
+    log_message,
+    configure_logging,
+    flush_logs,
+    logging_config,
+    DEBUG,
+    INFO,
+    WARNING,
+    ERROR,
+)
+
+# Notebooks whose Drive folders are resolved per batch of metadata calls
+# when folders are not synced up front.
+PREPARE_CHUNK = 256
+
+
+class NotebookResult:
+    """
+    Outcome of converting (and optionally uploading) a single notebook.
+    """
+
+    def __init__(self, notebook_path, output_path):
+        self.notebook_path = notebook_path
+        self.output_path = output_path
+        self.status = "pending"
+        self.stage = None
+        self.error = None
+        self.drive_file_id = None
+        self.convert_seconds = 0.0
+        self.upload_seconds = 0.0
+
+    def fail(self, stage, error):
+        self.status = "failed"
+        self.stage = stage
+        self.error = str(error)
+
+    def as_dict(self):
+        return {
+            "notebook_path": self.notebook_path,
+            "output_path": self.output_path,
+            "status": self.status,
+            "stage": self.stage,
+            "error": self.error,
+            "drive_file_id": self.drive_file_id,
+            "convert_seconds": round(self.convert_seconds, 4),
+            "upload_seconds": round(self.upload_seconds, 4),
+        }
+
+
+class BatchSummary:
+    """
+    Collects per-notebook results for a batch run.
+    """
+
+    def __init__(self):
+        self.results = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._lock = Lock()
+
+    def add(self, result):
+        with self._lock:
+            self.results.append(result)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def failed(self):
+        return [r for r in self.results if r.status == "failed"]
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.status != "failed"]
+
+    @property
+    def skipped(self):
+        return [r for r in self.results if r.status == "skipped"]
+
+    def as_dict(self):
+        return {
+            "total": len(self.results),
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "skipped": len(self.skipped),
+            "elapsed_seconds": round(self.elapsed, 4),
+            "results": [r.as_dict() for r in self.results],
+        }
+
+    def log(self):
+        """
+        Logs a one-line overview followed by every failed notebook.
+        """
+        log_message(
+            INFO,
+            f"Batch complete: {len(self.succeeded)} succeeded "
+            f"({len(self.skipped)} up to date), {len(self.failed)} failed "
+            f"in {self.elapsed:.1f}s.",
+        )
+        for result in self.failed:
+            log_message(
+                ERROR,
+                f"{result.notebook_path} failed during {result.stage}: "
+                f"{result.error}",
+            )
+
+
+class _InlineExecutor:
+    """
+    Executor stand-in that runs work in the calling process (``--jobs 1``).
+    """
+
+    def __init__(self, initializer=None, initargs=()):
+        if initializer:
+            initializer(*initargs)
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+_worker_converter = None
+
+
+def _init_worker(template_dir, converter_options, profile=False, logging=None):
+    """
+    Sets up the worker's shared converter, so the Jinja environment and its
+    compiled templates are reused for every notebook. `logging` carries the
+    parent's `logging_config()` to spawned workers.
+    """
+    global _worker_converter
+    if logging is not None:
+        configure_logging(**logging)
+    if profile:
+        # Forked workers inherit the parent's samples; start from scratch.
+        enable_profiling()
+    _worker_converter = get_converter(template_dir, **converter_options)
+
+
+def _convert_in_worker(notebook_path, output_path, template_name):
+    """
+    Converts a notebook inside a worker and reports errors as plain strings,
+    since arbitrary exceptions are not guaranteed to pickle. With profiling,
+    the worker's timings and counters are returned for the parent to merge.
+    """
+    start = time.perf_counter()
+    try:
+        _worker_converter.convert(notebook_path, output_path, template_name)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    # Pool workers exit without running atexit handlers.
+    flush_logs()
+    profiler = get_profiler()
+    profile = profiler.drain() if profiler.enabled else None
+    return error, time.perf_counter() - start, profile
+
+
+def get_output_path(notebook_path, output_dir=None):
+    """
+    Maps a notebook to its Markdown file, next to it unless `output_dir` is set.
+    """
+    return os.path.join(
+        output_dir or os.path.dirname(notebook_path),
+        os.path.basename(notebook_path).replace(".ipynb", ".md"),
+    )
+
+
+def _prepared(notebook_paths, output_dir, uploads, sync_folders):
+    """
+    Yields `notebook_paths` after resolving the Drive folders of their
+    outputs with batched metadata calls. Syncing folders lists the whole
+    tree once and needs every destination up front; otherwise paths are
+    prepared in chunks, so streamed discovery is never held in full.
+    """
+    profiler = get_profiler()
+    notebook_paths = iter(notebook_paths)
+    size = None if sync_folders else PREPARE_CHUNK
+    while True:
+        chunk = list(itertools.islice(notebook_paths, size))
+        if not chunk:
+            return
+        try:
+            with profiler.stage("drive_folders"):
+                uploads.prepare(
+                    [get_output_path(path, output_dir) for path in chunk],
+                    sync_folders=sync_folders,
+                )
+        except Exception as e:
+            # Each upload still resolves its own folders.
+            log_message(WARNING, f"Could not prepare Drive folders: {e}")
+        yield from chunk
+
+
+def run_batch(
+    notebook_paths,
+    output_dir,
+    template_dir,
+    drive_service=None,
+    refresh=False,
+    jobs=None,
+    upload_workers=None,
+    max_pending_uploads=None,
+    manifest=None,
+    template_name="template.jinja2",
+    converter_options=None,
+    sync_folders=False,
+    service_factory=None,
+):
+    """
+    Converts notebooks in a process pool and feeds finished Markdown files to a
+    bounded upload stage.
+
+    Args:
+        notebook_paths (iterable): Paths to Jupyter notebooks to process.
+        output_dir (str): Directory for Markdown files, or None to write each
+            file next to its notebook.
+        template_dir (str): Directory containing Jinja2 templates.
+        drive_service (object, optional): Google Drive service used for uploads.
+            A single client is not thread-safe, so uploads through it run on
+            one thread; pass `service_factory` for concurrent uploads.
+        refresh (bool): Whether to refresh metadata for uploads.
+        jobs (int, optional): Conversion worker processes. Defaults to the CPU
+            count; 1 converts in the calling process.
+        upload_workers (int, optional): Concurrent uploads, each over its
+            own connection. Defaults to `uploader.DEFAULT_UPLOAD_WORKERS`.
+        max_pending_uploads (int, optional): Converted files allowed to queue
+            for upload before conversion results stop being collected.
+            Defaults to `uploader.MAX_PENDING_UPLOADS`.
+        manifest (BuildManifest, optional): Build manifest used to skip
+            notebooks whose Markdown (and upload) is already up to date.
+        template_name (str): Template used for every notebook.
+        converter_options (dict, optional): Keyword arguments for each
+            worker's MarkdownConverter.
+        sync_folders (bool): Prepare all Drive folders up front with one
+            folder listing and batched creates (see `ensure_drive_folders`).
+        service_factory (callable, optional): Builds one Drive client per
+            upload thread (see `drive.build_drive_service`).
+
+    Returns:
+        BatchSummary: Per-notebook results and errors.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    summary = BatchSummary()
+    profiler = get_profiler()
+    converter_options = converter_options or {}
+    if jobs > 1 and converter_options.get("optimize_images"):
+        # Conversion workers are processes already: optimize images in them
+        # rather than in a pool per worker.
+        converter_options = dict(converter_options, image_workers=0)
+    worker_args = (template_dir, converter_options)
+
+    if jobs == 1:
+        convert_pool = _InlineExecutor(_init_worker, worker_args)
+    else:
+        convert_pool = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=worker_args + (profiler.enabled, logging_config()),
+        )
+    uploads = None
+    if service_factory or drive_service:
+        # Imported here so conversion-only runs never load the Drive client.
+        from drive import flush_folder_cache
+        from uploader import (
+            UploadPipeline,
+            DEFAULT_UPLOAD_WORKERS,
+            MAX_PENDING_UPLOADS,
+        )
+
+        uploads = UploadPipeline(
+            service_factory or (lambda: drive_service),
+            workers=(
+                (upload_workers or DEFAULT_UPLOAD_WORKERS)
+                if service_factory
+                else 1
+            ),
+            max_pending=max_pending_uploads or MAX_PENDING_UPLOADS,
+            refresh=refresh,
+        )
+    # Outputs built with other converter options are rebuilt as well.
+    fingerprint = (
+        (
+            template_hash(template_dir, template_name),
+            f"{CONVERTER_VERSION}:{options_salt(**converter_options)}",
+        )
+        if manifest
+        else None
+    )
+
+    def remember(result):
+        if not manifest:
+            return
+        try:
+            manifest.record(
+                result.notebook_path,
+                result.output_path,
+                *fingerprint,
+                drive_file_id=result.drive_file_id,
+            )
+        except OSError as e:
+            log_message(
+                WARNING,
+                f"Could not record {result.notebook_path} in manifest: {e}",
+            )
+
+    def queue_upload(result):
+        started = time.perf_counter()
+        future = uploads.submit(result.output_path)
+        future.add_done_callback(lambda f: uploaded(f, result, started))
+
+    def uploaded(future, result, started):
+        result.upload_seconds = time.perf_counter() - started
+        try:
+            result.drive_file_id = future.result()
+            result.status = "uploaded"
+        except Exception as e:
+            result.fail("upload", e)
+        # Recorded even when the upload failed, so the next run only retries
+        # the upload instead of converting again.
+        remember(result)
+
+    def collect(future, result):
+        try:
+            error, result.convert_seconds, profile = future.result()
+            profiler.merge(profile)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if error:
+            result.fail("convert", error)
+            return
+        result.status = "converted"
+        if uploads:
+            queue_upload(result)
+        else:
+            remember(result)
+
+    if uploads:
+        notebook_paths = _prepared(
+            notebook_paths, output_dir, uploads, sync_folders
+        )
+
+    log_message(INFO, f"Starting batch conversion with {jobs} worker(s).")
+    in_flight = {}
+    try:
+        for notebook_path in notebook_paths:
+            output_path = get_output_path(notebook_path, output_dir)
+            result = NotebookResult(notebook_path, output_path)
+            summary.add(result)
+
+            if manifest:
+                state = manifest.check(
+                    notebook_path,
+                    output_path,
+                    *fingerprint,
+                    upload=uploads is not None,
+                )
+                if state == CURRENT:
+                    result.status = "skipped"
+                    log_message(
+                        DEBUG, "Up to date, skipping: %s", notebook_path
+                    )
+                    continue
+                if state == NEEDS_UPLOAD:
+                    result.status = "converted"
+                    queue_upload(result)
+                    continue
+
+            log_message(INFO, "Processing notebook: %s", notebook_path)
+            future = convert_pool.submit(
+                _convert_in_worker, notebook_path, output_path, template_name
+            )
+            in_flight[future] = result
+
+            # Bound the number of queued conversions so lazily produced path
+            # lists are consumed at the pace of the pool.
+            if len(in_flight) >= jobs * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, in_flight.pop(future))
+
+        for future in wait(in_flight).done:
+            collect(future, in_flight.pop(future))
+    finally:
+        convert_pool.shutdown(wait=True)
+        if uploads:
+            uploads.shutdown(wait=True)
+            flush_folder_cache()
+        if manifest:
+            manifest.save()
+
+    if not summary.results:
+        log_message(WARNING, "No notebooks found to process.")
+    summary.finish()
+    return summary
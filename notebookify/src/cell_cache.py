@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import tempfile
+from threading import Lock
+
+from logger import log_message, INFO, WARNING
+
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+# Eviction trims the cache to this fraction of its cap, so it does not run
+# again on the very next write.
+EVICTION_TARGET = 0.8
+
+
+class CellCache:
+    """
+    Persistent on-disk cache of processed cells, keyed by a hash of the cell.
+
+    Each entry is a small JSON file holding a cell's processed outputs, the
+    asset names it references and its rendered Markdown fragment. Hits bump the
+    file's mtime, and when the cache grows past `max_bytes` the least recently
+    used entries are deleted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = Lock()
+
+    @staticmethod
+    def key(cell, salt=""):
+        """
+        Hashes the cell's JSON together with `salt` (converter version and
+        template fingerprint), so template changes never serve stale fragments.
+        """
+        digest = hashlib.sha256(salt.encode("utf-8"))
+        digest.update(
+            json.dumps(cell, sort_keys=True, separators=(",", ":")).encode(
+                "utf-8"
+            )
+        )
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns the cached entry for `key`, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """
+        Stores `entry` under `key` and evicts old entries if over the cap.
+        """
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            log_message(WARNING, f"Could not write cell cache entry: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".json"):
+                    yield entry
+
+    def _scan_size(self):
+        total = 0
+        for entry in self._entries():
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _evict(self):
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICTION_TARGET
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        log_message(INFO, f"Evicted {removed} entries from the cell cache.")
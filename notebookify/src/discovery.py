@@ -0,0 +1,377 @@
+import json
+import os
+import queue
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+from logger import log_message, INFO, WARNING
+
+# Never holding notebooks worth publishing. Hidden folders (.git, .venv,
+# .ipynb_checkpoints, ...) are skipped as well.
+IGNORED_DIRS = {".ipynb_checkpoints", "node_modules", "__pycache__"}
+# Files marking a folder as a Python environment.
+ENVIRONMENT_MARKERS = ("pyvenv.cfg", "conda-meta")
+# Directory mtimes this close to the scan are not trusted yet: another entry
+# could still change within the file system's timestamp resolution.
+RACY_SECONDS = 2
+
+
+def _glob_regex(pattern):
+    """
+    Translates a glob to a regex over ``/``-separated relative paths:
+    ``*`` and ``?`` stay within one path component, ``**`` spans several.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1 : end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return re.compile("".join(parts))
+
+
+class _Pattern:
+    """
+    One glob rule. Patterns without a slash match a name at any depth;
+    others match the path relative to `base`.
+    """
+
+    def __init__(self, pattern, base="", negate=False):
+        self.negate = negate
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        self.regex = _glob_regex(pattern.lstrip("/"))
+        self.base = base
+
+    def matches(self, path, name, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        if not self.anchored:
+            return self.regex.fullmatch(name) is not None
+        if self.base:
+            if not path.startswith(self.base + "/"):
+                return False
+            path = path[len(self.base) + 1 :]
+        return self.regex.fullmatch(path) is not None
+
+
+def parse_gitignore(text, base=""):
+    """
+    Rules from a ``.gitignore`` in folder `base` (relative to the scan
+    root): comments, negation with ``!``, folder-only rules ending in ``/``,
+    anchored rules containing ``/``, and ``*``, ``?``, ``[...]`` and ``**``.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate or line.startswith("\\"):
+            line = line[1:]
+        if line:
+            rules.append(_Pattern(line, base, negate))
+    return rules
+
+
+def _ignored_by(rules, path, name, is_dir):
+    """The last matching rule decides, as in git."""
+    ignored = False
+    for rule in rules:
+        if rule.matches(path, name, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+class DirectoryIndex:
+    """
+    Cached listing of every scanned folder, keyed by absolute path.
+
+    Each entry holds the folder's mtime, notebook names and subfolder names.
+    A folder's mtime changes whenever an entry is added, removed or renamed
+    in it, so while it is unchanged the folder is not listed again: only the
+    subfolders are stat'ed on the way down.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = self._load()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            log_message(WARNING, "Directory index unreadable. Rescanning.")
+            return {}
+
+    def get(self, folder, mtime_ns):
+        entry = self.entries.get(folder)
+        with self._lock:
+            if entry and entry[0] == mtime_ns:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def put(self, folder, mtime_ns, listing):
+        if time.time_ns() - mtime_ns < RACY_SECONDS * 10**9:
+            return
+        with self._lock:
+            self.entries[folder] = [mtime_ns, listing]
+            self._dirty = True
+
+    def save(self):
+        """Writes the index atomically if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            folder = os.path.dirname(self.path) or "."
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.entries, f)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._dirty = False
+
+
+def _list_folder(folder):
+    """
+    Lists a folder with one scandir pass: notebook names, subfolder names,
+    whether it has a .gitignore and whether it is a Python environment.
+    """
+    notebooks, subdirs = [], []
+    gitignore = environment = False
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            if name in ENVIRONMENT_MARKERS:
+                environment = True
+            elif name == ".gitignore":
+                gitignore = True
+            elif entry.is_dir(follow_symlinks=False):
+                subdirs.append(name)
+            elif name.endswith(".ipynb"):
+                notebooks.append(name)
+    return {
+        "notebooks": sorted(notebooks),
+        "subdirs": sorted(subdirs),
+        "gitignore": gitignore,
+        "environment": environment,
+    }
+
+
+class NotebookFinder:
+    """
+    Streams the notebooks below `root` as they are found.
+
+    Args:
+        root (str): Folder to search.
+        include (list, optional): Globs a notebook's path (relative to
+            `root`) must match one of; names only for globs without ``/``.
+        exclude (list, optional): Globs for notebooks and folders to skip.
+        gitignore (bool): Honour ``.gitignore`` files found on the way.
+        workers (int): Folders listed concurrently; siblings are scanned in
+            parallel when above 1, which helps most on network file systems.
+        index (DirectoryIndex, optional): Listings reused for unchanged
+            folders.
+    """
+
+    def __init__(
+        self,
+        root,
+        include=None,
+        exclude=None,
+        gitignore=True,
+        workers=1,
+        index=None,
+    ):
+        self.root = os.path.abspath(root)
+        self.include = [_Pattern(p) for p in include or []]
+        self.exclude = [_Pattern(p) for p in exclude or []]
+        self.gitignore = gitignore
+        self.workers = max(1, workers or 1)
+        self.index = index
+        self._stopped = Event()
+
+    def _listing(self, folder):
+        if self.index is None:
+            return _list_folder(folder)
+        mtime_ns = os.stat(folder).st_mtime_ns
+        listing = self.index.get(folder, mtime_ns)
+        if listing is None:
+            listing = _list_folder(folder)
+            self.index.put(folder, mtime_ns, listing)
+        return listing
+
+    def _visit(self, folder, relpath, rules):
+        """
+        Lists one folder. Returns its notebooks and the subfolders to visit,
+        each with its relative path and the rules that apply below it.
+        """
+        listing = self._listing(folder)
+        if listing["environment"]:
+            return [], []
+        if self.gitignore and listing["gitignore"]:
+            try:
+                with open(
+                    os.path.join(folder, ".gitignore"), encoding="utf-8"
+                ) as f:
+                    rules = rules + parse_gitignore(f.read(), relpath)
+            except (OSError, UnicodeDecodeError) as e:
+                log_message(WARNING, f"Could not read .gitignore: {e}")
+
+        def child(name):
+            return f"{relpath}/{name}" if relpath else name
+
+        notebooks = []
+        for name in listing["notebooks"]:
+            path = child(name)
+            if (
+                name.startswith(".")
+                or _ignored_by(rules, path, name, False)
+                or _ignored_by(self.exclude, path, name, False)
+            ):
+                continue
+            if self.include and not any(
+                p.matches(path, name, False) for p in self.include
+            ):
+                continue
+            notebooks.append(os.path.join(folder, name))
+        subdirs = [
+            (os.path.join(folder, name), child(name), rules)
+            for name in listing["subdirs"]
+            if not (
+                name in IGNORED_DIRS
+                or name.startswith(".")
+                or _ignored_by(rules, child(name), name, True)
+                or _ignored_by(self.exclude, child(name), name, True)
+            )
+        ]
+        return notebooks, subdirs
+
+    def _safe_visit(self, folder, relpath, rules):
+        try:
+            return self._visit(folder, relpath, rules)
+        except OSError as e:
+            log_message(WARNING, f"Skipping unreadable folder {folder}: {e}")
+            return [], []
+
+    def __iter__(self):
+        self._stopped.clear()
+        try:
+            if self.workers == 1:
+                yield from self._walk()
+            else:
+                yield from self._walk_parallel()
+        finally:
+            self._stopped.set()
+            if self.index is not None:
+                self.index.save()
+
+    def _walk(self):
+        stack = [(self.root, "", [])]
+        while stack:
+            notebooks, subdirs = self._safe_visit(*stack.pop())
+            yield from notebooks
+            stack.extend(reversed(subdirs))
+
+    def _walk_parallel(self):
+        results = queue.Queue()
+        lock = Lock()
+        outstanding = [1]
+        done = object()
+
+        def visit(folder, relpath, rules):
+            notebooks, subdirs = [], []
+            try:
+                if not self._stopped.is_set():
+                    notebooks, subdirs = self._safe_visit(
+                        folder, relpath, rules
+                    )
+            except Exception as e:
+                notebooks = e
+            # Queued before any child can finish and report `done`.
+            results.put(notebooks)
+            with lock:
+                outstanding[0] += len(subdirs) - 1
+                finished = outstanding[0] == 0
+            try:
+                for subdir in subdirs:
+                    pool.submit(visit, *subdir)
+            except RuntimeError:
+                # The consumer stopped and the pool is shutting down.
+                return
+            if finished:
+                results.put(done)
+
+        pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="discover"
+        )
+        try:
+            pool.submit(visit, self.root, "", [])
+            while True:
+                notebooks = results.get()
+                if notebooks is done:
+                    break
+                if isinstance(notebooks, Exception):
+                    raise notebooks
+                yield from notebooks
+        finally:
+            self._stopped.set()
+            pool.shutdown(wait=True)
+
+
+def find_notebooks(root, **options):
+    """
+    Yields notebook paths below `root` as they are found (see
+    NotebookFinder for the options).
+    """
+    finder = NotebookFinder(root, **options)
+    started = time.perf_counter()
+    count = 0
+    for path in finder:
+        count += 1
+        yield path
+    index = finder.index
+    cached = f", {index.hits} folder listings reused" if index else ""
+    log_message(
+        INFO,
+        f"Found {count} notebooks in {time.perf_counter() - started:.2f}s"
+        f"{cached}.",
+    )
@@ -1,23 +1,174 @@
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, build_http
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+import hashlib
+import json
 import os
-from utils import (
-    load_metadata,
-    save_metadata,
-    detect_github_root,
-    )
-from logger import log_message, INFO, ERROR, WARNING
+import time
+from collections import defaultdict
+from threading import Lock, RLock
+from utils import get_metadata, detect_github_root
+from scheduler import get_scheduler, is_retryable
+from profiler import get_profiler
+from logger import log_message, DEBUG, INFO, ERROR, WARNING
 
 SCOPES = ["https://www.googleapis.com/auth/drive.file"]
 TOKEN_PATH = "token.json"
 
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+# Drive accepts at most 100 calls in one batch HTTP request.
+BATCH_LIMIT = 100
+LIST_PAGE_SIZE = 1000
 
-def authenticate_google_drive():
+# Files at least this large are sent as resumable uploads in chunks, so a
+# dropped connection only repeats the current chunk. Drive requires chunk
+# sizes to be multiples of 256 KB.
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 16 * 256 * 1024
+UPLOAD_FIELDS = "id, md5Checksum"
+
+# What `upsert_to_google_drive` did with a file.
+UPLOAD_CREATED = "created"
+UPLOAD_UPDATED = "updated"
+UPLOAD_UNCHANGED = "unchanged"
+
+# Cached folder IDs are trusted without an API round-trip for this long.
+DEFAULT_FOLDER_CACHE_TTL = 24 * 60 * 60
+
+
+class FolderCache:
     """
-    Authenticate with Google Drive API using credentials.
+    Run-wide view of the Drive metadata store.
+
+    Keys are read from the store on first use and kept in memory. Folder IDs
+    are trusted until `ttl` seconds after they were last validated (None
+    trusts them indefinitely) or until a call using them fails and `expire`
+    is called. Changes are kept in memory and committed in one transaction
+    by `flush` at the end of the run.
+    """
+
+    def __init__(self, ttl=DEFAULT_FOLDER_CACHE_TTL, store=None):
+        self.ttl = ttl
+        self._store = store or get_metadata()
+        self._metadata = {}
+        self._validated_at = {}
+        self._pending = {}
+        self._pending_validated = {}
+        self._lock = RLock()
+        self._key_locks = {}
+        self.hits = 0
+        self.validations = 0
+
+    def _load(self, key):
+        if key not in self._metadata:
+            value, validated_at = self._store.get_entry(key) or (None, 0)
+            self._metadata[key] = value
+            self._validated_at.setdefault(key, validated_at)
+        return self._metadata[key]
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._load(key)
+        return default if value is None else value
+
+    def set(self, key, value):
+        with self._lock:
+            self._metadata[key] = value
+            self._pending[key] = value
+
+    def needs_validation(self, key):
+        """Whether the cached folder ID for `key` should be checked with Drive."""
+        if self.ttl is None:
+            return False
+        with self._lock:
+            self._load(key)
+            validated_at = self._validated_at.get(key, 0)
+        return time.time() - validated_at >= self.ttl
+
+    def remember(self, key, folder_id):
+        """Stores a folder ID that was just created or validated."""
+        with self._lock:
+            self.set(key, folder_id)
+            self._validated_at[key] = self._pending_validated[key] = (
+                time.time()
+            )
+
+    def lock_for(self, key):
+        """
+        Lock held while the folder at `key` is looked up or created, so
+        concurrent uploads into a new folder create it only once.
+        """
+        with self._lock:
+            return self._key_locks.setdefault(key, Lock())
+
+    def expire(self, key):
+        """Forces the next lookup of `key` to validate its folder ID."""
+        with self._lock:
+            self._validated_at[key] = self._pending_validated[key] = 0
+
+    def flush(self):
+        """
+        Commits pending changes to the metadata store in one transaction.
+        """
+        with self._lock:
+            if not self._pending and not self._pending_validated:
+                return
+            self._store.write(self._pending, self._pending_validated)
+            self._pending = {}
+            self._pending_validated = {}
+        log_message(INFO, "Drive metadata saved.")
+
+
+_folder_cache = None
+
+
+def get_folder_cache(ttl=DEFAULT_FOLDER_CACHE_TTL):
+    """
+    Returns the run-wide FolderCache, loading it on first use.
+    """
+    global _folder_cache
+    if _folder_cache is None:
+        _folder_cache = FolderCache(ttl)
+    return _folder_cache
+
+
+def flush_folder_cache():
+    """Writes the run-wide FolderCache back to disk, if it was loaded."""
+    if _folder_cache is not None:
+        _folder_cache.flush()
+
+
+def _is_not_found(error):
+    return isinstance(error, HttpError) and error.resp.status == 404
+
+
+def get_root_folder_id(cache=None):
+    """Root Drive folder for uploads, as stored by either setup path."""
+    cache = cache or get_folder_cache()
+    return cache.get("root_folder_id") or cache.get("drive_root")
+
+
+def get_drive_folders(file_path):
+    """
+    Folder names between the upload root and `file_path`, mirroring the file's
+    location inside its GitHub repository.
+    """
+    github_root = detect_github_root(file_path)
+    relative_path = (
+        os.path.relpath(file_path, github_root)
+        if github_root
+        else os.path.basename(file_path)
+    )
+    return [f for f in os.path.dirname(relative_path).split(os.sep) if f]
+
+
+def load_credentials():
+    """
+    Loads the OAuth credentials saved in the token file.
     """
-    creds = None
     if os.path.exists(TOKEN_PATH):
         creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
     else:
@@ -27,108 +178,518 @@ def authenticate_google_drive():
         raise FileNotFoundError(
             f"{TOKEN_PATH} not found. Generate it by completing the OAuth process."
         )
-    return build("drive", "v3", credentials=creds)
+    return creds
+
+
+def build_drive_service(credentials=None, api_endpoint=None):
+    """
+    Builds a Drive client with its own HTTP connection.
+
+    httplib2 connections are not thread-safe, so every upload thread builds
+    its own client; each one keeps its connection alive between requests.
+
+    Args:
+        credentials (Credentials, optional): OAuth credentials. Omitted when
+            talking to a local test server.
+        api_endpoint (str, optional): Base URL replacing
+            ``https://www.googleapis.com/``, e.g. a local fake Drive server.
+    """
+    http = build_http()
+    if credentials:
+        http = AuthorizedHttp(credentials, http=http)
+    if not api_endpoint:
+        return build("drive", "v3", http=http, cache_discovery=False)
+    # `client_options` only moves the metadata calls; rewriting the root URL
+    # of the discovery document also moves uploads and batch requests.
+    document = json.loads(get_static_doc("drive", "v3"))
+    document["rootUrl"] = api_endpoint.rstrip("/") + "/"
+    return build_from_document(document, http=http)
+
+
+def authenticate_google_drive():
+    """
+    Authenticate with Google Drive API using credentials.
+    """
+    return build_drive_service(load_credentials())
 
 
 def get_or_create_drive_folder(
-    service, folder_name, parent_id=None, refresh=False
+    service, folder_name, parent_id=None, refresh=False, cache=None
 ):
     """
     Retrieves or creates a Google Drive folder, optionally refreshing metadata.
+    Folder IDs come from the run-wide FolderCache and are only validated with
+    Drive once their TTL has passed or after a call using them failed.
     """
     try:
-        metadata = load_metadata()
+        cache = cache or get_folder_cache()
         folder_key = f"{parent_id}/{folder_name}" if parent_id else folder_name
-        folder_id = metadata.get(folder_key)
+        with cache.lock_for(folder_key):
+            folder_id = cache.get(folder_key)
 
-        # Validate existing folder ID
-        if folder_id and not refresh:
-            folder_info = (
-                service.files().get(fileId=folder_id, fields="id").execute()
-            )
-            if folder_info:
-                log_message(
-                    INFO, f"Folder '{folder_name}' exists. ID: {folder_id}"
-                )
-                return folder_id
-            else:
-                log_message(
-                    WARNING,
-                    f"Folder ID '{folder_id}' is invalid. Refreshing metadata.",
-                )
-                folder_id = None  # Force creation
+            if folder_id and not refresh:
+                if not cache.needs_validation(folder_key):
+                    cache.hits += 1
+                    get_profiler().count("folder_cache", label="hit")
+                    return folder_id
 
-        # Create a new folder if missing or invalid
-        folder_metadata = {
-            "name": folder_name,
-            "mimeType": "application/vnd.google-apps.folder",
-        }
-        if parent_id:
-            folder_metadata["parents"] = [parent_id]
+                # Validate existing folder ID
+                cache.validations += 1
+                get_profiler().count("folder_cache", label="validation")
+                try:
+                    get_scheduler().execute(
+                        service.files().get(fileId=folder_id, fields="id")
+                    )
+                    cache.remember(folder_key, folder_id)
+                    log_message(
+                        INFO, f"Folder '{folder_name}' exists. ID: {folder_id}"
+                    )
+                    return folder_id
+                except HttpError as e:
+                    if not _is_not_found(e):
+                        raise
+                    log_message(
+                        WARNING,
+                        f"Folder ID '{folder_id}' is invalid. Refreshing metadata.",
+                    )
+                    folder_id = None  # Force creation
 
-        created_folder = (
-            service.files().create(body=folder_metadata, fields="id").execute()
-        )
-        folder_id = created_folder.get("id")
+            # Create a new folder if missing or invalid
+            folder_metadata = {
+                "name": folder_name,
+                "mimeType": FOLDER_MIME_TYPE,
+            }
+            if parent_id:
+                folder_metadata["parents"] = [parent_id]
 
-        # Update metadata
-        metadata[folder_key] = folder_id
-        save_metadata(metadata)
-        log_message(INFO, f"Folder '{folder_name}' created. ID: {folder_id}")
-        return folder_id
+            created_folder = get_scheduler().execute(
+                service.files().create(body=folder_metadata, fields="id")
+            )
+            folder_id = created_folder.get("id")
+
+            # Saved with the rest of the cache at the end of the run
+            cache.remember(folder_key, folder_id)
+            log_message(
+                INFO, f"Folder '{folder_name}' created. ID: {folder_id}"
+            )
+            return folder_id
     except Exception as e:
         log_message(ERROR, f"Error creating folder '{folder_name}': {e}")
         raise
 
 
-def upload_to_google_drive(service, file_path, refresh=False):
+def list_drive_folders(service, page_size=LIST_PAGE_SIZE):
     """
-    Uploads a file to Google Drive, organizing it using metadata and GitHub root context.
-    Refreshes metadata if `refresh` is True.
+    Lists every folder visible to the app with paginated `files().list` calls.
     """
-    try:
-        metadata = load_metadata()
-        github_root = detect_github_root(file_path)
-
-        # Determine relative path within GitHub repo
-        relative_path = (
-            os.path.relpath(file_path, github_root)
-            if github_root
-            else os.path.basename(file_path)
+    folders = []
+    page_token = None
+    while True:
+        response = get_scheduler().execute(
+            service.files().list(
+                q=f"mimeType='{FOLDER_MIME_TYPE}' and trashed=false",
+                spaces="drive",
+                fields="nextPageToken, files(id, name, parents)",
+                pageSize=page_size,
+                pageToken=page_token,
+            )
         )
+        folders.extend(response.get("files", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return folders
+
+
+def sync_folder_tree(service, root_folder_id, cache=None):
+    """
+    Indexes every folder below `root_folder_id` from one paginated listing and
+    stores the IDs in the folder cache as freshly validated.
+
+    Returns:
+        dict: Folder cache keys (``"<parent_id>/<name>"``) mapped to folder IDs.
+    """
+    cache = cache or get_folder_cache()
+    children = defaultdict(list)
+    for folder in list_drive_folders(service):
+        for parent_id in folder.get("parents", []):
+            children[parent_id].append(folder)
+
+    index = {}
+    pending = [root_folder_id]
+    while pending:
+        parent_id = pending.pop()
+        for folder in children.get(parent_id, []):
+            key = f"{parent_id}/{folder['name']}"
+            # Keep the first folder when Drive holds duplicate names.
+            if key not in index:
+                index[key] = folder["id"]
+                pending.append(folder["id"])
+
+    for key, folder_id in index.items():
+        cache.remember(key, folder_id)
+    log_message(INFO, f"Indexed {len(index)} Drive folders.")
+    return index
+
+
+def execute_batch(service, requests):
+    """
+    Runs small metadata requests as Drive batch HTTP requests, BATCH_LIMIT
+    calls per round-trip. Calls inside a batch can be rate limited on their
+    own; those are sent again in a new batch after a backoff.
+
+    Returns:
+        list: ``(response, exception)`` pairs, in the order of `requests`.
+    """
+    scheduler = get_scheduler()
+    results = [(None, None)] * len(requests)
 
-        # Create folder structure in Drive
-        parent_folder_id = metadata.get("root_folder_id")
-        if not parent_folder_id:
-            raise ValueError("Root folder ID not found in metadata.")
+    def on_response(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+        scheduler.observe(exception)
 
-        for folder in os.path.dirname(relative_path).split(os.sep):
+    pending = list(range(len(requests)))
+    for attempt in range(scheduler.max_retries + 1):
+        for start in range(0, len(pending), BATCH_LIMIT):
+            batch = service.new_batch_http_request(callback=on_response)
+            for index in pending[start : start + BATCH_LIMIT]:
+                batch.add(requests[index], request_id=str(index))
+            scheduler.call(batch.execute)
+        pending = [i for i in pending if is_retryable(results[i][1])]
+        if not pending or attempt == scheduler.max_retries:
+            break
+        scheduler.wait_before_retry(attempt, results[pending[0]][1])
+    return results
+
+
+def _create_folders_batch(service, folders):
+    """
+    Creates folders with one batch HTTP request per BATCH_LIMIT folders.
+
+    Args:
+        folders (list): ``(name, parent_id)`` pairs.
+
+    Returns:
+        list: The new folder IDs, in the order of `folders`.
+    """
+    requests = [
+        service.files().create(
+            body={
+                "name": name,
+                "mimeType": FOLDER_MIME_TYPE,
+                "parents": [parent_id],
+            },
+            fields="id",
+        )
+        for name, parent_id in folders
+    ]
+    created = []
+    for response, exception in execute_batch(service, requests):
+        if exception:
+            raise exception
+        created.append(response["id"])
+    return created
+
+
+def validate_folder_ids(service, file_paths, cache=None):
+    """
+    Checks every cached folder needed by `file_paths` whose TTL has passed
+    with batched `files().get` calls, instead of one request per folder
+    during the uploads. Folders that no longer exist are dropped from the
+    cache so the upload recreates them.
+
+    Returns:
+        int: Number of folder IDs checked.
+    """
+    cache = cache or get_folder_cache()
+    root_folder_id = get_root_folder_id(cache)
+    stale = {}
+    for file_path in file_paths:
+        parent_id = root_folder_id
+        for folder in get_drive_folders(file_path):
+            key = f"{parent_id}/{folder}"
+            parent_id = cache.get(key)
+            if not parent_id:
+                break
+            if key not in stale and cache.needs_validation(key):
+                stale[key] = parent_id
+
+    keys = list(stale)
+    results = execute_batch(
+        service,
+        [service.files().get(fileId=stale[key], fields="id") for key in keys],
+    )
+    for key, (_, exception) in zip(keys, results):
+        cache.validations += 1
+        get_profiler().count("folder_cache", label="validation")
+        if exception is None:
+            cache.remember(key, stale[key])
+        elif _is_not_found(exception):
+            cache.set(key, None)
+        else:
+            raise exception
+    if keys:
+        log_message(INFO, f"Validated {len(keys)} cached Drive folders.")
+    return len(keys)
+
+
+def ensure_drive_folders(service, file_paths, cache=None):
+    """
+    Bulk alternative to resolving folders one by one: indexes the whole tree
+    with `sync_folder_tree`, then creates only the missing folders, one batch
+    request per depth level. Afterwards every folder needed by `file_paths`
+    is in the cache, so uploads make no folder API calls.
+
+    Returns:
+        int: Number of folders created.
+    """
+    cache = cache or get_folder_cache()
+    root_folder_id = get_root_folder_id(cache)
+    if not root_folder_id:
+        raise ValueError("Root folder ID not found in metadata.")
+    index = sync_folder_tree(service, root_folder_id, cache)
+
+    paths = set()
+    for file_path in file_paths:
+        folders = tuple(get_drive_folders(file_path))
+        paths.update(folders[:depth] for depth in range(1, len(folders) + 1))
+
+    resolved = {(): root_folder_id}
+    created_count = 0
+    for depth in range(1, max(map(len, paths), default=0) + 1):
+        missing = []
+        for path in sorted(p for p in paths if len(p) == depth):
+            key = f"{resolved[path[:-1]]}/{path[-1]}"
+            if key in index:
+                resolved[path] = index[key]
+            else:
+                missing.append(path)
+        if not missing:
+            continue
+        parents = [resolved[path[:-1]] for path in missing]
+        created = _create_folders_batch(
+            service,
+            [(path[-1], parent) for path, parent in zip(missing, parents)],
+        )
+        for path, parent_id, folder_id in zip(missing, parents, created):
+            resolved[path] = folder_id
+            cache.remember(f"{parent_id}/{path[-1]}", folder_id)
+        created_count += len(created)
+
+    log_message(
+        INFO, f"Drive folders ready: {created_count} created in bulk mode."
+    )
+    return created_count
+
+
+def _resolve_folder_path(service, root_folder_id, folders, cache):
+    """
+    Resolves nested folders below the root, creating missing ones.
+    Returns the innermost folder ID and the cache keys used on the way.
+    """
+    parent_folder_id = root_folder_id
+    keys = []
+    with get_profiler().stage("drive_folders"):
+        for folder in folders:
+            keys.append(f"{parent_folder_id}/{folder}")
             parent_folder_id = get_or_create_drive_folder(
-                service, folder, parent_id=parent_folder_id
+                service, folder, parent_id=parent_folder_id, cache=cache
             )
+    return parent_folder_id, keys
+
+
+def _media_body(file_path):
+    """
+    Upload body for `file_path`: a single multipart request for small files,
+    a chunked resumable upload for large ones.
+    """
+    if os.path.getsize(file_path) < RESUMABLE_THRESHOLD:
+        return MediaFileUpload(file_path, mimetype="text/markdown")
+    return MediaFileUpload(
+        file_path,
+        mimetype="text/markdown",
+        chunksize=UPLOAD_CHUNK_SIZE,
+        resumable=True,
+    )
+
+
+def _execute_upload(request):
+    """
+    Sends an upload request, chunk by chunk when it is resumable.
+    """
+    scheduler = get_scheduler()
+    with get_profiler().stage("upload"):
+        if not request.resumable:
+            return scheduler.execute(request)
+        response = None
+        while response is None:
+            # A failed chunk is retried from where the upload stopped.
+            _, response = scheduler.call(request.next_chunk)
+        return response
 
-        # Upload file or refresh metadata
+
+def file_md5(file_path, chunk_size=1024 * 1024):
+    """MD5 of a file, comparable with the `md5Checksum` Drive reports."""
+    digest = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_file_record(file_path, cache=None):
+    """
+    Drive file ID and last uploaded `md5Checksum` of a local file, or None.
+    Older metadata stored the bare file ID.
+    """
+    cache = cache or get_folder_cache()
+    record = cache.get(os.path.abspath(file_path))
+    if isinstance(record, str):
+        return {"id": record, "md5Checksum": None}
+    return record
+
+
+def _remember_file(cache, file_path, uploaded_file):
+    cache.set(
+        os.path.abspath(file_path),
+        {
+            "id": uploaded_file["id"],
+            "md5Checksum": uploaded_file.get("md5Checksum"),
+        },
+    )
+
+
+def refresh_file_records(service, file_paths, cache=None):
+    """
+    Re-reads the `md5Checksum` of every recorded file in `file_paths` with
+    batched `files().get` calls. Files deleted from Drive are forgotten, so
+    they are uploaded again.
+
+    Returns:
+        int: Number of records checked.
+    """
+    cache = cache or get_folder_cache()
+    records = {}
+    for file_path in file_paths:
+        record = get_file_record(file_path, cache)
+        if record:
+            records[file_path] = record["id"]
+
+    paths = list(records)
+    results = execute_batch(
+        service,
+        [
+            service.files().get(fileId=records[path], fields="id, md5Checksum")
+            for path in paths
+        ],
+    )
+    for file_path, (response, exception) in zip(paths, results):
+        if exception is None:
+            _remember_file(cache, file_path, response)
+        elif _is_not_found(exception):
+            cache.set(os.path.abspath(file_path), None)
+        else:
+            raise exception
+    return len(paths)
+
+
+def _create_file(service, file_path, cache):
+    root_folder_id = get_root_folder_id(cache)
+    if not root_folder_id:
+        raise ValueError("Root folder ID not found in metadata.")
+    folders = get_drive_folders(file_path)
+
+    for attempt in range(2):
+        parent_folder_id, folder_keys = _resolve_folder_path(
+            service, root_folder_id, folders, cache
+        )
         file_metadata = {
             "name": os.path.basename(file_path),
             "parents": [parent_folder_id],
         }
-        media = MediaFileUpload(file_path, mimetype="text/markdown")
-        uploaded_file = (
-            service.files()
-            .create(body=file_metadata, media_body=media, fields="id")
-            .execute()
-        )
+        try:
+            return _execute_upload(
+                service.files().create(
+                    body=file_metadata,
+                    media_body=_media_body(file_path),
+                    fields=UPLOAD_FIELDS,
+                )
+            )
+        except HttpError as e:
+            # A cached folder was deleted: check the path again and retry.
+            if attempt or not _is_not_found(e):
+                raise
+            log_message(
+                WARNING,
+                f"Cached folder for {file_path} not found. Revalidating.",
+            )
+            for key in folder_keys:
+                cache.expire(key)
+
 
-        # Update metadata only if refresh is requested
-        if refresh:
-            metadata[file_path] = uploaded_file.get("id")
-            save_metadata(metadata)
+def upsert_to_google_drive(service, file_path, refresh=False, cache=None):
+    """
+    Uploads a file to Google Drive, replacing the copy from earlier runs.
+
+    The Drive file ID and `md5Checksum` of every upload are recorded in the
+    metadata. Later calls update that file in place with `files().update`,
+    or skip the upload when the local MD5 still matches; only unknown (or
+    deleted) files are created in the folder mirroring the GitHub layout.
+    With `refresh`, the checksum is re-read from Drive instead of trusted.
+
+    Returns:
+        tuple: The Drive file ID and the action taken: UPLOAD_CREATED,
+        UPLOAD_UPDATED or UPLOAD_UNCHANGED.
+    """
+    try:
+        cache = cache or get_folder_cache()
+        record = get_file_record(file_path, cache)
+        if record and refresh:
+            refresh_file_records(service, [file_path], cache)
+            record = get_file_record(file_path, cache)
 
+        if record:
+            if record.get("md5Checksum") == file_md5(file_path):
+                log_message(DEBUG, "Unchanged on Google Drive: %s", file_path)
+                return record["id"], UPLOAD_UNCHANGED
+            try:
+                uploaded_file = _execute_upload(
+                    service.files().update(
+                        fileId=record["id"],
+                        media_body=_media_body(file_path),
+                        fields=UPLOAD_FIELDS,
+                    )
+                )
+                action = UPLOAD_UPDATED
+            except HttpError as e:
+                if not _is_not_found(e):
+                    raise
+                log_message(
+                    WARNING,
+                    f"Drive file for {file_path} was deleted. Uploading anew.",
+                )
+                record = None
+        if not record:
+            uploaded_file = _create_file(service, file_path, cache)
+            action = UPLOAD_CREATED
+
+        _remember_file(cache, file_path, uploaded_file)
         log_message(
             INFO,
-            f"Uploaded {file_path} to Google Drive. ID: {uploaded_file.get('id')}",
+            "Uploaded %s to Google Drive (%s). ID: %s",
+            file_path,
+            action,
+            uploaded_file["id"],
         )
-        return uploaded_file.get("id")
+        return uploaded_file["id"], action
     except Exception as e:
         log_message(ERROR, f"Error uploading {file_path} to Google Drive: {e}")
         raise
+
+
+def upload_to_google_drive(service, file_path, refresh=False, cache=None):
+    """
+    Uploads a file to Google Drive (see `upsert_to_google_drive`) and returns
+    its file ID.
+    """
+    file_id, _ = upsert_to_google_drive(service, file_path, refresh, cache)
+    return file_id
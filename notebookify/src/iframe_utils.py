@@ -1,36 +1,288 @@
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-import time
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+import atexit
+import json
+import os
+import queue
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_SIZE = 2
+# Upper bound for any explicit wait; pages that are ready sooner return
+# immediately instead of sleeping a fixed time.
+DEFAULT_TIMEOUT = 30
+WINDOW_SIZE = (1000, 700)
+PLOTLY_CDN = "https://cdn.plot.ly/plotly-2.35.2.min.js"
 
-def capture_iframe_snapshot(
-    url, output_path, chromedriver_path="path/to/chromedriver"
-):
+_PAGE_READY = "return document.readyState === 'complete'"
+_PLOTLY_READY = "return document.body.dataset.ready === '1'"
+_PLOTLY_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">{script}</head>
+<body style="margin:0"><div id="figure"></div>
+<script>
+const figure = {figure};
+Plotly.newPlot("figure", figure.data || [], figure.layout || {{}},
+               {{staticPlot: true}})
+  .then(() => {{ document.body.dataset.ready = "1"; }});
+</script></body></html>
+"""
+
+
+class BrowserPool:
     """
-    Capture a snapshot of an iframe from a given URL using Selenium.
+    Fixed number of warm headless Chrome instances shared by all snapshots.
+
+    Browsers are started on first use and reused until `close`, so a
+    notebook with dozens of interactive outputs pays the startup cost once
+    per browser instead of once per snapshot. `submit` captures up to `size`
+    snapshots concurrently.
     """
-    try:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        service = Service(chromedriver_path)
 
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.get(url)
-        time.sleep(3)  # Wait for the iframe to load
+    def __init__(
+        self,
+        size=DEFAULT_POOL_SIZE,
+        chromedriver_path=None,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.size = size
+        self.chromedriver_path = chromedriver_path
+        self.timeout = timeout
+        self.workdir = tempfile.mkdtemp(prefix="notebookify-snapshots-")
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._started = 0
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix="snapshot"
+        )
+        self._plotly_js = None
+
+    def _start_driver(self):
+        options = Options()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument(
+            f"--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}"
+        )
+        service = (
+            Service(self.chromedriver_path)
+            if self.chromedriver_path
+            else Service()
+        )
+        return webdriver.Chrome(service=service, options=options)
+
+    @contextmanager
+    def driver(self):
+        """
+        Borrows an idle browser, starting one while the pool is below `size`.
+        Browsers that fail are discarded rather than returned to the pool.
+        """
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                start = self._started < self.size
+                if start:
+                    self._started += 1
+            if start:
+                try:
+                    driver = self._start_driver()
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+                with self._lock:
+                    self._drivers.append(driver)
+            else:
+                driver = self._idle.get()
+        try:
+            yield driver
+        except WebDriverException as e:
+            # A page that never became ready leaves the browser usable.
+            if isinstance(e, TimeoutException):
+                self._idle.put(driver)
+            else:
+                self._discard(driver)
+            raise
+        except BaseException:
+            # Anything else (a bug, Ctrl+C) may leave the browser mid-page:
+            # quit it so the pool can start a fresh one.
+            self._discard(driver)
+            raise
+        else:
+            self._idle.put(driver)
+
+    def _discard(self, driver):
+        with self._lock:
+            self._drivers.remove(driver)
+            self._started -= 1
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
 
-        iframe = driver.find_element(By.TAG_NAME, "iframe")
-        driver.switch_to.frame(iframe)
+    def capture(
+        self,
+        target,
+        output_path,
+        frame=False,
+        ready_script=None,
+        selector=None,
+    ):
+        """
+        Saves a PNG screenshot of a URL or local HTML file.
 
-        driver.save_screenshot(output_path)
+        Args:
+            target (str): URL or path to a local HTML file.
+            output_path (str): Where to write the PNG.
+            frame (bool): Capture the first iframe's document.
+            ready_script (str, optional): JavaScript returning true once the
+                content is ready, waited for after the page has loaded.
+            selector (str, optional): CSS selector of the element to capture
+                instead of the whole window.
+        """
+        url = target if "://" in target else Path(target).resolve().as_uri()
+        with self.driver() as driver:
+            wait = WebDriverWait(driver, self.timeout)
+            driver.get(url)
+            try:
+                wait.until(lambda d: d.execute_script(_PAGE_READY))
+                if frame:
+                    wait.until(
+                        EC.frame_to_be_available_and_switch_to_it(
+                            (By.TAG_NAME, "iframe")
+                        )
+                    )
+                    wait.until(lambda d: d.execute_script(_PAGE_READY))
+                if ready_script:
+                    wait.until(lambda d: d.execute_script(ready_script))
+                if selector:
+                    wait.until(
+                        EC.visibility_of_element_located(
+                            (By.CSS_SELECTOR, selector)
+                        )
+                    ).screenshot(output_path)
+                else:
+                    driver.save_screenshot(output_path)
+            finally:
+                driver.switch_to.default_content()
         logger.info(f"Snapshot saved to {output_path}")
+        return output_path
+
+    def submit(self, *args, **kwargs):
+        """Runs `capture` on the pool. Returns a Future."""
+        return self._executor.submit(self.capture, *args, **kwargs)
+
+    def _plotly_script(self):
+        """
+        Script tag loading plotly.js, written once per pool next to the pages
+        when the plotly package is installed, or loaded from the CDN.
+        """
+        with self._lock:
+            if self._plotly_js is None:
+                try:
+                    from plotly.offline import get_plotlyjs
+                except ImportError:
+                    self._plotly_js = f'<script src="{PLOTLY_CDN}"></script>'
+                else:
+                    path = os.path.join(self.workdir, "plotly.min.js")
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(get_plotlyjs())
+                    self._plotly_js = '<script src="plotly.min.js"></script>'
+            return self._plotly_js
+
+    def submit_plotly(self, figure, output_path):
+        """
+        Renders a Plotly figure (its JSON dict) in a warm browser and saves it
+        as a PNG. Returns a Future.
+        """
+        fd, page = tempfile.mkstemp(dir=self.workdir, suffix=".html")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(
+                _PLOTLY_PAGE.format(
+                    script=self._plotly_script(),
+                    figure=json.dumps(figure).replace("</", "<\\/"),
+                )
+            )
+        future = self.submit(
+            page, output_path, ready_script=_PLOTLY_READY, selector="#figure"
+        )
+        future.add_done_callback(lambda _: os.remove(page))
+        return future
+
+    def close(self):
+        """Waits for pending snapshots and quits every browser."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PlotlySnapshotRenderer:
+    """
+    Turns Plotly outputs into PNG snapshots taken by a BrowserPool. Snapshots
+    are written asynchronously through `AssetWriter.write_deferred`, so all
+    figures of a notebook render in parallel.
+    """
+
+    name = "browser"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def snapshot(self, figure, assets):
+        """Queues a snapshot of `figure`. Returns the asset name."""
+        key = json.dumps(figure, sort_keys=True).encode("utf-8")
+        return assets.write_deferred(
+            key, "png", lambda path: self.pool.submit_plotly(figure, path)
+        )
+
+
+_pool = None
+
 
-        driver.quit()
+def get_browser_pool(size=DEFAULT_POOL_SIZE, chromedriver_path=None):
+    """
+    Returns the process-wide BrowserPool, closed automatically at exit.
+    """
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(size, chromedriver_path)
+        atexit.register(_pool.close)
+    return _pool
+
+
+def capture_iframe_snapshot(url, output_path, chromedriver_path=None):
+    """
+    Capture a snapshot of an iframe from a given URL using Selenium.
+    """
+    try:
+        get_browser_pool(chromedriver_path=chromedriver_path).capture(
+            url, output_path, frame=True
+        )
     except Exception as e:
         logger.error(f"Error capturing iframe snapshot: {e}")
@@ -0,0 +1,258 @@
+import importlib.util
+import io
+import os
+import struct
+import tempfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import Lock
+
+from assets import content_hash
+from profiler import get_profiler
+from logger import log_message, WARNING
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Chunks that do not affect the pixels: text, timestamps and Photoshop
+# hints. Dropped when a PNG is recompressed.
+DROPPED_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+# Optimized images kept in memory, so repeated plots in a batch are
+# processed once even without a cache folder.
+MEMO_SIZE = 256
+
+
+def _chunks(data):
+    """Yields (type, body) for each chunk of a PNG."""
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[position : position + 8])
+        yield kind, data[position + 8 : position + 8 + length]
+        position += 12 + length
+
+
+def _chunk(kind, body):
+    return (
+        struct.pack(">I", len(body))
+        + kind
+        + body
+        + struct.pack(">I", zlib.crc32(kind + body))
+    )
+
+
+def recompress_png(data, level=9):
+    """
+    Recompresses a PNG losslessly: the image data is deflated again at
+    `level` into a single IDAT chunk and metadata chunks are dropped.
+    Returns `data` unchanged when it is not a PNG or would not shrink.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    head, tail, idat = [], [], []
+    for kind, body in _chunks(data):
+        if kind == b"IDAT":
+            idat.append(body)
+        elif kind not in DROPPED_CHUNKS:
+            (tail if idat else head).append(_chunk(kind, body))
+    if not idat:
+        return data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9)
+    pixels = compressor.compress(zlib.decompress(b"".join(idat)))
+    pixels += compressor.flush()
+    packed = b"".join([PNG_SIGNATURE, *head, _chunk(b"IDAT", pixels), *tail])
+    return packed if len(packed) < len(data) else data
+
+
+def _transform(data, max_width, webp):
+    """
+    Downscales and/or converts an image with Pillow. Returns `data` when
+    neither applies.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        resize = bool(max_width and image.width > max_width)
+        if not (resize or webp):
+            return data
+        source_format = image.format
+        if resize:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if webp:
+            # Plots are flat colors and sharp edges: lossless WebP is both
+            # exact and far smaller than PNG.
+            image.save(buffer, "WEBP", lossless=True)
+        elif source_format == "JPEG":
+            image.save(buffer, "JPEG", quality=90, optimize=True)
+        else:
+            image.save(buffer, source_format or "PNG")
+        return buffer.getvalue()
+
+
+def optimize_image(data, extension, max_width=None, webp=False):
+    """
+    Optimizes one image. Runs in pool processes, so it only takes and
+    returns plain values.
+
+    Returns:
+        bytes: The optimized image, or `data` if nothing applied.
+    """
+    if max_width or webp:
+        data = _transform(data, max_width, webp)
+    if extension == "png" and not webp:
+        return recompress_png(data)
+    return data
+
+
+class ImageOptimizer:
+    """
+    Optional stage processing extracted images before they are written:
+    PNGs are recompressed losslessly and, with Pillow installed, images can
+    be downscaled to `max_width` or converted to lossless WebP.
+
+    Work runs in a process pool of `workers` (0 runs it in the calling
+    process, as conversion pool workers do). Results are cached by source
+    hash and settings, in memory and in `cache_dir`, so each unique image
+    is processed once.
+    """
+
+    def __init__(
+        self, max_width=None, webp=False, workers=None, cache_dir=None
+    ):
+        if (max_width or webp) and importlib.util.find_spec("PIL") is None:
+            raise ImportError(
+                "Resizing images or converting them to WebP requires "
+                "Pillow; install it with 'pip install notebookify[images]'."
+            )
+        self.max_width = max_width
+        self.webp = webp
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.salt = f"w{max_width or 0}:{'webp' if webp else 'png'}".encode()
+        self._memo = OrderedDict()
+        self._lock = Lock()
+        self._pool = None
+
+    def handles(self, extension):
+        """Whether images with `extension` are optimized."""
+        return extension == "png" or (
+            extension == "jpg" and bool(self.max_width or self.webp)
+        )
+
+    def extension(self, extension):
+        """Extension of the optimized image."""
+        return "webp" if self.webp else extension
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers or None)
+        return self._pool
+
+    def _cache_path(self, key, extension):
+        return os.path.join(self.cache_dir, f"{key}.{extension}")
+
+    def optimize(self, data, extension):
+        """
+        Future resolving to the optimized bytes of an image. Concurrent
+        requests for the same image share one future.
+        """
+        key = content_hash(data + self.salt)
+        with self._lock:
+            future = self._memo.get(key)
+            if future is not None:
+                self._memo.move_to_end(key)
+                get_profiler().count("images", label="reused")
+                return future
+            future = self._memo[key] = self._start(data, extension, key)
+            while len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return future
+
+    def _start(self, data, extension, key):
+        target = self.extension(extension)
+        if self.cache_dir:
+            try:
+                with open(self._cache_path(key, target), "rb") as f:
+                    future = Future()
+                    future.set_result(f.read())
+                    get_profiler().count("images", label="cached")
+                    return future
+            except OSError:
+                pass
+        args = (data, extension, self.max_width, self.webp)
+        if self.workers == 0:
+            future = Future()
+            try:
+                future.set_result(optimize_image(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self._executor().submit(optimize_image, *args)
+        result = Future()
+        future.add_done_callback(
+            lambda f: self._finish(f, result, data, extension, key, target)
+        )
+        return result
+
+    def _finish(self, future, result, data, extension, key, target):
+        try:
+            optimized = future.result()
+        except Exception as e:
+            log_message(WARNING, f"Could not optimize image: {e}")
+            if target != extension:
+                result.set_exception(e)
+                return
+            optimized = data
+        profiler = get_profiler()
+        profiler.count("images", label="optimized")
+        profiler.count("image_bytes_saved", len(data) - len(optimized))
+        if self.cache_dir:
+            self._store(self._cache_path(key, target), optimized)
+        result.set_result(optimized)
+
+    def _store(self, path, payload):
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log_message(WARNING, f"Could not cache optimized image: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def write(self, assets, data, extension):
+        """
+        Stores an optimized copy of an image through `assets`. The file is
+        named after the source image and settings and lands when the
+        writer's `wait` is called. Returns the file name.
+        """
+        return assets.write_deferred(
+            data + self.salt,
+            self.extension(extension),
+            lambda path: _written(self.optimize(data, extension), path),
+        )
+
+    def close(self):
+        """Shuts down the process pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def _written(future, path):
+    """Future completing once the result of `future` is written to `path`."""
+    done = Future()
+
+    def write(finished):
+        try:
+            with open(path, "wb") as f:
+                f.write(finished.result())
+            done.set_result(path)
+        except Exception as e:
+            done.set_exception(e)
+
+    future.add_done_callback(write)
+    return done
@@ -1,16 +1,233 @@
+import atexit
+import json
+import os
+import queue
+import re
+import reprlib
+import sys
+import time
+from threading import Event, Lock, Thread
+
 from colorama import Fore, Style, init
 
 # Initialize colorama
 init(autoreset=True)
 
+PREVIEW_LIMIT = 200
+# Records written with one call when the writer catches up.
+MAX_BATCH = 256
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class Level:
+    """
+    A logging level. Formats as its color-coded tag, e.g. ``[INFO]``.
+    """
+
+    def __init__(self, name, severity, color):
+        self.name = name
+        self.severity = severity
+        self.tag = f"{color}[{name}]{Style.RESET_ALL}"
+
+    def __str__(self):
+        return self.tag
+
+    def __repr__(self):
+        return f"Level({self.name})"
+
+
 # Logging levels with color coding
-INFO = f"{Fore.CYAN}[INFO]{Style.RESET_ALL}"
-WARNING = f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL}"
-ERROR = f"{Fore.RED}[ERROR]{Style.RESET_ALL}"
+DEBUG = Level("DEBUG", 10, Fore.WHITE)
+INFO = Level("INFO", 20, Fore.CYAN)
+WARNING = Level("WARNING", 30, Fore.YELLOW)
+ERROR = Level("ERROR", 40, Fore.RED)
+LEVELS = (DEBUG, INFO, WARNING, ERROR)
+
+
+class _Shortener(reprlib.Repr):
+    """reprlib.Repr that also shortens dict and list subclasses."""
 
+    def __init__(self, limit):
+        super().__init__()
+        self.maxstring = self.maxother = limit
+        self.maxlevel = 3
 
-def log_message(level, message):
+    def repr1(self, x, level):
+        if isinstance(x, dict) and type(x) is not dict:
+            return self.repr_dict(x, level)
+        if isinstance(x, list) and type(x) is not list:
+            return self.repr_list(x, level)
+        return super().repr1(x, level)
+
+
+class _Preview:
+    def __init__(self, value, limit=PREVIEW_LIMIT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            text = self.value
+        else:
+            # Nested strings are cut before they are copied, so a megabyte
+            # of base64 is never repr'd in full.
+            text = _Shortener(self.limit).repr(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[: self.limit]}... ({len(text)} characters)"
+
+
+def preview(value, limit=PREVIEW_LIMIT):
+    """
+    Stand-in for a possibly huge value (base64 images, HTML, whole outputs)
+    in log arguments. Its text is a truncated repr, built only if the
+    message is actually written.
     """
-    Prints a log message with the specified level (INFO, WARNING, ERROR).
+    return _Preview(value, limit)
+
+
+class _Config:
+    def __init__(self):
+        self.verbosity = 0
+        self.threshold = INFO.severity
+        self.json_lines = False
+        self.asynchronous = True
+
+
+_config = _Config()
+_queue = None
+_writer = None
+_writer_pid = None
+_writer_lock = Lock()
+
+
+def configure_logging(verbosity=0, json_lines=False, asynchronous=True):
     """
-    print(f"{level} {message}")
+    Sets what is logged and how.
+
+    Args:
+        verbosity (int): 0 logs INFO and above; each step up (``-v``) or
+            down (``-q``) shows one level more or less.
+        json_lines (bool): Write one JSON object per line instead of
+            color-coded text.
+        asynchronous (bool): Write from a background thread, so callers
+            never wait for the terminal.
+    """
+    flush_logs()
+    index = max(0, min(len(LEVELS) - 1, LEVELS.index(INFO) - verbosity))
+    _config.verbosity = verbosity
+    _config.threshold = LEVELS[index].severity
+    _config.json_lines = json_lines
+    _config.asynchronous = asynchronous
+
+
+def logging_config():
+    """The current settings, as keyword arguments for configure_logging."""
+    return {
+        "verbosity": _config.verbosity,
+        "json_lines": _config.json_lines,
+        "asynchronous": _config.asynchronous,
+    }
+
+
+def is_enabled(level):
+    """Whether messages at `level` are written."""
+    return level.severity >= _config.threshold
+
+
+def log_message(level, message, *args):
+    """
+    Logs a message at `level` (DEBUG, INFO, WARNING, ERROR).
+
+    With `args`, the message is a %-format string completed only if the
+    level is enabled, so hot paths pay nothing for filtered messages; wrap
+    large values in `preview`.
+    """
+    if level.severity < _config.threshold:
+        return
+    record = (time.time(), level, message, args, sys.stdout)
+    if _config.asynchronous:
+        _enqueue(record)
+    else:
+        _write([record])
+
+
+def _format(record):
+    created, level, message, args, _ = record
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError):
+            message = " ".join(str(part) for part in (message,) + args)
+    if not _config.json_lines:
+        return f"{level} {message}\n"
+    return (
+        json.dumps(
+            {
+                "time": time.strftime(
+                    "%Y-%m-%dT%H:%M:%S", time.localtime(created)
+                )
+                + f".{int(created % 1 * 1000):03d}",
+                "level": level.name.lower(),
+                "message": _ANSI.sub("", str(message)),
+            }
+        )
+        + "\n"
+    )
+
+
+def _write(records):
+    """Writes records, one write per stream for the whole batch."""
+    by_stream = {}
+    for record in records:
+        by_stream.setdefault(record[4], []).append(_format(record))
+    for stream, lines in by_stream.items():
+        try:
+            stream.write("".join(lines))
+            stream.flush()
+        except (OSError, ValueError):
+            # The stream was closed or its reader went away.
+            pass
+
+
+def _enqueue(record):
+    global _queue, _writer, _writer_pid
+    if _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer_pid != os.getpid():
+                # First message, or first in a forked child, where the
+                # parent's writer thread does not exist.
+                _queue = queue.SimpleQueue()
+                _writer = Thread(
+                    target=_drain, args=(_queue,), name="log-writer"
+                )
+                _writer.daemon = True
+                _writer.start()
+                _writer_pid = os.getpid()
+    _queue.put(record)
+
+
+def _drain(records):
+    while True:
+        batch = [records.get()]
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(records.get_nowait())
+            except queue.Empty:
+                break
+        events = [r for r in batch if isinstance(r, Event)]
+        _write([r for r in batch if not isinstance(r, Event)])
+        for event in events:
+            event.set()
+
+
+def flush_logs(timeout=5):
+    """Waits until every message logged so far has been written."""
+    if _writer_pid != os.getpid() or not _writer.is_alive():
+        return
+    written = Event()
+    _queue.put(written)
+    written.wait(timeout)
+
+
+atexit.register(flush_logs)
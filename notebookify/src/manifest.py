@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+from threading import Lock
+
+from logger import log_message, INFO, WARNING
+from utils import get_manifest_path
+
+CURRENT = "current"
+NEEDS_UPLOAD = "needs_upload"
+STALE = "stale"
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks so large notebooks stay out of memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def template_hash(template_dir, template_name):
+    """Hash of the template source, so template edits invalidate outputs."""
+    return file_hash(os.path.join(template_dir, template_name))
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BuildManifest:
+    """
+    Records what each notebook was last built from, so unchanged notebooks can
+    skip conversion and upload.
+
+    Entries are keyed by absolute notebook path and store the source, template
+    and converter fingerprints together with the output hash and Drive file ID.
+    File sizes and mtimes are kept alongside the hashes, so unchanged files are
+    recognised without being read.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_manifest_path()
+        self.entries = self._load()
+        self._dirty = False
+        self._lock = Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            log_message(
+                WARNING, "Build manifest unreadable. Rebuilding all notebooks."
+            )
+            return {}
+
+    def _matches(self, path, stat_key, recorded_hash):
+        """
+        Compares a file to its recorded hash, hashing only if its stat changed.
+        """
+        if not os.path.exists(path):
+            return False
+        if _stat_key(path) == stat_key:
+            return True
+        return file_hash(path) == recorded_hash
+
+    def check(
+        self,
+        notebook_path,
+        output_path,
+        template_hash,
+        converter_version,
+        upload=False,
+    ):
+        """
+        Returns CURRENT when nothing needs doing, NEEDS_UPLOAD when only the
+        upload is missing, and STALE when the notebook must be converted.
+        """
+        entry = self.entries.get(os.path.abspath(notebook_path))
+        if (
+            not entry
+            or entry.get("output_path") != os.path.abspath(output_path)
+            or entry.get("template_hash") != template_hash
+            or entry.get("converter_version") != converter_version
+            or not self._matches(
+                notebook_path,
+                entry.get("source_stat"),
+                entry.get("source_hash"),
+            )
+            or not self._matches(
+                output_path, entry.get("output_stat"), entry.get("output_hash")
+            )
+        ):
+            return STALE
+        if upload and not entry.get("drive_file_id"):
+            return NEEDS_UPLOAD
+        return CURRENT
+
+    def record(
+        self,
+        notebook_path,
+        output_path,
+        template_hash,
+        converter_version,
+        drive_file_id=None,
+    ):
+        """
+        Stores the fingerprints of a freshly built (and possibly uploaded) notebook.
+        """
+        key = os.path.abspath(notebook_path)
+        entry = {
+            "source_hash": file_hash(notebook_path),
+            "source_stat": _stat_key(notebook_path),
+            "template_hash": template_hash,
+            "converter_version": converter_version,
+            "output_path": os.path.abspath(output_path),
+            "output_hash": file_hash(output_path),
+            "output_stat": _stat_key(output_path),
+            "drive_file_id": drive_file_id,
+        }
+        with self._lock:
+            previous = self.entries.get(key, {})
+            if drive_file_id is None and (
+                previous.get("output_hash") == entry["output_hash"]
+            ):
+                entry["drive_file_id"] = previous.get("drive_file_id")
+            self.entries[key] = entry
+            self._dirty = True
+
+    def save(self):
+        """
+        Writes the manifest atomically if anything changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            folder = os.path.dirname(self.path) or "."
+            fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.entries, f, indent=4)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._dirty = False
+        log_message(INFO, f"Build manifest saved to: {self.path}")
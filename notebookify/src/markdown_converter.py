@@ -1,19 +1,142 @@
 import nbformat
+import hashlib
+import importlib.util
+from contextlib import contextmanager
 from jinja2 import Environment, FileSystemLoader
 from utils import (
     safe_create_folder,
+    file_mode,
     handle_unsupported_output,
     get_template_path,
 )
 import os
-from logger import log_message, INFO, WARNING, ERROR
+import tempfile
+from assets import AssetWriter
+from manifest import BuildManifest
+from cell_cache import CellCache, DEFAULT_CACHE_SIZE
+from template_cache import TemplateBytecodeCache
+from notebook_stream import StreamedNotebook
+from profiler import get_profiler
+from mime_handlers import get_mime_registry, RenderContext
+from logger import log_message, DEBUG, INFO, WARNING, ERROR
 from utils import (
     load_metadata,
     save_metadata,
     detect_github_root,
     get_metadata_path,
 )
-from drive import upload_to_google_drive
+
+# Bump whenever a change alters the generated Markdown, so incremental builds
+# rebuild notebooks converted by older versions.
+CONVERTER_VERSION = "0.5"
+
+
+class _LazyRenderer:
+    """
+    Builds a Plotly renderer on its first snapshot, so numpy or a browser
+    pool is only loaded for notebooks that actually contain Plotly output.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._renderer = None
+
+    def snapshot(self, figure, assets):
+        if self._renderer is None:
+            self._renderer = self._factory()
+        return self._renderer.snapshot(figure, assets)
+
+
+def _svg_renderer():
+    from plotly_svg import SvgPlotlyRenderer
+
+    return SvgPlotlyRenderer()
+
+
+def _browser_renderer(browsers):
+    from iframe_utils import (
+        PlotlySnapshotRenderer,
+        get_browser_pool,
+        DEFAULT_POOL_SIZE,
+    )
+
+    return PlotlySnapshotRenderer(
+        get_browser_pool(browsers or DEFAULT_POOL_SIZE)
+    )
+
+
+def get_plotly_renderer(kind=None, browsers=None):
+    """
+    Renderer turning Plotly outputs into image assets, or None to keep the
+    placeholder. The renderer itself is imported and built on first use.
+
+    Args:
+        kind (str, optional): "svg" for SVG rendered in-process, "browser"
+            for PNG snapshots from a pool of headless browsers, or "none".
+        browsers (int, optional): Size of the browser pool.
+    """
+    if not kind or kind == "none":
+        return None
+    if kind == "svg":
+        return _LazyRenderer("svg", _svg_renderer)
+    if kind == "browser":
+        # Fail at startup rather than at the first figure when selenium is
+        # missing; it is only imported once a figure needs a snapshot.
+        if importlib.util.find_spec("selenium") is None:
+            raise ImportError(
+                "Browser snapshots require selenium; install it with "
+                "'pip install notebookify[browser]'."
+            )
+        return _LazyRenderer("browser", lambda: _browser_renderer(browsers))
+    raise ValueError(f"Unknown Plotly snapshot renderer: {kind}")
+
+
+def options_salt(
+    plotly_snapshots=None,
+    optimize_images=False,
+    max_image_width=None,
+    webp=False,
+    **options,
+):
+    """
+    Fingerprint of the converter options that change what a notebook
+    converts to: the Plotly renderer and the image optimization settings.
+    Accepts the same keyword arguments as MarkdownConverter.
+    """
+    renderer = "" if plotly_snapshots in (None, "none") else plotly_snapshots
+    images = ""
+    if optimize_images:
+        images = f"w{max_image_width or 0}:{'webp' if webp else 'png'}"
+    return f"{renderer}:{images}"
+
+
+def _then(chunks, callback):
+    """Yields every chunk, then calls `callback` before finishing."""
+    yield from chunks
+    callback()
+
+
+_converters = {}
+
+
+def get_converter(template_dir, **options):
+    """
+    Shared MarkdownConverter for `template_dir` and `options`, so the Jinja
+    environment, its compiled templates and the caches are built once per
+    process instead of once per notebook.
+
+    Args:
+        template_dir (str): Directory containing Jinja2 templates.
+        **options: Keyword arguments for MarkdownConverter.
+    """
+    key = (os.path.abspath(template_dir), tuple(sorted(options.items())))
+    converter = _converters.get(key)
+    if converter is None:
+        converter = _converters[key] = MarkdownConverter(
+            template_dir, **options
+        )
+    return converter
 
 
 class MarkdownConverter:
@@ -21,8 +144,45 @@ class MarkdownConverter:
     A class for converting Jupyter notebooks to Markdown using Jinja2 templates.
     """
 
-    def __init__(self, template_dir):
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+    def __init__(
+        self,
+        template_dir,
+        cache_dir=None,
+        cache_size=DEFAULT_CACHE_SIZE,
+        stream=False,
+        plotly_snapshots=None,
+        browsers=None,
+        template_cache_dir=None,
+        optimize_images=False,
+        max_image_width=None,
+        webp=False,
+        image_workers=None,
+        image_cache_dir=None,
+    ):
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            bytecode_cache=(
+                TemplateBytecodeCache(template_cache_dir)
+                if template_cache_dir
+                else None
+            ),
+        )
+        self.stream = stream
+        self.plotly_renderer = get_plotly_renderer(plotly_snapshots, browsers)
+        self.cell_cache = (
+            CellCache(cache_dir, cache_size) if cache_dir else None
+        )
+        self.image_optimizer = None
+        if optimize_images:
+            from image_optimizer import ImageOptimizer
+
+            self.image_optimizer = ImageOptimizer(
+                max_image_width, webp, image_workers, image_cache_dir
+            )
+        self._options_salt = options_salt(
+            plotly_snapshots, optimize_images, max_image_width, webp
+        )
+        self._template_salts = {}
 
     def convert(
         self, notebook_path, output_path, template_name="template.jinja2"
@@ -30,15 +190,40 @@ class MarkdownConverter:
         """
         Converts a notebook to Markdown using a Jinja2 template.
         """
+        profiler = get_profiler()
         try:
-            log_message(INFO, f"Converting notebook: {notebook_path}")
-            notebook = self._load_notebook(notebook_path)
-            processed_cells = self._process_cells(notebook["cells"])
-
+            log_message(INFO, "Converting notebook: %s", notebook_path)
+            assets = AssetWriter(
+                os.path.dirname(output_path), optimizer=self.image_optimizer
+            )
             template = self.env.get_template(template_name)
-            markdown_output = template.render(cells=processed_cells)
-
-            self._save_markdown(output_path, markdown_output)
+            cache_stats = self._cache_stats()
+            with profiler.notebook(), self._notebook_cells(
+                notebook_path
+            ) as cells:
+                processed_cells = self._process_cells(
+                    cells,
+                    assets,
+                    template=template,
+                    cache=self.cell_cache,
+                    salt=self._template_salt(template),
+                    plotly=self.plotly_renderer,
+                )
+                # Chunks are written as the template produces them, so
+                # neither the cells nor the Markdown are held in full.
+                # Deferred assets finish before the file is moved into place.
+                chunks = _then(
+                    template.generate(cells=processed_cells), assets.wait
+                )
+                with profiler.stage("save_markdown"):
+                    self._save_markdown(
+                        output_path, profiler.iterate(chunks, "render")
+                    )
+            if self.cell_cache:
+                hits, misses = self._cache_stats(cache_stats)
+                log_message(
+                    DEBUG, "Cell cache: %d hits, %d misses.", hits, misses
+                )
             log_message(
                 INFO, f"Conversion complete. Output saved to: {output_path}"
             )
@@ -46,6 +231,75 @@ class MarkdownConverter:
             log_message(ERROR, f"Error converting notebook: {e}")
             raise
 
+    def _cache_stats(self, since=(0, 0)):
+        """
+        Cell cache hit and miss counts, relative to an earlier snapshot.
+        """
+        if not self.cell_cache:
+            return (0, 0)
+        return (
+            self.cell_cache.hits - since[0],
+            self.cell_cache.misses - since[1],
+        )
+
+    def _template_salt(self, template):
+        """
+        Fingerprint of the converter version, template source and options
+        used to key cached cells. Memoized per template file and
+        modification time.
+        """
+        stamp = (template.filename, os.path.getmtime(template.filename))
+        if stamp not in self._template_salts:
+            with open(template.filename, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self._template_salts[stamp] = (
+                f"{CONVERTER_VERSION}:{digest}:{self._options_salt}"
+            )
+        return self._template_salts[stamp]
+
+    @contextmanager
+    def _notebook_cells(self, notebook_path):
+        """
+        Yields the notebook's cells: a lazy iterator over the file in streaming
+        mode, otherwise the list from a full `nbformat.read`.
+        """
+        profiler = get_profiler()
+        profiler.count("bytes_read", os.path.getsize(notebook_path))
+        with profiler.stage("load_notebook"):
+            streamed = (
+                self._stream_notebook(notebook_path) if self.stream else None
+            )
+            if streamed is None:
+                cells = self._load_notebook(notebook_path)["cells"]
+        if streamed is None:
+            yield cells
+            return
+        with streamed:
+            # Streamed cells are parsed as they are consumed.
+            yield profiler.iterate(streamed.iter_cells(), "load_notebook")
+
+    @staticmethod
+    def _stream_notebook(notebook_path):
+        """
+        Opens a notebook for streaming. Returns None for pre-v4 notebooks, which
+        need nbformat's conversion and are loaded in full instead.
+        """
+        try:
+            streamed = StreamedNotebook(notebook_path)
+        except Exception as e:
+            log_message(
+                ERROR, f"Failed to load notebook: {notebook_path}. Error: {e}"
+            )
+            raise
+        if streamed.nbformat < 4:
+            streamed.close()
+            log_message(
+                WARNING,
+                f"Streaming requires nbformat 4; loading {notebook_path} in full.",
+            )
+            return None
+        return streamed
+
     @staticmethod
     def _load_notebook(notebook_path):
         """
@@ -61,97 +315,210 @@ class MarkdownConverter:
             raise
 
     @staticmethod
-    def _process_cells(cells):
+    def _process_cells(
+        cells, assets=None, template=None, cache=None, salt="", plotly=None
+    ):
         """
-        Processes notebook cells and extracts their outputs.
+        Processes notebook cells and extracts their outputs, yielding each cell
+        once it is processed so lazily loaded cells are handled as they arrive.
+        Images are written through `assets` when an AssetWriter is given, and
+        Plotly figures are snapshotted by the `plotly` renderer.
+
+        When the template defines a `render_cell` macro, each cell is also
+        rendered to `cell.fragment`, and with a CellCache unchanged cells are
+        restored from the cache instead of being processed again.
         """
+        render_cell = (
+            getattr(template.module, "render_cell", None) if template else None
+        )
+        if not render_cell:
+            cache = None
+        profiler = get_profiler()
+
         for cell in cells:
-            if "outputs" in cell:
-                cell["processed_outputs"] = [
-                    MarkdownConverter._process_output(output)
-                    for output in cell["outputs"]
-                ]
-        return cells
+            # Stages must not stay open across the yield, where the caller
+            # runs its own stages.
+            with profiler.stage("process_cells"):
+                MarkdownConverter._process_cell(
+                    cell, assets, render_cell, cache, salt, plotly
+                )
+            yield cell
 
     @staticmethod
-    def _process_output(output):
+    def _process_cell(cell, assets, render_cell, cache, salt, plotly):
         """
-        Processes individual cell outputs based on their types.
+        Processes one cell in place, or restores it from the cell cache.
         """
-        try:
-            if output["output_type"] == "execute_result":
-                if "text/plain" in output.data:
-                    return output.data["text/plain"]
-                elif "image/png" in output.data:
-                    return f"![Image](data:image/png;base64,{output.data['image/png']})"
-                elif "application/vnd.plotly.v1+json" in output.data:
-                    return MarkdownConverter._process_plotly_output(
-                        output.data["application/vnd.plotly.v1+json"]
-                    )
-            return handle_unsupported_output(output)
-        except Exception as e:
-            log_message(ERROR, f"Error processing output: {e}")
-            return handle_unsupported_output(output)
+        profiler = get_profiler()
+        if profiler.enabled:
+            for output in cell.get("outputs", []):
+                for mime_type in output.get("data") or (
+                    output.get("output_type"),
+                ):
+                    profiler.count("outputs", label=mime_type)
+        key = None
+        if cache is not None:
+            key = cache.key(cell, salt)
+            if MarkdownConverter._restore_cell(cell, cache.get(key), assets):
+                profiler.count("cell_cache", label="hit")
+                return
+            profiler.count("cell_cache", label="miss")
+
+        if "outputs" in cell:
+            cell["processed_outputs"] = [
+                MarkdownConverter._process_output(output, assets, plotly)
+                for output in cell["outputs"]
+            ]
+        if render_cell:
+            with profiler.stage("render"):
+                cell["fragment"] = str(render_cell(cell))
+        if key:
+            cache.put(key, MarkdownConverter._cache_entry(cell))
 
     @staticmethod
-    def _process_plotly_output(plotly_data):
+    def _cache_entry(cell):
         """
-        Processes Plotly outputs.
-        Currently a placeholder; add functionality as needed.
+        The parts of a processed cell that are stored in the cell cache.
         """
-        log_message(
-            INFO, "Processing Plotly output. Placeholder logic in place."
-        )
-        return "<!-- Plotly output placeholder -->"
+        return {
+            "processed_outputs": cell.get("processed_outputs"),
+            "image_names": [
+                output.get("image_name") for output in cell.get("outputs", [])
+            ],
+            "plotly_snapshots": [
+                output.get("plotly_snapshot")
+                for output in cell.get("outputs", [])
+            ],
+            "fragment": cell["fragment"],
+        }
+
+    @staticmethod
+    def _restore_cell(cell, entry, assets):
+        """
+        Applies a cached entry to `cell`. Returns False when there is no entry or
+        an image it references is missing from the assets folder.
+        """
+        if not entry:
+            return False
+        image_names = entry["image_names"]
+        snapshots = entry.get("plotly_snapshots") or [None] * len(image_names)
+        if assets is not None and not all(
+            assets.exists(name) for name in image_names + snapshots if name
+        ):
+            return False
+        for output, image_name, snapshot in zip(
+            cell.get("outputs", []), image_names, snapshots
+        ):
+            if image_name:
+                output["image_name"] = image_name
+            if snapshot:
+                output["plotly_snapshot"] = snapshot
+        if entry["processed_outputs"] is not None:
+            cell["processed_outputs"] = entry["processed_outputs"]
+        cell["fragment"] = entry["fragment"]
+        return True
+
+    @staticmethod
+    def _process_output(output, assets=None, plotly=None):
+        """
+        Renders one output to Markdown with the handler registered for its
+        preferred MIME type (see mime_handlers). Images and Plotly snapshots
+        are written through `assets` when given, and inlined otherwise.
+        """
+        try:
+            rendered = get_mime_registry().render(
+                output, RenderContext(assets, plotly)
+            )
+            if rendered is not None:
+                return rendered
+        except Exception as e:
+            log_message(ERROR, f"Error processing output: {e}")
+        return handle_unsupported_output(output)
 
     @staticmethod
     def _save_markdown(output_path, markdown_output):
         """
         Saves the generated Markdown content to the specified path.
+        `markdown_output` is a string or an iterable of string chunks. The file
+        is written to a temporary name and renamed into place, so readers never
+        see a partially written file.
         """
-        safe_create_folder(os.path.dirname(output_path))
+        folder = os.path.dirname(output_path)
+        safe_create_folder(folder)
+        if isinstance(markdown_output, str):
+            markdown_output = (markdown_output,)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=folder or ".",
+            prefix=f".{os.path.basename(output_path)}.",
+            suffix=".tmp",
+        )
         try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(markdown_output)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(markdown_output)
+            os.chmod(tmp_path, file_mode(output_path))
+            os.replace(tmp_path, output_path)
+            get_profiler().count("bytes_written", os.path.getsize(output_path))
         except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             log_message(ERROR, f"Error saving Markdown file: {e}")
             raise
 
 
 def process_batch_notebooks(
-    notebook_paths, output_dir, template_dir, drive_service=None, refresh=False
+    notebook_paths,
+    output_dir,
+    template_dir,
+    drive_service=None,
+    refresh=False,
+    jobs=None,
+    force=False,
+    converter_options=None,
+    sync_folders=False,
+    service_factory=None,
+    upload_workers=None,
 ):
     """
     Processes a batch of notebooks, converts them to Markdown, and optionally uploads them to Google Drive.
 
     Args:
-        notebook_paths (list): Paths to Jupyter notebooks to process.
+        notebook_paths (iterable): Paths to Jupyter notebooks to process.
         output_dir (str): Directory to save converted Markdown files.
         template_dir (str): Directory containing Jinja2 templates.
         drive_service (object, optional): Google Drive service object for uploading files.
         refresh (bool): Whether to refresh metadata for uploads.
-    """
-    converter = MarkdownConverter(template_dir)
+        jobs (int, optional): Number of conversion worker processes.
+        force (bool): Rebuild every notebook instead of skipping those the
+            build manifest reports as up to date.
+        converter_options (dict, optional): Keyword arguments for each
+            worker's MarkdownConverter, such as `cache_dir`.
+        sync_folders (bool): Create Drive folders in bulk before uploading.
+        service_factory (callable, optional): Builds a Drive client per upload
+            thread, enabling concurrent uploads.
+        upload_workers (int, optional): Number of concurrent uploads.
 
-    for notebook_path in notebook_paths:
-        try:
-            log_message(INFO, f"Processing notebook: {notebook_path}")
-            output_file = os.path.join(
-                output_dir,
-                os.path.basename(notebook_path).replace(".ipynb", ".md"),
-            )
-            # Convert the notebook to Markdown
-            converter.convert(notebook_path, output_file)
+    Returns:
+        BatchSummary: Per-notebook results and errors.
+    """
+    # Imported here because the batch engine imports this module for its
+    # worker processes.
+    from batch import run_batch
 
-            # Upload to Google Drive if service is provided
-            if drive_service:
-                upload_to_google_drive(
-                    drive_service, output_file, refresh=refresh
-                )
-        except Exception as e:
-            log_message(
-                ERROR, f"Error processing notebook {notebook_path}: {e}"
-            )
+    summary = run_batch(
+        notebook_paths,
+        output_dir,
+        template_dir,
+        drive_service=drive_service,
+        refresh=refresh,
+        jobs=jobs,
+        manifest=None if force else BuildManifest(),
+        converter_options=converter_options,
+        sync_folders=sync_folders,
+        service_factory=service_factory,
+        upload_workers=upload_workers,
+    )
+    summary.log()
+    return summary
 
 
 def update_markdown_with_colab_link(md_file_path, colab_link):
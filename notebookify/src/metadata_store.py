@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import time
+from threading import Lock, local
+
+from logger import log_message, INFO, WARNING
+
+# Seconds a writer waits for another process's transaction to finish.
+BUSY_TIMEOUT = 30
+# Key under which JSON metadata kept folder validation times.
+LEGACY_VALIDATED_AT_KEY = "folder_validated_at"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    validated_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS store_info (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class MetadataStore:
+    """
+    Drive metadata in an SQLite database in WAL mode.
+
+    Every key is a row, so lookups and writes touch one indexed row instead of
+    rewriting a JSON file, and changes are committed in batches with
+    `write`. SQLite's locking lets parallel notebookify runs share the
+    database: readers never block, and writers wait up to BUSY_TIMEOUT for
+    each other instead of overwriting each other's folder IDs.
+
+    On first open, the contents of `legacy_path` (the old JSON metadata
+    file) are imported once; the JSON file is left in place.
+    """
+
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        self._local = local()
+        self._connect().executescript(_SCHEMA)
+        if legacy_path:
+            self._migrate(legacy_path)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connect())
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """
+        Returns ``(value, validated_at)`` for `key`, or None.
+        """
+        row = (
+            self._connect()
+            .execute(
+                "SELECT value, validated_at FROM entries WHERE key = ?", (key,)
+            )
+            .fetchone()
+        )
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def as_dict(self):
+        """All entries as a plain dict."""
+        rows = self._connect().execute("SELECT key, value FROM entries")
+        return {key: json.loads(value) for key, value in rows}
+
+    def write(self, values=None, validated_at=None):
+        """
+        Commits many changes in one transaction.
+
+        Args:
+            values (dict): Keys mapped to new values; None deletes the key.
+            validated_at (dict): Keys mapped to their folder validation time.
+        """
+        values = values or {}
+        validated_at = validated_at or {}
+        with self._transaction() as conn:
+            conn.executemany(
+                "DELETE FROM entries WHERE key = ?",
+                [(key,) for key, value in values.items() if value is None],
+            )
+            conn.executemany(
+                "INSERT INTO entries (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                [
+                    (key, json.dumps(value))
+                    for key, value in values.items()
+                    if value is not None
+                ],
+            )
+            conn.executemany(
+                "UPDATE entries SET validated_at = ? WHERE key = ?",
+                [(at, key) for key, at in validated_at.items()],
+            )
+
+    def replace(self, values):
+        """Replaces every entry with `values`."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.executemany(
+                "INSERT INTO entries (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in values.items()],
+            )
+
+    def _migrate(self, legacy_path):
+        with self._transaction() as conn:
+            done = conn.execute(
+                "SELECT 1 FROM store_info WHERE name = 'migrated_from'"
+            ).fetchone()
+            if done:
+                return
+            metadata = _read_legacy(legacy_path)
+            validated_at = metadata.pop(LEGACY_VALIDATED_AT_KEY, None)
+            if not isinstance(validated_at, dict):
+                validated_at = {}
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (key, value, validated_at) "
+                "VALUES (?, ?, ?)",
+                [
+                    (key, json.dumps(value), validated_at.get(key, 0))
+                    for key, value in metadata.items()
+                ],
+            )
+            conn.execute(
+                "INSERT INTO store_info (name, value) VALUES (?, ?)",
+                ("migrated_from", json.dumps([legacy_path, time.time()])),
+            )
+        if metadata:
+            log_message(
+                INFO,
+                f"Migrated {len(metadata)} metadata entries from "
+                f"{legacy_path} to {self.path}.",
+            )
+
+
+class _Transaction:
+    """
+    ``BEGIN IMMEDIATE`` ... ``COMMIT`` block. Taking the write lock up front
+    means concurrent writers queue on the busy timeout instead of failing
+    midway through a read-modify-write.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, *exc_info):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _read_legacy(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            metadata = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        log_message(WARNING, f"Could not migrate corrupted metadata: {path}")
+        return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+_stores = {}
+_stores_lock = Lock()
+
+
+def get_metadata_store(path, legacy_path=None):
+    """
+    Returns the process-wide MetadataStore for `path`, opening it on first
+    use.
+    """
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MetadataStore(path, legacy_path)
+        return _stores[path]
@@ -0,0 +1,295 @@
+import base64
+import re
+import time
+from threading import Lock
+
+from assets import IMAGE_EXTENSIONS
+from profiler import get_profiler
+from logger import log_message, INFO, WARNING
+
+PLOTLY_MIME_TYPE = "application/vnd.plotly.v1+json"
+# Entry point group for third-party handlers: each entry point names a
+# callable that is given the registry and registers its handlers.
+ENTRY_POINT_GROUP = "notebookify.mime_handlers"
+_ANSI = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+class MimeHandler:
+    """
+    Renders outputs to Markdown. `keys` are the MIME types (or, for outputs
+    without a data bundle such as ``stream`` and ``error``, the output
+    types) it handles; among the keys present in an output, the handler
+    with the highest `priority` wins.
+
+    `render(output, value, context)` gets the output, the value stored
+    under the matched key and the RenderContext, and returns Markdown.
+    """
+
+    def __init__(self, name, keys, render, priority=0):
+        self.name = name
+        self.keys = tuple(keys)
+        self.render = render
+        self.priority = priority
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f"MimeHandler({self.name}, priority={self.priority})"
+
+
+class RenderContext:
+    """
+    What handlers may use besides the output: the AssetWriter for the
+    notebook (None when outputs are inlined) and the Plotly renderer.
+    """
+
+    def __init__(self, assets=None, plotly=None):
+        self.assets = assets
+        self.plotly = plotly
+
+
+class MimeRegistry:
+    """
+    Handlers by key, resolved through a lookup table built once after the
+    last registration: dispatch is a single pass over an output's keys.
+    """
+
+    def __init__(self):
+        self.handlers = []
+        self._table = None
+        self._lock = Lock()
+
+    def register(self, handler):
+        """Adds a MimeHandler, replacing any earlier one with its name."""
+        with self._lock:
+            self.handlers = [
+                h for h in self.handlers if h.name != handler.name
+            ] + [handler]
+            self._table = None
+        return handler
+
+    def handler(self, *keys, name=None, priority=0):
+        """Decorator registering a render function for `keys`."""
+
+        def decorate(render):
+            self.register(
+                MimeHandler(name or render.__name__, keys, render, priority)
+            )
+            return render
+
+        return decorate
+
+    def _build(self):
+        # Later registrations win ties, so plugins can override built-ins.
+        table = {}
+        for order, handler in enumerate(self.handlers):
+            rank = (handler.priority, order)
+            for key in handler.keys:
+                if key not in table or table[key][0] < rank:
+                    table[key] = (rank, handler)
+        return table
+
+    def dispatch(self, output):
+        """
+        The handler for `output` and the key it matched, or (None, None).
+        """
+        table = self._table
+        if table is None:
+            with self._lock:
+                if self._table is None:
+                    self._table = self._build()
+                table = self._table
+        data = output.get("data")
+        if not data:
+            output_type = output.get("output_type")
+            entry = table.get(output_type)
+            return (entry[1], output_type) if entry else (None, None)
+        best = None
+        best_key = None
+        for key in data:
+            entry = table.get(key)
+            if entry is not None and (best is None or entry[0] > best[0]):
+                best = entry
+                best_key = key
+        return (best[1], best_key) if best else (None, None)
+
+    def render(self, output, context):
+        """
+        Renders `output` with its handler. Returns None when no handler
+        matches.
+        """
+        handler, key = self.dispatch(output)
+        if handler is None:
+            return None
+        value = output["data"][key] if output.get("data") else output
+        started = time.perf_counter()
+        try:
+            return handler.render(output, value, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            handler.calls += 1
+            handler.seconds += elapsed
+            profiler = get_profiler()
+            profiler.count("mime_handlers", label=handler.name)
+            profiler.count("mime_handler_seconds", elapsed, label=handler.name)
+
+    def stats(self):
+        """Calls and total seconds per handler name."""
+        return {
+            h.name: {"calls": h.calls, "seconds": round(h.seconds, 6)}
+            for h in self.handlers
+        }
+
+    def load_plugins(self):
+        """Registers the handlers of installed ``notebookify`` plugins."""
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            return
+        found = entry_points()
+        if hasattr(found, "select"):
+            found = found.select(group=ENTRY_POINT_GROUP)
+        else:
+            found = found.get(ENTRY_POINT_GROUP, [])
+        for entry_point in found:
+            try:
+                entry_point.load()(self)
+                log_message(
+                    INFO, "Loaded output handlers: %s", entry_point.name
+                )
+            except Exception as e:
+                log_message(
+                    WARNING,
+                    f"Could not load output handlers {entry_point.name}: {e}",
+                )
+
+
+def _text(value):
+    return "".join(value) if isinstance(value, list) else str(value)
+
+
+def _fenced(text, info=""):
+    """A fenced code block longer than any backtick run inside `text`."""
+    runs = re.findall(r"`{3,}", text)
+    fence = "`" * max([3] + [len(run) + 1 for run in runs])
+    text = text.rstrip("\n")
+    return f"{fence}{info}\n{text}\n{fence}"
+
+
+def _render_stream(output, value, context):
+    return _fenced(_ANSI.sub("", _text(output.get("text", ""))))
+
+
+def _render_error(output, value, context):
+    traceback = output.get("traceback")
+    if traceback:
+        text = "\n".join(_ANSI.sub("", line) for line in traceback)
+    else:
+        text = f"{output.get('ename', 'Error')}: {output.get('evalue', '')}"
+    return _fenced(text)
+
+
+def _render_plotly(output, value, context):
+    if context.assets is not None and context.plotly is not None:
+        output["plotly_snapshot"] = context.plotly.snapshot(
+            value, context.assets
+        )
+        if output["plotly_snapshot"]:
+            return (
+                "![Static Plotly Snapshot]"
+                f"({context.assets.relpath(output['plotly_snapshot'])})"
+            )
+    # Not rendered, e.g. with ``--plotly-snapshots none`` or unsupported
+    # trace types.
+    return "<!-- Plotly output placeholder -->"
+
+
+def _image_renderer(mime_type, extension):
+    def render(output, value, context):
+        if context.assets is None:
+            return f"![Image](data:{mime_type};base64,{_text(value)})"
+        output["image_name"] = context.assets.write_base64(value, extension)
+        return f"![Image]({context.assets.relpath(output['image_name'])})"
+
+    return render
+
+
+def _render_svg(output, value, context):
+    svg = _text(value)
+    if context.assets is None:
+        encoded = base64.b64encode(svg.encode("utf-8")).decode("ascii")
+        return f"![Image](data:image/svg+xml;base64,{encoded})"
+    output["image_name"] = context.assets.write_bytes(
+        svg.encode("utf-8"), "svg"
+    )
+    return f"![Image]({context.assets.relpath(output['image_name'])})"
+
+
+def _render_verbatim(output, value, context):
+    # HTML, Markdown and LaTeX math are all understood by Markdown viewers.
+    return _text(value)
+
+
+def _render_plain(output, value, context):
+    return _fenced(_ANSI.sub("", _text(value)))
+
+
+def _builtin_handlers():
+    """
+    Handlers shipped with notebookify, preferring (as nbconvert does for
+    Markdown) rendered figures over HTML over plain text.
+    """
+    handlers = [
+        MimeHandler("stream", ["stream"], _render_stream),
+        MimeHandler("error", ["error"], _render_error),
+        MimeHandler("plotly", [PLOTLY_MIME_TYPE], _render_plotly, 100),
+    ]
+    for rank, (mime_type, extension) in enumerate(IMAGE_EXTENSIONS.items()):
+        handlers.append(
+            MimeHandler(
+                extension,
+                [mime_type],
+                _image_renderer(mime_type, extension),
+                90 - rank,
+            )
+        )
+    handlers += [
+        MimeHandler("svg", ["image/svg+xml"], _render_svg, 80),
+        MimeHandler("html", ["text/html"], _render_verbatim, 70),
+        MimeHandler("markdown", ["text/markdown"], _render_verbatim, 60),
+        MimeHandler("latex", ["text/latex"], _render_verbatim, 50),
+        MimeHandler("plain", ["text/plain"], _render_plain, 10),
+    ]
+    return handlers
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def get_mime_registry():
+    """
+    The process-wide registry: built-in handlers plus installed plugins,
+    loaded on first use.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = MimeRegistry()
+                for handler in _builtin_handlers():
+                    registry.register(handler)
+                registry.load_plugins()
+                _registry = registry
+    return _registry
+
+
+def register_mime_handler(*keys, name=None, priority=0):
+    """
+    Decorator adding a render function to the process-wide registry, e.g.::
+
+        @register_mime_handler("application/geo+json", priority=75)
+        def render_map(output, value, context):
+            ...
+    """
+    return get_mime_registry().handler(*keys, name=name, priority=priority)
@@ -0,0 +1,142 @@
+import json
+import mmap
+import re
+
+import nbformat
+from nbformat.v4.rwbase import rejoin_lines
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_STRUCTURAL = re.compile(rb'["{}\[\]]')
+_SCALAR_END = re.compile(rb"[,\]}\s]")
+
+
+class StreamedNotebook:
+    """
+    Lazily parsed view of a notebook file.
+
+    The file is memory-mapped and scanned once to find the top-level keys. All
+    values except ``cells`` are decoded immediately (they are small); cells are
+    decoded one at a time by `iter_cells`, so peak memory is bounded by the
+    largest cell instead of the whole notebook.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = {}
+        self._cells_span = None
+        self._scan_top_level()
+
+    @property
+    def nbformat(self):
+        return self.header.get("nbformat", 0)
+
+    def close(self):
+        self._buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def iter_cells(self):
+        """
+        Yields each cell as a NotebookNode, normalized like `nbformat.read`
+        (multiline strings rejoined, transient metadata dropped) but without
+        validating the whole document.
+        """
+        if not self._cells_span:
+            return
+        buf = self._buf
+        pos, end = self._cells_span
+        pos = self._skip_whitespace(pos + 1)  # past "["
+        while pos < end and buf[pos : pos + 1] != b"]":
+            value_end = _skip_value(buf, pos)
+            yield _to_cell_node(json.loads(buf[pos:value_end]))
+            pos = self._skip_whitespace(value_end)
+            if buf[pos : pos + 1] == b",":
+                pos = self._skip_whitespace(pos + 1)
+
+    def _skip_whitespace(self, pos):
+        return _WHITESPACE.match(self._buf, pos).end()
+
+    def _expect(self, pos, token):
+        pos = self._skip_whitespace(pos)
+        if self._buf[pos : pos + 1] != token:
+            raise ValueError(
+                f"Malformed notebook JSON in {self.path}: expected "
+                f"{token.decode()} at byte {pos}"
+            )
+        return pos + 1
+
+    def _scan_top_level(self):
+        buf = self._buf
+        pos = self._expect(0, b"{")
+        while True:
+            pos = self._skip_whitespace(pos)
+            if buf[pos : pos + 1] == b"}":
+                return
+            key_end = _string_end(buf, pos)
+            key = json.loads(buf[pos:key_end])
+            pos = self._skip_whitespace(self._expect(key_end, b":"))
+            value_end = _skip_value(buf, pos)
+            if key == "cells":
+                self._cells_span = (pos, value_end)
+            else:
+                self.header[key] = json.loads(buf[pos:value_end])
+            pos = self._skip_whitespace(value_end)
+            if buf[pos : pos + 1] == b",":
+                pos += 1
+
+
+def _string_end(buf, pos):
+    """
+    Position just past the JSON string starting at `pos`. Uses `find` so long
+    base64 payloads are skipped at memchr speed.
+    """
+    end = pos + 1
+    while True:
+        end = buf.find(b'"', end)
+        if end == -1:
+            raise ValueError("Unterminated string in notebook JSON")
+        backslashes = 0
+        while buf[end - 1 - backslashes] == 0x5C:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        end += 1
+
+
+def _skip_value(buf, pos):
+    """
+    Position just past the JSON value starting at `pos`, without decoding it.
+    """
+    first = buf[pos : pos + 1]
+    if first == b'"':
+        return _string_end(buf, pos)
+    if first not in (b"{", b"["):
+        match = _SCALAR_END.search(buf, pos)
+        return match.start() if match else len(buf)
+
+    depth = 0
+    while True:
+        match = _STRUCTURAL.search(buf, pos)
+        if not match:
+            raise ValueError("Unterminated container in notebook JSON")
+        token = match.group()
+        if token == b'"':
+            pos = _string_end(buf, match.start())
+            continue
+        depth += 1 if token in (b"{", b"[") else -1
+        pos = match.end()
+        if depth == 0:
+            return pos
+
+
+def _to_cell_node(cell):
+    node = rejoin_lines(nbformat.from_dict({"cells": [cell]})).cells[0]
+    node.get("metadata", {}).pop("trusted", None)
+    return node
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Thin client for a conversion server started with
+``notebookify_main.py --serve``.
+
+Only the standard library is imported, so handing a notebook to the warm
+server takes milliseconds instead of a full startup:
+
+    python src/notebookify_client.py path/to/notebook.ipynb
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 300
+
+
+def default_address():
+    """
+    The server's Unix socket next to the render cache, or a localhost port
+    where Unix sockets are not available.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return f"127.0.0.1:{DEFAULT_PORT}"
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, ".notebookify_cache", "notebookify.sock")
+
+
+def parse_address(address):
+    """
+    Splits a server address into ``("unix", path)`` or
+    ``("tcp", (host, port))``.
+
+    Paths (anything containing a slash, or prefixed with ``unix:``) are Unix
+    sockets; ``HOST:PORT``, ``:PORT`` and ``PORT`` are TCP, on 127.0.0.1
+    unless a host is given.
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:") :]
+    if "/" in address or os.sep in address:
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    try:
+        return "tcp", (host or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"Invalid server address: {address}") from None
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    """HTTP over a Unix socket."""
+
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(address, method, path, body=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Sends one JSON request to the server.
+
+    Returns:
+        tuple: The HTTP status and the decoded JSON reply.
+
+    Raises:
+        OSError: If no server is listening at `address`.
+    """
+    kind, target = parse_address(address)
+    if kind == "unix":
+        connection = _UnixConnection(target, timeout)
+    else:
+        connection = http.client.HTTPConnection(*target, timeout=timeout)
+    try:
+        headers = {}
+        payload = None
+        if body is not None or method == "POST":
+            # The server only accepts POSTs declared as JSON.
+            payload = json.dumps({} if body is None else body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+
+
+def convert(
+    notebook_path,
+    address=None,
+    output_dir=None,
+    upload=True,
+    wait=True,
+    timeout=DEFAULT_TIMEOUT,
+):
+    """
+    Queues a notebook on the server.
+
+    Args:
+        notebook_path (str): Notebook to convert; relative paths are resolved
+            here, since the server may run in another directory.
+        address (str, optional): Server address (see `parse_address`).
+        output_dir (str, optional): Directory for the Markdown file, next to
+            the notebook by default.
+        upload (bool): Upload the result if the server has Drive enabled.
+        wait (bool): Wait for the job to finish instead of returning once it
+            is queued.
+        timeout (float): Seconds to wait for the reply.
+
+    Returns:
+        tuple: The HTTP status and the job as a dict.
+    """
+    body = {
+        "notebook_path": os.path.abspath(notebook_path),
+        "output_dir": os.path.abspath(output_dir) if output_dir else None,
+        "upload": upload,
+        "wait": wait,
+    }
+    return request(
+        address or default_address(), "POST", "/convert", body, timeout
+    )
+
+
+def _describe(job):
+    if job.get("status") == "failed":
+        return (
+            f"Failed {job['notebook_path']} during {job['stage']}: "
+            f"{job['error']}"
+        )
+    if not job.get("done"):
+        return f"Queued {job['notebook_path']} as job {job['id']}"
+    return (
+        f"{job['status'].capitalize()} {job['notebook_path']} -> "
+        f"{job['output_path']} in {job['convert_seconds']:.2f}s"
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Send notebooks to a running notebookify server."
+    )
+    parser.add_argument("notebook_paths", nargs="*", metavar="NOTEBOOK")
+    parser.add_argument(
+        "--address",
+        default=default_address(),
+        help="Unix socket path or [HOST:]PORT of the server",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="Directory for the Markdown files"
+    )
+    parser.add_argument(
+        "--no-upload", action="store_true", help="Skip Google Drive upload"
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Return once the notebooks are queued",
+    )
+    parser.add_argument(
+        "--status", action="store_true", help="Print the server status"
+    )
+    parser.add_argument(
+        "--shutdown", action="store_true", help="Stop the server"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    failed = False
+    try:
+        if args.status:
+            _, status = request(args.address, "GET", "/status")
+            print(json.dumps(status, indent=2))
+        for notebook_path in args.notebook_paths:
+            code, job = convert(
+                notebook_path,
+                args.address,
+                args.output_dir,
+                upload=not args.no_upload,
+                wait=not args.no_wait,
+            )
+            if code >= 400:
+                print(job.get("error", f"HTTP {code}"), file=sys.stderr)
+                failed = True
+                continue
+            print(_describe(job))
+            failed = failed or job.get("status") == "failed"
+        if args.shutdown:
+            request(args.address, "POST", "/shutdown")
+            print("Server stopped.")
+    except OSError as e:
+        print(
+            f"No notebookify server at {args.address} ({e}); start one with "
+            "'notebookify_main.py --serve'.",
+            file=sys.stderr,
+        )
+        return 2
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,21 +5,30 @@ import argparse
 from colorama import Fore
 import sys
 
-from drive import (
-    authenticate_google_drive,
-    get_or_create_drive_folder,
-    upload_to_google_drive,
-)
-from markdown_converter import MarkdownConverter, process_batch_notebooks
+from profiler import enable_profiling, get_profiler
+from discovery import DirectoryIndex, find_notebooks
+from markdown_converter import get_converter, process_batch_notebooks
 from utils import (
     print_help,
     safe_create_folder,
-    load_metadata,
     save_metadata,
     detect_github_root,
+    forget_repo_roots,
     get_metadata_path,
+    get_cache_dir,
+    get_template_cache_dir,
+    get_image_cache_dir,
+    get_dir_index_path,
+)
+from logger import (
+    log_message,
+    configure_logging,
+    flush_logs,
+    DEBUG,
+    INFO,
+    WARNING,
+    ERROR,
 )
-from logger import log_message, INFO, WARNING, ERROR
 
 
 def parse_args():
@@ -34,6 +43,12 @@ def parse_args():
     parser.add_argument(
         "-b", "--batch", type=str, help="Process all notebooks in a directory"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of parallel conversion workers for batch mode",
+    )
     parser.add_argument(
         "-t",
         "--template",
@@ -45,9 +60,155 @@ def parse_args():
         action="store_true",
         help="Refresh Google Drive metadata",
     )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="GLOB",
+        help="Only process notebooks matching this glob in batch mode "
+        "(repeatable)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="GLOB",
+        help="Skip notebooks and folders matching this glob in batch mode "
+        "(repeatable)",
+    )
+    parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Also process notebooks ignored by .gitignore files",
+    )
+    parser.add_argument(
+        "--scan-workers",
+        type=int,
+        default=1,
+        help="Folders listed in parallel while looking for notebooks",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild all notebooks in batch mode, ignoring the build manifest",
+    )
     parser.add_argument(
         "--no-drive", action="store_true", help="Skip Google Drive upload"
     )
+    parser.add_argument(
+        "--folder-cache-ttl",
+        type=float,
+        help="Seconds to trust cached Drive folder IDs before revalidating "
+        "(default 86400)",
+    )
+    parser.add_argument(
+        "--sync-folders",
+        action="store_true",
+        help="List the Drive folder tree once and create missing folders in bulk",
+    )
+    parser.add_argument(
+        "--upload-workers",
+        type=int,
+        help="Number of concurrent Drive uploads in batch mode",
+    )
+    parser.add_argument(
+        "--drive-rate",
+        type=float,
+        help="Maximum Drive API calls per second (default 10)",
+    )
+    parser.add_argument(
+        "--drive-endpoint",
+        type=str,
+        help="Send Drive API calls to this base URL (e.g. a local test server)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the cell render and compiled template caches",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=512,
+        help="Maximum size of the cell render cache in MB",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read notebooks cell by cell to bound memory on very large files",
+    )
+    parser.add_argument(
+        "--plotly-snapshots",
+        choices=["svg", "browser", "none"],
+        default="svg",
+        help="Render Plotly outputs to static images with this renderer",
+    )
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        help="Number of warm headless browsers for browser snapshots",
+    )
+    parser.add_argument(
+        "--optimize-images",
+        action="store_true",
+        help="Recompress extracted PNGs losslessly before writing them",
+    )
+    parser.add_argument(
+        "--max-image-width",
+        type=int,
+        metavar="PX",
+        help="Also downscale images wider than this (requires Pillow)",
+    )
+    parser.add_argument(
+        "--webp",
+        action="store_true",
+        help="Also convert images to lossless WebP (requires Pillow)",
+    )
+    parser.add_argument(
+        "--image-workers",
+        type=int,
+        help="Processes optimizing images (default: CPU count)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each stage and print a summary at the end of the run",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=str,
+        help="Also write the profile to this file (.prom for Prometheus "
+        "text format, JSON otherwise); implies --profile",
+    )
+    parser.add_argument(
+        "--watch",
+        type=str,
+        metavar="DIRECTORY",
+        help="Convert notebooks in a directory as they are saved",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="Seconds without further saves before a watched change is "
+        "converted",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Watch by polling instead of inotify (e.g. network file systems)",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="",
+        metavar="ADDRESS",
+        help="Run a conversion server on a Unix socket path or [HOST:]PORT "
+        "(default: a socket in the cache folder)",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        help="Unfinished jobs the server accepts before refusing more",
+    )
     parser.add_argument(
         "--clean",
         action="store_true",
@@ -59,6 +220,26 @@ def parse_args():
         type=str,
         help="Specify an output directory for Markdown and assets",
     )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="Also log debug messages",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="count",
+        default=0,
+        help="Log only warnings and errors; twice for errors only",
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=("text", "json"),
+        default="text",
+        help="Log as colored text or as one JSON object per line",
+    )
     parser.add_argument(
         "notebook_path",
         nargs="?",
@@ -67,10 +248,71 @@ def parse_args():
     return parser.parse_args()
 
 
+def converter_options(args):
+    """Keyword arguments for MarkdownConverter derived from the CLI flags."""
+    return {
+        "cache_dir": None if args.no_cache else get_cache_dir(),
+        "cache_size": args.cache_size * 1024 * 1024,
+        "stream": args.stream,
+        "plotly_snapshots": args.plotly_snapshots,
+        "browsers": args.browsers,
+        "template_cache_dir": (
+            None if args.no_cache else get_template_cache_dir()
+        ),
+        "optimize_images": bool(
+            args.optimize_images or args.max_image_width or args.webp
+        ),
+        "max_image_width": args.max_image_width,
+        "webp": args.webp,
+        "image_workers": args.image_workers,
+        "image_cache_dir": None if args.no_cache else get_image_cache_dir(),
+    }
+
+
+def load_drive(args):
+    """
+    Imports the Drive modules and applies the Drive flags. Called only when
+    Drive is used, so ``--no-drive`` runs never import the Google API client.
+
+    Returns:
+        module: The `drive` module.
+    """
+    try:
+        import drive
+        from scheduler import configure_scheduler, DEFAULT_RATE
+    except ImportError as e:
+        raise ImportError(
+            f"Google Drive support is not installed ({e}); install it with "
+            "'pip install notebookify[drive]' or pass --no-drive."
+        ) from e
+    rate = args.drive_rate or DEFAULT_RATE
+    configure_scheduler(rate=rate, burst=max(1, rate * 2))
+    ttl = args.folder_cache_ttl
+    drive.get_folder_cache(
+        drive.DEFAULT_FOLDER_CACHE_TTL if ttl is None else ttl
+    )
+    return drive
+
+
+def drive_service_factory(args):
+    """
+    Returns a callable building one Drive client per upload thread.
+    Credentials are loaded once; a custom endpoint is used without them.
+    """
+    drive = load_drive(args)
+    endpoint = args.drive_endpoint
+    credentials = None if endpoint else drive.load_credentials()
+    return lambda: drive.build_drive_service(
+        credentials, api_endpoint=endpoint
+    )
+
+
 def refresh_metadata(service):
     """
     Refresh Google Drive metadata.
     """
+    from drive import get_or_create_drive_folder
+
     try:
         log_message(INFO, "Refreshing Google Drive metadata...")
         metadata = {}
@@ -84,7 +326,7 @@ def refresh_metadata(service):
         log_message(ERROR, f"Failed to refresh metadata: {e}")
 
 
-def process_notebook(notebook_path, args, metadata):
+def process_notebook(notebook_path, args):
     """Process a single notebook."""
     if not os.path.isfile(notebook_path) or not notebook_path.endswith(
         ".ipynb"
@@ -105,11 +347,11 @@ def process_notebook(notebook_path, args, metadata):
     # Upload Workflow
     try:
         output_dir = args.output_dir or os.path.dirname(notebook_path)
-        log_message(INFO, f"Output directory set to: {output_dir}")
+        log_message(DEBUG, "Output directory set to: %s", output_dir)
 
         # Convert notebook to Markdown
         template_dir = args.template or "templates"
-        converter = MarkdownConverter(template_dir)
+        converter = get_converter(template_dir, **converter_options(args))
         output_path = os.path.join(
             output_dir,
             os.path.basename(notebook_path).replace(".ipynb", ".md"),
@@ -118,8 +360,16 @@ def process_notebook(notebook_path, args, metadata):
 
         # Upload to Google Drive
         if not args.no_drive:
-            service = authenticate_drive()
-            drive_folder_id = metadata.get("drive_root", None)
+            service = drive_service_factory(args)()
+            from drive import (
+                get_folder_cache,
+                get_or_create_drive_folder,
+                upload_to_google_drive,
+                flush_folder_cache,
+            )
+
+            folder_cache = get_folder_cache()
+            drive_folder_id = folder_cache.get("drive_root")
             if not drive_folder_id:
                 drive_folder_id = get_or_create_drive_folder(
                     service,
@@ -129,10 +379,10 @@ def process_notebook(notebook_path, args, metadata):
                         else "Notebookify"
                     ),
                 )
-                metadata["drive_root"] = drive_folder_id
-                save_metadata(metadata)
+                folder_cache.set("drive_root", drive_folder_id)
 
-            upload_to_google_drive(service, output_path, drive_folder_id)
+            upload_to_google_drive(service, output_path)
+            flush_folder_cache()
         else:
             log_message(WARNING, "Google Drive upload skipped.")
     except Exception as e:
@@ -142,25 +392,114 @@ def process_notebook(notebook_path, args, metadata):
 def batch_process(directory, args):
     """
     Recursively processes all notebooks in a directory using the MarkdownConverter.
+    Notebooks are converted as discovery finds them.
     """
-    notebook_paths = [
-        os.path.join(root, file)
-        for root, _, files in os.walk(directory)
-        for file in files
-        if file.endswith(".ipynb")
-    ]
+    notebook_paths = find_notebooks(
+        directory,
+        include=args.include,
+        exclude=args.exclude,
+        gitignore=not args.no_gitignore,
+        workers=args.scan_workers,
+        index=None if args.no_cache else DirectoryIndex(get_dir_index_path()),
+    )
     process_batch_notebooks(
         notebook_paths,
         output_dir=args.output_dir,
-        template_dir=args.template,
-        drive_service=None if args.no_drive else authenticate_drive(),
+        template_dir=args.template or "templates",
+        service_factory=None if args.no_drive else drive_service_factory(args),
+        upload_workers=args.upload_workers,
         refresh=args.refresh_metadata,
+        jobs=args.jobs,
+        force=args.force,
+        converter_options=converter_options(args),
+        sync_folders=args.sync_folders,
     )
 
 
+def conversion_server(args):
+    """
+    A ConversionServer keeping converters, templates and the Drive clients
+    warm between jobs, configured from the CLI flags.
+    """
+    from server import ConversionServer, DEFAULT_MAX_QUEUE
+
+    return ConversionServer(
+        args.template or "templates",
+        converter_options(args),
+        jobs=args.jobs or 1,
+        max_queue=args.max_queue or DEFAULT_MAX_QUEUE,
+        service_factory=None if args.no_drive else drive_service_factory(args),
+        upload_workers=args.upload_workers,
+    )
+
+
+def run_server(args):
+    """
+    Serves conversions until stopped.
+    """
+    from notebookify_client import default_address
+    from server import serve
+
+    serve(conversion_server(args), args.serve or default_address())
+
+
+def watch(args):
+    """
+    Converts (and uploads) notebooks below ``--watch`` as they are saved,
+    until interrupted.
+    """
+    from collections import deque
+    from server import QueueFull
+    from watcher import NotebookWatcher
+
+    watcher = NotebookWatcher(
+        args.watch, debounce=args.debounce, poll=args.poll
+    )
+    app = conversion_server(args)
+    pending = deque()
+    try:
+        for paths in watcher:
+            # Repositories may have been created or moved since last time.
+            forget_repo_roots()
+            while pending and pending[0].done:
+                pending.popleft()
+            for path in paths:
+                while True:
+                    try:
+                        pending.append(app.submit(path, args.output_dir))
+                        break
+                    except QueueFull:
+                        if not pending:
+                            raise
+                        # Wait for the oldest job instead of dropping saves.
+                        pending.popleft().wait()
+                    except ValueError as e:
+                        log_message(WARNING, str(e))
+                        break
+    finally:
+        watcher.close()
+        app.close()
+
+
+def report_profile(args):
+    """Prints the --profile summary and writes --profile-output."""
+    profiler = get_profiler()
+    if not profiler.enabled:
+        return
+    profiler.log_summary()
+    if args.profile_output:
+        try:
+            profiler.write(args.profile_output)
+        except OSError as e:
+            log_message(ERROR, f"Could not write profile: {e}")
+
+
 def main():
     args = parse_args()
-    metadata = load_metadata()  # Load metadata once for all operations
+    configure_logging(
+        verbosity=args.verbose - args.quiet,
+        json_lines=args.log_format == "json",
+    )
     last_notebook_path = None  # To store the last processed notebook path
 
     if args.help:
@@ -168,25 +507,45 @@ def main():
         sys.exit(0)  # Exit explicitly after displaying help
         return
 
+    if args.profile or args.profile_output:
+        enable_profiling()
+
     if args.refresh_metadata:
         try:
-            service = authenticate_drive()
+            service = load_drive(args).authenticate_google_drive()
             log_message(INFO, "Refreshing metadata during Drive operations.")
             refresh_metadata(service)
         except Exception as e:
             log_message(ERROR, f"Failed to refresh metadata: {e}")
         return
 
+    if args.watch:
+        try:
+            watch(args)
+        except KeyboardInterrupt:
+            log_message(INFO, "Stopped watching.")
+        report_profile(args)
+        return
+
+    if args.serve is not None:
+        run_server(args)
+        report_profile(args)
+        return
+
     if args.batch:
         batch_process(args.batch, args)
+        report_profile(args)
         return
 
     if args.notebook_path:
-        process_notebook(args.notebook_path, args, metadata)
+        process_notebook(args.notebook_path, args)
+        report_profile(args)
         return
 
     # Interactive mode fallback
     while True:
+        # Logs are written in the background; finish them before prompting.
+        flush_logs()
         print(f"{Fore.BLUE}Interactive mode activated.")
 
         # If last_notebook_path exists, use it for retry
@@ -202,13 +561,14 @@ def main():
             log_message(INFO, f"Retrying the last notebook: {notebook_path}")
 
         try:
-            process_notebook(notebook_path, args, metadata)
+            process_notebook(notebook_path, args)
             last_notebook_path = (
                 notebook_path  # Update the last notebook path after processing
             )
         except Exception as e:
             log_message(ERROR, f"{str(e)}")
 
+        flush_logs()
         print("\nOptions:")
         print("1. Retry the same notebook.")
         print("2. Process another notebook.")
@@ -0,0 +1,835 @@
+import base64
+import html
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from logger import log_message, WARNING
+
+DEFAULT_WIDTH = 700
+DEFAULT_HEIGHT = 450
+MARGIN = {"l": 70, "r": 30, "t": 60, "b": 60}
+LEGEND_WIDTH = 140
+
+# Plotly's default template colours.
+PAPER_COLOR = "#ffffff"
+PLOT_COLOR = "#E5ECF6"
+GRID_COLOR = "#ffffff"
+TEXT_COLOR = "#2a3f5f"
+COLORWAY = [
+    "#636efa",
+    "#EF553B",
+    "#00cc96",
+    "#ab63fa",
+    "#FFA15A",
+    "#19d3f3",
+    "#FF6692",
+    "#B6E880",
+    "#FF97FF",
+    "#FECB52",
+]
+COLORSCALES = {
+    "plasma": [
+        "#0d0887",
+        "#46039f",
+        "#7201a8",
+        "#9c179e",
+        "#bd3786",
+        "#d8576b",
+        "#ed7953",
+        "#fb9f3a",
+        "#fdca26",
+        "#f0f921",
+    ],
+    "viridis": [
+        "#440154",
+        "#482878",
+        "#3e4989",
+        "#31688e",
+        "#26828e",
+        "#1f9e89",
+        "#35b779",
+        "#6ece58",
+        "#b5de2b",
+        "#fde725",
+    ],
+    "greys": ["#000000", "#ffffff"],
+    "blues": ["#08306b", "#f7fbff"],
+}
+DEFAULT_COLORSCALE = "plasma"
+
+SUPPORTED_TRACES = {"scatter", "scattergl", "bar", "histogram", "heatmap"}
+
+# Traces with more points than this are decimated to what is visible at the
+# plot's pixel resolution; smaller traces are drawn exactly.
+DECIMATE_THRESHOLD = 5000
+# Marker traces are thinned on a growing pixel grid until at most this many
+# markers remain.
+MAX_MARKERS = 10000
+MAX_HISTOGRAM_BINS = 200
+DASHES = {"dash": "9,3", "dot": "3,3", "dashdot": "9,3,3,3"}
+
+
+def _array(value):
+    """
+    Converts trace data to a NumPy array, decoding Plotly's base64 typed
+    arrays (``{"dtype": ..., "bdata": ...}``).
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict) and "bdata" in value:
+        data = np.frombuffer(
+            base64.b64decode(value["bdata"]), dtype=np.dtype(value["dtype"])
+        )
+        shape = value.get("shape")
+        if shape:
+            if isinstance(shape, str):
+                shape = [int(n) for n in shape.split(",")]
+            data = data.reshape(shape)
+        return data
+    return np.asarray(value)
+
+
+def _text(value):
+    """Title text from a string or ``{"text": ...}`` layout entry."""
+    if isinstance(value, dict):
+        value = value.get("text")
+    return "" if value is None else str(value)
+
+
+def _number(value, default=None):
+    """`value` as a finite float, or `default` when it is not a number."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if math.isfinite(number) else default
+
+
+def _color(value, default):
+    return value if isinstance(value, str) else default
+
+
+def _fmt(values):
+    """Formats pixel coordinates compactly (one decimal)."""
+    return np.char.mod("%.1f", np.round(values, 1))
+
+
+def _nice_step(span, count):
+    raw = span / max(count, 1)
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 2.5, 5, 10):
+        step = multiple * magnitude
+        if span / step <= count:
+            return step
+    return 10 * magnitude
+
+
+def _tick_label(value, step):
+    if abs(value) >= 1e6 or (value and abs(value) < 1e-4):
+        return f"{value:.3g}"
+    decimals = max(0, -math.floor(math.log10(step))) if step < 1 else 0
+    if step < 1 and step * 10**decimals % 1:
+        decimals += 1
+    return f"{value:.{decimals}f}"
+
+
+def _widen(value):
+    """A range around a single value, so it still has a span."""
+    half = (abs(value) or 1) / 2
+    return value - half, value + half
+
+
+class _Axis:
+    """
+    One axis: collects the data extent of every trace, then maps values to
+    pixels. String values are treated as categories, like Plotly does,
+    unless they are dates: the axis type then becomes ``date``.
+    """
+
+    def __init__(self, spec):
+        self.title = _text(spec.get("title"))
+        self.type = spec.get("type")
+        self.fixed_range = spec.get("range")
+        self.categories = {}
+        self.lo = math.inf
+        self.hi = -math.inf
+        self.pixels = (0.0, 1.0)
+        self.range = (0.0, 1.0)
+
+    def values(self, raw):
+        """Numeric positions for `raw` data, registering categories."""
+        data = _array(raw)
+        if data.dtype.kind in "biuf":
+            return data.astype(float).ravel()
+        try:
+            return data.astype(float).ravel()
+        except (TypeError, ValueError):
+            pass
+        if data.size and not self.categories and self.type in (None, "-"):
+            try:
+                data.astype("datetime64[ms]")
+                self.type = "date"
+            except (TypeError, ValueError):
+                pass
+        labels = [str(v) for v in data.ravel()]
+        for label in labels:
+            self.categories.setdefault(label, len(self.categories))
+        return np.array([self.categories[l] for l in labels], dtype=float)
+
+    def extend(self, *arrays):
+        for data in arrays:
+            finite = data[np.isfinite(data)]
+            if finite.size:
+                self.lo = min(self.lo, float(finite.min()))
+                self.hi = max(self.hi, float(finite.max()))
+
+    def finalize(self, start, end, padding=0.0):
+        """Fixes the value range and the pixel span it maps onto."""
+        self.pixels = (start, end)
+        fixed = [_number(v) for v in self.fixed_range or ()]
+        if len(fixed) == 2 and None not in fixed:
+            lo, hi = fixed
+            if hi == lo:
+                lo, hi = _widen(lo)
+            self.range = (lo, hi)
+            return
+        lo, hi = (self.lo, self.hi) if self.lo <= self.hi else (0.0, 1.0)
+        if self.categories:
+            lo, hi = min(lo, -0.5), max(hi, len(self.categories) - 0.5)
+        elif hi == lo:
+            lo, hi = _widen(lo)
+        else:
+            pad = (hi - lo) * padding
+            lo, hi = lo - pad, hi + pad
+        self.range = (lo, hi)
+
+    def to_px(self, values):
+        lo, hi = self.range
+        start, end = self.pixels
+        return start + (np.asarray(values, dtype=float) - lo) * (
+            (end - start) / (hi - lo)
+        )
+
+    def ticks(self, count):
+        """``(values, labels)`` of the tick marks."""
+        lo, hi = sorted(self.range)
+        if self.categories:
+            labels = list(self.categories)
+            stride = max(1, math.ceil(len(labels) / count))
+            values = np.arange(0, len(labels), stride, dtype=float)
+            return values, [labels[int(v)] for v in values]
+        step = _nice_step(hi - lo, count)
+        values = np.arange(math.ceil(lo / step) * step, hi + step * 1e-9, step)
+        return values, [_tick_label(v, step) for v in values]
+
+
+def _segments(px, py):
+    """Splits a line at missing values into runs of finite points."""
+    finite = np.isfinite(px) & np.isfinite(py)
+    if finite.all():
+        return [(px, py)]
+    edges = np.flatnonzero(np.diff(np.r_[0, finite.astype(np.int8), 0]))
+    return [(px[a:b], py[a:b]) for a, b in zip(edges[::2], edges[1::2])]
+
+
+def decimate_line(px, py, buckets):
+    """
+    Keeps the first, last, lowest and highest point of every bucket (the M4
+    scheme), which draws the same line at the plot's resolution. Points are
+    bucketed by pixel column when x is sorted, otherwise by position.
+    """
+    n = len(px)
+    if n <= DECIMATE_THRESHOLD:
+        return px, py
+    if np.all(np.diff(px) >= 0):
+        columns = np.floor(px - px[0]).astype(np.int64)
+    else:
+        columns = np.arange(n) * buckets // n
+    starts = np.r_[0, np.flatnonzero(np.diff(columns)) + 1]
+    ends = np.r_[starts[1:], n] - 1
+    order = np.lexsort((py, columns))
+    keep = np.unique(
+        np.concatenate([starts, ends, order[starts], order[ends]])
+    )
+    return px[keep], py[keep]
+
+
+def decimate_markers(px, py, limit=MAX_MARKERS):
+    """
+    Drops markers that land on an already occupied cell of a pixel grid,
+    doubling the cell size until at most `limit` markers remain.
+    """
+    cell = 1.0
+    while len(px) > limit:
+        keys = np.floor(px / cell).astype(np.int64) * 1_000_003 + np.floor(
+            py / cell
+        ).astype(np.int64)
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        px, py = px[first], py[first]
+        cell *= 2
+    return px, py
+
+
+def _colorscale(spec):
+    """Colour stops ``(positions, rgb array)`` for a trace's colorscale."""
+    if isinstance(spec, str):
+        colors = COLORSCALES.get(spec.lower(), COLORSCALES[DEFAULT_COLORSCALE])
+        positions = np.linspace(0, 1, len(colors))
+    elif spec:
+        positions = np.array([float(p) for p, _ in spec])
+        colors = [c for _, c in spec]
+    else:
+        colors = COLORSCALES[DEFAULT_COLORSCALE]
+        positions = np.linspace(0, 1, len(colors))
+    rgb = np.array([_parse_color(c) for c in colors], dtype=float)
+    return positions, rgb
+
+
+def _parse_color(color):
+    color = color.strip()
+    if color.startswith("#"):
+        digits = color[1:]
+        if len(digits) == 3:
+            digits = "".join(d * 2 for d in digits)
+        return [int(digits[i : i + 2], 16) for i in (0, 2, 4)]
+    if color.startswith("rgb"):
+        parts = color[color.index("(") + 1 : color.index(")")].split(",")
+        return [float(p) for p in parts[:3]]
+    return [128, 128, 128]
+
+
+def encode_png(rgb):
+    """Encodes an ``(h, w, 3)`` uint8 array as a PNG."""
+    height, width, _ = rgb.shape
+    raw = np.concatenate(
+        [np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, -1)],
+        axis=1,
+    ).tobytes()
+
+    def chunk(kind, data):
+        body = kind + data
+        return (
+            struct.pack(">I", len(data))
+            + body
+            + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _downsample(z, max_rows, max_cols):
+    """Block-averages a grid so it has at most one cell per pixel."""
+    rows = max(1, math.ceil(z.shape[0] / max(max_rows, 1)))
+    cols = max(1, math.ceil(z.shape[1] / max(max_cols, 1)))
+    if rows == 1 and cols == 1:
+        return z
+    height = z.shape[0] // rows * rows
+    width = z.shape[1] // cols * cols
+    blocks = z[:height, :width].reshape(
+        height // rows, rows, width // cols, cols
+    )
+    return np.nanmean(blocks, axis=(1, 3))
+
+
+def _edges(centers, count):
+    """Cell edges around heatmap cell centres."""
+    if centers is None or len(centers) != count:
+        return np.arange(count + 1, dtype=float) - 0.5
+    mid = (centers[1:] + centers[:-1]) / 2 if count > 1 else np.array([])
+    first = centers[0] - (mid[0] - centers[0] if count > 1 else 0.5)
+    last = centers[-1] + (centers[-1] - mid[-1] if count > 1 else 0.5)
+    return np.r_[first, mid, last]
+
+
+class _Trace:
+    def __init__(self, spec, index):
+        self.spec = spec
+        self.type = spec.get("type", "scatter")
+        self.name = spec.get("name") or f"trace {index}"
+        self.color = COLORWAY[index % len(COLORWAY)]
+        self.opacity = _number(spec.get("opacity"), 1.0)
+        self.showlegend = spec.get("showlegend", True) is not False
+
+
+class FigureRenderer:
+    """
+    Renders a Plotly figure dict to SVG, drawing scatter, line, bar,
+    histogram and heatmap traces on a single pair of axes. Coordinates are
+    transformed with vectorized NumPy, and large traces are decimated to the
+    plot's pixel resolution.
+    """
+
+    def __init__(self, figure):
+        self.figure = figure
+        layout = figure.get("layout") or {}
+        self.layout = layout
+        self.width = int(_number(layout.get("width")) or DEFAULT_WIDTH)
+        self.height = int(_number(layout.get("height")) or DEFAULT_HEIGHT)
+        self.xaxis = _Axis(layout.get("xaxis") or {})
+        self.yaxis = _Axis(layout.get("yaxis") or {})
+        self.barmode = layout.get("barmode", "group")
+        self.traces = []
+        self.skipped = []
+        for index, spec in enumerate(figure.get("data") or []):
+            trace_type = spec.get("type", "scatter")
+            on_main_axes = spec.get("xaxis", "x") == "x" and (
+                spec.get("yaxis", "y") == "y"
+            )
+            # Histograms need samples to bin.
+            has_samples = trace_type != "histogram" or (
+                spec.get("x") is not None or spec.get("y") is not None
+            )
+            if trace_type in SUPPORTED_TRACES and on_main_axes and has_samples:
+                self.traces.append(_Trace(spec, index))
+            else:
+                self.skipped.append(trace_type)
+
+    def render(self):
+        """Returns the SVG document, or None when nothing can be drawn."""
+        if not self.traces:
+            return None
+        for trace in self.traces:
+            getattr(self, f"_prepare_{self._kind(trace)}")(trace)
+        for axis_type in ("log", "date"):
+            if axis_type in (self.xaxis.type, self.yaxis.type):
+                # Only linear and category axes are drawn.
+                log_message(
+                    WARNING, f"Plotly {axis_type} axes are not drawn in SVG."
+                )
+                return None
+        self._stack_bars()
+        legend = (
+            [t for t in self.traces if t.showlegend]
+            if (
+                self.layout.get("showlegend")
+                or sum(t.showlegend for t in self.traces) > 1
+            )
+            else []
+        )
+
+        margin = self.layout.get("margin") or {}
+        margin = {
+            side: _number(margin.get(side), default)
+            for side, default in MARGIN.items()
+        }
+        right = self.width - margin["r"] - (LEGEND_WIDTH if legend else 0)
+        bottom = self.height - margin["b"]
+        self.box = (margin["l"], margin["t"], right, bottom)
+        has_bars = any(
+            self._kind(t) in ("bar", "heatmap") for t in self.traces
+        )
+        self.xaxis.finalize(margin["l"], right, 0 if has_bars else 0.04)
+        self.yaxis.finalize(bottom, margin["t"], 0.05)
+
+        parts = [self._frame()]
+        parts.append('<g clip-path="url(#plot-area)">')
+        for trace in self.traces:
+            parts.extend(getattr(self, f"_draw_{self._kind(trace)}")(trace))
+        parts.append("</g>")
+        parts.append(self._labels())
+        if legend:
+            parts.append(self._legend(legend, right))
+        parts.append("</svg>")
+        if self.skipped:
+            log_message(
+                WARNING,
+                "Plotly traces not drawn in SVG snapshot: "
+                + ", ".join(sorted(set(self.skipped))),
+            )
+        return "\n".join(parts)
+
+    @staticmethod
+    def _kind(trace):
+        if trace.type in ("scatter", "scattergl"):
+            return "scatter"
+        if trace.type == "histogram":
+            return "bar"
+        return trace.type
+
+    # Data preparation: map to axis units and record extents.
+
+    def _prepare_scatter(self, trace):
+        spec = trace.spec
+        y = _array(spec.get("y"))
+        x = spec.get("x")
+        if x is None:
+            x = np.arange(len(y) if y is not None else 0)
+        trace.x = self.xaxis.values(x)
+        trace.y = (
+            self.yaxis.values(y) if y is not None else np.zeros(len(trace.x))
+        )
+        self.xaxis.extend(trace.x)
+        self.yaxis.extend(trace.y)
+        mode = spec.get("mode") or (
+            "lines+markers" if len(trace.x) < 20 else "lines"
+        )
+        trace.lines = "lines" in mode
+        trace.markers = "markers" in mode
+        line = spec.get("line") or {}
+        marker = spec.get("marker") or {}
+        trace.line_color = _color(line.get("color"), trace.color)
+        trace.marker_color = _color(marker.get("color"), trace.line_color)
+        trace.line_width = _number(line.get("width"), 2.0)
+        trace.dash = DASHES.get(line.get("dash"))
+        size = marker.get("size")
+        trace.marker_size = _number(size, 6.0) if np.isscalar(size) else 6.0
+        trace.fill = spec.get("fill")
+        if trace.fill in ("tozeroy", "tonexty"):
+            self.yaxis.extend(np.zeros(1))
+
+    def _prepare_bar(self, trace):
+        spec = trace.spec
+        horizontal = spec.get("orientation") == "h"
+        if trace.type == "histogram":
+            self._bin(trace, horizontal)
+        else:
+            position, value = ("y", "x") if horizontal else ("x", "y")
+            values = _array(spec.get(value))
+            if values is None:
+                values = np.zeros(0)
+            positions = spec.get(position)
+            if positions is None:
+                positions = np.arange(len(values))
+            position_axis = self.yaxis if horizontal else self.xaxis
+            trace.positions = position_axis.values(positions)
+            trace.values = values.astype(float).ravel()
+            trace.widths = np.full(len(trace.values), 0.8)
+        trace.horizontal = horizontal
+        trace.base = np.zeros(len(trace.values))
+        marker = spec.get("marker") or {}
+        trace.fill_color = _color(marker.get("color"), trace.color)
+
+    def _bin(self, trace, horizontal):
+        spec = trace.spec
+        horizontal = horizontal or (
+            spec.get("x") is None and spec.get("y") is not None
+        )
+        raw = _array(spec.get("y") if horizontal else spec.get("x")).ravel()
+        try:
+            samples = raw.astype(float)
+        except (TypeError, ValueError):
+            samples = None
+        if samples is None:
+            # Categories (or dates): one bar per distinct value.
+            axis = self.yaxis if horizontal else self.xaxis
+            codes = axis.values(raw[[v is not None for v in raw]])
+            total = codes.size
+            counts = np.bincount(
+                codes.astype(np.int64), minlength=len(axis.categories)
+            )
+            edges = np.arange(len(counts) + 1) - 0.5
+        else:
+            samples = samples[np.isfinite(samples)]
+            total = samples.size
+            counts, edges = np.histogram(
+                samples, bins=self._bin_edges(spec, samples, horizontal)
+            )
+        counts = counts.astype(float)
+        norm = spec.get("histnorm")
+        if norm in ("probability", "percent") and total:
+            counts /= total / (100 if norm == "percent" else 1)
+        elif norm in ("density", "probability density") and total:
+            counts /= np.diff(edges) * (
+                total if norm == "probability density" else 1
+            )
+        trace.positions = (edges[:-1] + edges[1:]) / 2
+        trace.values = counts
+        trace.widths = np.diff(edges)
+        trace.horizontal = horizontal
+        (self.yaxis if horizontal else self.xaxis).extend(edges)
+
+    @staticmethod
+    def _bin_edges(spec, samples, horizontal):
+        bins = _number(spec.get("nbinsy" if horizontal else "nbinsx"))
+        xbins = spec.get("ybins" if horizontal else "xbins") or {}
+        size = _number(xbins.get("size"))
+        if size and size > 0 and samples.size:
+            start = _number(xbins.get("start"), float(samples.min()))
+            end = _number(xbins.get("end"), float(samples.max()))
+            if 0 <= (end - start) / size <= MAX_HISTOGRAM_BINS:
+                return np.arange(start, end + size, size)
+        edges = np.histogram_bin_edges(
+            samples, bins=int(bins) if bins and bins > 0 else "auto"
+        )
+        if len(edges) > MAX_HISTOGRAM_BINS + 1:
+            edges = np.histogram_bin_edges(samples, MAX_HISTOGRAM_BINS)
+        return edges
+
+    def _stack_bars(self):
+        """
+        Offsets grouped bars and stacks stacked ones, then records extents.
+        """
+        bars = [t for t in self.traces if self._kind(t) == "bar"]
+        grouped = [t for t in bars if t.type == "bar"]
+        if self.barmode == "group" and len(grouped) > 1:
+            for slot, trace in enumerate(grouped):
+                share = trace.widths / len(grouped)
+                trace.positions = (
+                    trace.positions - trace.widths / 2 + share * (slot + 0.5)
+                )
+                trace.widths = share
+        if self.barmode in ("stack", "relative"):
+            totals = {}
+            for trace in bars:
+                keys = np.round(trace.positions, 9)
+                trace.base = np.array(
+                    [totals.get(k, 0.0) for k in keys.tolist()]
+                )
+                for key, top in zip(keys.tolist(), trace.base + trace.values):
+                    totals[key] = top
+        if len([t for t in bars if t.type == "histogram"]) > 1 and (
+            self.barmode not in ("stack", "relative")
+        ):
+            for trace in bars:
+                trace.opacity = min(trace.opacity, 0.75)
+        for trace in bars:
+            position_axis = self.yaxis if trace.horizontal else self.xaxis
+            value_axis = self.xaxis if trace.horizontal else self.yaxis
+            position_axis.extend(
+                trace.positions - trace.widths / 2,
+                trace.positions + trace.widths / 2,
+            )
+            value_axis.extend(trace.base, trace.base + trace.values)
+
+    def _prepare_heatmap(self, trace):
+        spec = trace.spec
+        z = _array(spec.get("z"))
+        z = (
+            np.atleast_2d(z.astype(float))
+            if z is not None
+            else np.zeros((1, 1))
+        )
+        x = spec.get("x")
+        y = spec.get("y")
+        x = self.xaxis.values(x) if x is not None else None
+        y = self.yaxis.values(y) if y is not None else None
+        trace.x_edges = _edges(x, z.shape[1])
+        trace.y_edges = _edges(y, z.shape[0])
+        trace.z = z
+        self.xaxis.extend(trace.x_edges)
+        self.yaxis.extend(trace.y_edges)
+
+    # Drawing: map to pixels and emit SVG.
+
+    def _draw_scatter(self, trace):
+        px = self.xaxis.to_px(trace.x)
+        py = self.yaxis.to_px(trace.y)
+        left, top, right, bottom = self.box
+        parts = []
+        opacity = f' opacity="{trace.opacity:g}"' if trace.opacity < 1 else ""
+        if trace.lines or trace.fill:
+            dash = f' stroke-dasharray="{trace.dash}"' if trace.dash else ""
+            for sx, sy in _segments(px, py):
+                sx, sy = decimate_line(sx, sy, int(right - left) or 1)
+                points = " ".join(
+                    np.char.add(np.char.add(_fmt(sx), ","), _fmt(sy))
+                )
+                if trace.fill in ("tozeroy", "tonexty") and len(sx):
+                    zero = float(self.yaxis.to_px(0))
+                    parts.append(
+                        f'<polygon points="{sx[0]:.1f},{zero:.1f} {points} '
+                        f'{sx[-1]:.1f},{zero:.1f}" fill="{trace.line_color}" '
+                        f'fill-opacity="0.5" stroke="none"{opacity}/>'
+                    )
+                if trace.lines:
+                    parts.append(
+                        f'<polyline points="{points}" fill="none" '
+                        f'stroke="{trace.line_color}" '
+                        f'stroke-width="{trace.line_width:g}" '
+                        f'stroke-linejoin="round"{dash}{opacity}/>'
+                    )
+        if trace.markers:
+            finite = np.isfinite(px) & np.isfinite(py)
+            mx, my = decimate_markers(px[finite], py[finite])
+            r = trace.marker_size / 2
+            # One path of tiny arcs keeps large scatter plots compact.
+            moves = np.char.add(
+                np.char.add("M", _fmt(mx - r)), np.char.add(",", _fmt(my))
+            )
+            arc = f"a{r:g},{r:g} 0 1,0 {2 * r:g},0a{r:g},{r:g} 0 1,0 {-2 * r:g},0"
+            parts.append(
+                f'<path d="{arc.join(moves)}{arc if len(moves) else ""}" '
+                f'fill="{trace.marker_color}"{opacity}/>'
+            )
+        return parts
+
+    def _draw_bar(self, trace):
+        position_axis = self.yaxis if trace.horizontal else self.xaxis
+        value_axis = self.xaxis if trace.horizontal else self.yaxis
+        p0 = position_axis.to_px(trace.positions - trace.widths / 2)
+        p1 = position_axis.to_px(trace.positions + trace.widths / 2)
+        v0 = value_axis.to_px(trace.base)
+        v1 = value_axis.to_px(trace.base + trace.values)
+        if trace.horizontal:
+            x0, x1, y0, y1 = v0, v1, p0, p1
+        else:
+            x0, x1, y0, y1 = p0, p1, v0, v1
+        x = np.minimum(x0, x1)
+        y = np.minimum(y0, y1)
+        w = np.abs(x1 - x0)
+        h = np.abs(y1 - y0)
+        keep = np.isfinite(x + y + w + h)
+        rects = (
+            "M"
+            + _fmt(x[keep]).astype(object)
+            + ","
+            + _fmt(y[keep]).astype(object)
+            + "h"
+            + _fmt(w[keep]).astype(object)
+            + "v"
+            + _fmt(h[keep]).astype(object)
+            + "h"
+            + _fmt(-w[keep]).astype(object)
+            + "z"
+        )
+        opacity = f' opacity="{trace.opacity:g}"' if trace.opacity < 1 else ""
+        stroke = (
+            ' stroke="#ffffff" stroke-width="0.5"'
+            if trace.type == "histogram"
+            else ""
+        )
+        return [
+            f'<path d="{"".join(rects)}" fill="{trace.fill_color}"'
+            f"{stroke}{opacity}/>"
+        ]
+
+    def _draw_heatmap(self, trace):
+        spec = trace.spec
+        left, top, right, bottom = self.box
+        z = _downsample(trace.z, int(bottom - top), int(right - left))
+        finite = z[np.isfinite(z)]
+        zmin = _number(
+            spec.get("zmin"), float(finite.min()) if finite.size else 0
+        )
+        zmax = _number(
+            spec.get("zmax"), float(finite.max()) if finite.size else 1
+        )
+        scaled = (z - zmin) / ((zmax - zmin) or 1)
+        positions, stops = _colorscale(spec.get("colorscale"))
+        flat = np.clip(np.nan_to_num(scaled.ravel(), nan=0.0), 0, 1)
+        rgb = np.stack(
+            [np.interp(flat, positions, stops[:, c]) for c in range(3)],
+            axis=-1,
+        )
+        rgb = rgb.reshape(z.shape + (3,)).round().astype(np.uint8)
+        x0, x1 = self.xaxis.to_px(trace.x_edges[[0, -1]])
+        y0, y1 = self.yaxis.to_px(trace.y_edges[[0, -1]])
+        # Row 0 of z is drawn at the bottom, as in Plotly.
+        if y0 > y1:
+            rgb = rgb[::-1]
+        image = base64.b64encode(encode_png(rgb)).decode("ascii")
+        return [
+            f'<image x="{min(x0, x1):.1f}" y="{min(y0, y1):.1f}" '
+            f'width="{abs(x1 - x0):.1f}" height="{abs(y1 - y0):.1f}" '
+            f'preserveAspectRatio="none" style="image-rendering:pixelated" '
+            f'href="data:image/png;base64,{image}"/>'
+        ]
+
+    # Frame, axes and legend.
+
+    def _frame(self):
+        left, top, right, bottom = self.box
+        grid = []
+        for value in self.xaxis.ticks(8)[0]:
+            x = float(self.xaxis.to_px(value))
+            grid.append(f"M{x:.1f},{top}V{bottom}")
+        for value in self.yaxis.ticks(6)[0]:
+            y = float(self.yaxis.to_px(value))
+            grid.append(f"M{left},{y:.1f}H{right}")
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" '
+            f'height="{self.height}" viewBox="0 0 {self.width} {self.height}" '
+            f'font-family="Open Sans, verdana, arial, sans-serif" '
+            f'font-size="12" fill="{TEXT_COLOR}">\n'
+            f'<rect width="{self.width}" height="{self.height}" '
+            f'fill="{PAPER_COLOR}"/>\n'
+            f'<clipPath id="plot-area"><rect x="{left}" y="{top}" '
+            f'width="{right - left}" height="{bottom - top}"/></clipPath>\n'
+            f'<rect x="{left}" y="{top}" width="{right - left}" '
+            f'height="{bottom - top}" fill="{PLOT_COLOR}"/>\n'
+            f'<path d="{"".join(grid)}" stroke="{GRID_COLOR}" stroke-width="1"/>'
+        )
+
+    def _labels(self):
+        left, top, right, bottom = self.box
+        parts = []
+        for value, label in zip(*self.xaxis.ticks(8)):
+            x = float(self.xaxis.to_px(value))
+            parts.append(
+                f'<text x="{x:.1f}" y="{bottom + 16}" '
+                f'text-anchor="middle">{html.escape(label)}</text>'
+            )
+        for value, label in zip(*self.yaxis.ticks(6)):
+            y = float(self.yaxis.to_px(value))
+            parts.append(
+                f'<text x="{left - 6}" y="{y + 4:.1f}" '
+                f'text-anchor="end">{html.escape(label)}</text>'
+            )
+        if self.xaxis.title:
+            parts.append(
+                f'<text x="{(left + right) / 2:.1f}" y="{bottom + 40}" '
+                f'text-anchor="middle" font-size="14">'
+                f"{html.escape(self.xaxis.title)}</text>"
+            )
+        if self.yaxis.title:
+            cy = (top + bottom) / 2
+            parts.append(
+                f'<text x="{left - 50}" y="{cy:.1f}" text-anchor="middle" '
+                f'font-size="14" transform="rotate(-90 {left - 50} {cy:.1f})">'
+                f"{html.escape(self.yaxis.title)}</text>"
+            )
+        title = _text(self.layout.get("title"))
+        if title:
+            parts.append(
+                f'<text x="{left}" y="{top - 24}" font-size="17">'
+                f"{html.escape(title)}</text>"
+            )
+        return "\n".join(parts)
+
+    def _legend(self, traces, right):
+        left, top = right + 15, self.box[1]
+        parts = []
+        for row, trace in enumerate(traces):
+            y = top + 10 + row * 20
+            color = getattr(trace, "line_color", None) or getattr(
+                trace, "fill_color", trace.color
+            )
+            parts.append(
+                f'<rect x="{left}" y="{y - 5}" width="20" height="10" '
+                f'fill="{color}"/><text x="{left + 26}" y="{y + 4}">'
+                f"{html.escape(str(trace.name))}</text>"
+            )
+        return "\n".join(parts)
+
+
+def render_figure(figure):
+    """
+    Renders a Plotly figure dict (``application/vnd.plotly.v1+json``) to an
+    SVG string. Returns None when the figure has no supported traces.
+    """
+    return FigureRenderer(figure).render()
+
+
+class SvgPlotlyRenderer:
+    """
+    Turns Plotly outputs into SVG assets without a browser.
+    """
+
+    name = "svg"
+
+    def snapshot(self, figure, assets):
+        """Writes the SVG for `figure`. Returns the asset name, or None."""
+        svg = render_figure(figure)
+        if svg is None:
+            return None
+        return assets.write_bytes(svg.encode("utf-8"), "svg")
@@ -0,0 +1,303 @@
+import json
+import math
+import os
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock, local
+
+from logger import log_message, INFO
+from utils import file_mode
+
+# Stages are reported in this order, followed by any others.
+STAGES = (
+    "load_notebook",
+    "process_cells",
+    "render",
+    "save_markdown",
+    "drive_folders",
+    "upload",
+)
+QUANTILES = (0.5, 0.95)
+METRIC_PREFIX = "notebookify"
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values`; 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class _Frame:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.nested = 0.0
+
+
+class Profiler:
+    """
+    Per-stage timers and counters for a run, enabled with ``--profile``.
+
+    `stage` measures exclusive time: time spent in a nested stage is
+    attributed to it, not to the enclosing one, so lazily interleaved stages
+    (cells processed while the template renders while the file is written)
+    are still told apart. Inside `notebook`, stage times are summed for the
+    notebook and recorded as one sample each, so percentiles are per
+    notebook; elsewhere, such as in upload threads, every call is a sample.
+
+    When disabled, every method returns immediately.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.samples = defaultdict(list)
+        self.counters = defaultdict(float)
+        self._lock = Lock()
+        self._local = local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        stack = self._stack()
+        frame = _Frame(name)
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame.started
+            if stack:
+                stack[-1].nested += elapsed
+            self._add_time(name, elapsed - frame.nested)
+
+    def iterate(self, iterable, name):
+        """Yields from `iterable`, timing each step as stage `name`."""
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _add_time(self, name, seconds):
+        current = getattr(self._local, "notebook", None)
+        if current is not None:
+            current[name] = current.get(name, 0.0) + seconds
+            return
+        with self._lock:
+            self.samples[name].append(seconds)
+
+    @contextmanager
+    def notebook(self):
+        """Groups the stages of one notebook's conversion."""
+        if not self.enabled:
+            yield
+            return
+        self._local.notebook = {}
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages, self._local.notebook = self._local.notebook, None
+            stages["notebook"] = time.perf_counter() - started
+            with self._lock:
+                for name, seconds in stages.items():
+                    self.samples[name].append(seconds)
+
+    def count(self, name, amount=1, label=None):
+        """Adds to a counter, optionally split by `label`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[(name, label)] += amount
+
+    def drain(self):
+        """
+        Returns everything recorded so far as plain data and resets it, for
+        sending from a worker process to the parent.
+        """
+        with self._lock:
+            data = {
+                "samples": dict(self.samples),
+                "counters": list(self.counters.items()),
+            }
+            self.samples = defaultdict(list)
+            self.counters = defaultdict(float)
+        return data
+
+    def merge(self, data):
+        """Adds data returned by another process's `drain`."""
+        if not self.enabled or not data:
+            return
+        with self._lock:
+            for name, values in data["samples"].items():
+                self.samples[name].extend(values)
+            for key, amount in data["counters"]:
+                self.counters[tuple(key)] += amount
+
+    def report(self):
+        """Summary of the run as a JSON-serializable dict."""
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            samples = {k: list(v) for k, v in self.samples.items()}
+            counters = dict(self.counters)
+        names = [s for s in STAGES if s in samples] + sorted(
+            set(samples) - set(STAGES) - {"notebook"}
+        )
+        notebooks = samples.get("notebook", [])
+        grouped = defaultdict(dict)
+        for (name, label), amount in sorted(
+            counters.items(), key=lambda item: (item[0][0], item[0][1] or "")
+        ):
+            if label is None:
+                grouped[name] = amount
+            else:
+                grouped[name][label] = amount
+        return {
+            "elapsed_seconds": round(elapsed, 4),
+            "notebooks": len(notebooks),
+            "notebooks_per_second": (
+                round(len(notebooks) / elapsed, 4) if elapsed else 0.0
+            ),
+            "notebook_seconds": _summarize(notebooks),
+            "stages": {name: _summarize(samples[name]) for name in names},
+            "counters": dict(grouped),
+        }
+
+    def log_summary(self):
+        report = self.report()
+        timing = report["notebook_seconds"]
+        log_message(
+            INFO,
+            f"Profile: {report['notebooks']} notebook(s) in "
+            f"{report['elapsed_seconds']:.2f}s; per notebook p50 "
+            f"{timing['p50']:.3f}s, p95 {timing['p95']:.3f}s.",
+        )
+        for name, timing in report["stages"].items():
+            log_message(
+                INFO,
+                f"  {name:<14} {timing['count']:>6} x  total "
+                f"{timing['total']:.3f}s  p50 {timing['p50']:.3f}s  "
+                f"p95 {timing['p95']:.3f}s",
+            )
+        for name, value in report["counters"].items():
+            if isinstance(value, dict):
+                value = ", ".join(
+                    f"{k}={_number(v)}" for k, v in value.items()
+                )
+            else:
+                value = _number(value)
+            log_message(INFO, f"  {name}: {value}")
+
+    def write(self, path):
+        """
+        Writes the report to `path`: Prometheus text format for ``.prom``
+        files (for node_exporter's textfile collector), JSON otherwise. The
+        file is replaced atomically so collectors never read half of it.
+        """
+        report = self.report()
+        if path.endswith(".prom"):
+            content = _prometheus(report)
+        else:
+            content = json.dumps(report, indent=2) + "\n"
+        folder = os.path.dirname(path) or "."
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.chmod(tmp_path, file_mode(path))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        log_message(INFO, f"Profile written to {path}")
+
+
+def _summarize(values):
+    return {
+        "count": len(values),
+        "total": round(sum(values), 6),
+        "p50": round(percentile(values, 0.5), 6),
+        "p95": round(percentile(values, 0.95), 6),
+    }
+
+
+def _number(value):
+    return int(value) if float(value).is_integer() else round(value, 4)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _prometheus(report):
+    p = METRIC_PREFIX
+    lines = [
+        f"# HELP {p}_stage_seconds Time spent per stage; per notebook for "
+        "conversion stages, per call otherwise.",
+        f"# TYPE {p}_stage_seconds summary",
+    ]
+    stages = dict(report["stages"], notebook=report["notebook_seconds"])
+    for name, timing in stages.items():
+        for q in QUANTILES:
+            value = timing[f"p{round(q * 100)}"]
+            lines.append(
+                f'{p}_stage_seconds{{stage="{name}",quantile="{q}"}} {value}'
+            )
+        lines.append(
+            f'{p}_stage_seconds_sum{{stage="{name}"}} {timing["total"]}'
+        )
+        lines.append(
+            f'{p}_stage_seconds_count{{stage="{name}"}} {timing["count"]}'
+        )
+    lines += [
+        f"# TYPE {p}_notebooks_per_second gauge",
+        f"{p}_notebooks_per_second {report['notebooks_per_second']}",
+        f"# TYPE {p}_elapsed_seconds gauge",
+        f"{p}_elapsed_seconds {report['elapsed_seconds']}",
+    ]
+    for name, value in report["counters"].items():
+        metric = f"{p}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        if isinstance(value, dict):
+            for label, amount in value.items():
+                lines.append(
+                    f'{metric}{{type="{_label(label)}"}} {_number(amount)}'
+                )
+        else:
+            lines.append(f"{metric} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+_profiler = Profiler()
+
+
+def get_profiler():
+    """Returns the process-wide Profiler (disabled unless enabled)."""
+    return _profiler
+
+
+def enable_profiling(enabled=True):
+    """Starts a fresh process-wide Profiler."""
+    global _profiler
+    _profiler = Profiler(enabled)
+    return _profiler
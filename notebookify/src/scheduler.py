@@ -0,0 +1,297 @@
+import http.client
+import json
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from logger import log_message, INFO, WARNING
+from profiler import get_profiler
+
+# Drive's per-user quota is far higher, but sustained writes above a few
+# per second are throttled, so the default stays below that.
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Retry schedule recommended for the Drive API: exponential backoff from 1s,
+# capped at 64s, with random jitter.
+MAX_RETRIES = 8
+BASE_DELAY = 1.0
+MAX_DELAY = 64.0
+
+RATE_LIMIT_REASONS = {"userRateLimitExceeded", "rateLimitExceeded"}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Failures before Drive answered: reset or dropped connections, timeouts
+# and failed DNS lookups. Retried like server errors.
+TRANSPORT_ERRORS = (
+    OSError,
+    http.client.HTTPException,
+    httplib2.ServerNotFoundError,
+)
+
+# Concurrency is halved when more than THROTTLE_THRESHOLD of the last
+# ERROR_WINDOW calls were rate limited, at most once per cooldown.
+ERROR_WINDOW = 50
+THROTTLE_THRESHOLD = 0.1
+DECREASE_COOLDOWN = 1.0
+
+
+def _error_reason(error):
+    try:
+        details = json.loads(error.content)["error"]["errors"]
+        return details[0].get("reason")
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def is_rate_limited(error):
+    """Whether Drive rejected a call because of its quota."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    return status == 429 or (
+        status == 403 and _error_reason(error) in RATE_LIMIT_REASONS
+    )
+
+
+def is_transport_error(error):
+    """
+    Whether a call failed in transit. OSErrors naming a file are local
+    problems, such as a missing upload, and do not count.
+    """
+    if isinstance(error, OSError) and error.filename is not None:
+        return False
+    return isinstance(error, TRANSPORT_ERRORS)
+
+
+def is_retryable(error):
+    """Whether a failed call may succeed when repeated later."""
+    return (
+        is_rate_limited(error)
+        or is_transport_error(error)
+        or (
+            isinstance(error, HttpError)
+            and error.resp.status in RETRYABLE_STATUSES
+        )
+    )
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average and bursts of up to
+    `burst`.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class DriveScheduler:
+    """
+    Central gate for Drive API calls.
+
+    Each call takes a token from a TokenBucket and one of a limited number of
+    concurrency slots. Rate-limit, server and transport errors are retried
+    with exponential backoff and full jitter. The concurrency limit follows
+    the observed error rate: it is halved when calls are being throttled
+    and grows by one after a full window of successful calls, so large runs
+    settle just below the quota ceiling.
+    """
+
+    def __init__(
+        self,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        base_delay=BASE_DELAY,
+        max_delay=MAX_DELAY,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limit = max_concurrency
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.started = time.perf_counter()
+        self._bucket = TokenBucket(rate, burst)
+        self._active = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._recent = deque(maxlen=ERROR_WINDOW)
+        self._slots = Condition(Lock())
+
+    @contextmanager
+    def _slot(self):
+        with self._slots:
+            while self._active >= self.limit:
+                self._slots.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._slots:
+                self._active -= 1
+                self._slots.notify_all()
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Runs one API call through the rate limiter, retrying it on rate-limit,
+        server and transport errors. Other errors are raised immediately.
+        """
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            with self._slot():
+                try:
+                    result = fn(*args, **kwargs)
+                except (HttpError,) + TRANSPORT_ERRORS as e:
+                    self.observe(e)
+                    if not is_retryable(e) or attempt >= self.max_retries:
+                        with self._slots:
+                            self.failures += 1
+                        raise
+                    error = e
+                else:
+                    self.observe(None)
+                    return result
+            self.wait_before_retry(attempt, error)
+            attempt += 1
+
+    def execute(self, request):
+        """Executes a googleapiclient request through `call`."""
+        return self.call(request.execute)
+
+    def backoff(self, attempt):
+        """Delay before retry number `attempt` (0-based), with full jitter."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2**attempt)
+        )
+
+    def wait_before_retry(self, attempt, error):
+        delay = self.backoff(attempt)
+        with self._slots:
+            self.retries += 1
+        reason = (
+            error.resp.status
+            if isinstance(error, HttpError)
+            else type(error).__name__
+        )
+        log_message(
+            WARNING,
+            f"Drive call failed ({reason}); retry {attempt + 1} "
+            f"in {delay:.1f}s.",
+        )
+        time.sleep(delay)
+
+    def observe(self, error):
+        """
+        Records the outcome of one call (None for success) and adapts the
+        concurrency limit.
+        """
+        throttled = is_rate_limited(error)
+        get_profiler().count("drive_api_calls")
+        if throttled:
+            get_profiler().count("drive_api_throttled")
+        with self._slots:
+            self.calls += 1
+            self._recent.append(throttled)
+            if throttled:
+                self.throttled += 1
+                self._successes = 0
+                share = sum(self._recent) / len(self._recent)
+                now = time.monotonic()
+                if (
+                    share > THROTTLE_THRESHOLD
+                    and now - self._last_decrease >= DECREASE_COOLDOWN
+                    and self.limit > 1
+                ):
+                    self.limit = max(1, self.limit // 2)
+                    self._last_decrease = now
+                    log_message(
+                        WARNING,
+                        f"Drive is throttling; concurrency lowered to "
+                        f"{self.limit}.",
+                    )
+            elif error is None:
+                self._successes += 1
+                if (
+                    self._successes >= ERROR_WINDOW
+                    and self.limit < self.max_concurrency
+                ):
+                    self.limit += 1
+                    self._successes = 0
+                    self._slots.notify_all()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        with self._slots:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "concurrency": self.limit,
+                "calls_per_second": (
+                    round(self.calls / elapsed, 2) if elapsed else 0.0
+                ),
+            }
+
+    def log_stats(self):
+        stats = self.stats()
+        log_message(
+            INFO,
+            f"Drive API: {stats['calls']} calls "
+            f"({stats['calls_per_second']}/s), {stats['retries']} retries, "
+            f"{stats['throttled']} throttled, {stats['failures']} failed; "
+            f"concurrency {stats['concurrency']}.",
+        )
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """
+    Returns the run-wide DriveScheduler, creating it with defaults on first
+    use.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = DriveScheduler()
+    return _scheduler
+
+
+def configure_scheduler(**options):
+    """Replaces the run-wide DriveScheduler with one built from `options`."""
+    global _scheduler
+    _scheduler = DriveScheduler(**options)
+    return _scheduler
@@ -0,0 +1,445 @@
+import itertools
+import json
+import os
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Event, Lock, Thread
+
+from assets import forget_known_assets
+from batch import (
+    NotebookResult,
+    get_output_path,
+    _init_worker,
+    _convert_in_worker,
+)
+from notebookify_client import parse_address
+from profiler import get_profiler
+from logger import log_message, logging_config, INFO, WARNING, ERROR
+
+# Jobs accepted but not finished; more are refused with HTTP 503.
+DEFAULT_MAX_QUEUE = 64
+# Finished jobs kept for GET /jobs/<id>.
+JOB_HISTORY = 256
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class QueueFull(Exception):
+    """Raised when the server already has `max_queue` unfinished jobs."""
+
+
+class Job(NotebookResult):
+    """
+    A conversion requested from the server, with an event set once it has
+    been converted and, if requested, uploaded.
+    """
+
+    def __init__(self, job_id, notebook_path, output_path, upload):
+        super().__init__(notebook_path, output_path)
+        self.id = job_id
+        self.upload = upload
+        self._done = Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def as_dict(self):
+        return dict(super().as_dict(), id=self.id, done=self.done)
+
+
+def _convert_job(notebook_path, output_path, template_name):
+    """
+    Converts one job in a worker. Assets remembered from earlier jobs are
+    forgotten first, since their files may have been deleted meanwhile.
+    """
+    forget_known_assets()
+    return _convert_in_worker(notebook_path, output_path, template_name)
+
+
+class ConversionServer:
+    """
+    Long-running conversion service behind ``notebookify_main.py --serve``.
+
+    Converters (with their compiled templates) are built once per worker and
+    the Drive clients once per upload thread, so each job only pays for its
+    own conversion and upload. With ``jobs=1`` the converter runs in a thread
+    of the server process; otherwise in a pool of worker processes.
+
+    Jobs for the same output file never run concurrently: a job submitted
+    while another one for that file is running waits for it, and further
+    submissions are coalesced into that waiting job, so rapid saves from an
+    editor convert at most twice.
+    """
+
+    def __init__(
+        self,
+        template_dir,
+        converter_options=None,
+        jobs=1,
+        max_queue=DEFAULT_MAX_QUEUE,
+        service_factory=None,
+        upload_workers=None,
+        template_name="template.jinja2",
+    ):
+        self.template_name = template_name
+        self.max_queue = max_queue
+        self.started = time.time()
+        self.completed = 0
+        self.failed = 0
+        converter_options = converter_options or {}
+        if jobs > 1 and converter_options.get("optimize_images"):
+            # Optimize images in the conversion processes themselves.
+            converter_options = dict(converter_options, image_workers=0)
+        worker_args = (template_dir, converter_options)
+        if jobs == 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=worker_args,
+            )
+        else:
+            self._pool = ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=worker_args
+                + (get_profiler().enabled, logging_config()),
+            )
+        self.jobs = jobs
+        self._uploads = None
+        if service_factory:
+            from drive import flush_folder_cache
+            from uploader import UploadPipeline, DEFAULT_UPLOAD_WORKERS
+
+            self._flush_folder_cache = flush_folder_cache
+            # Unfinished jobs are bounded by max_queue, so submitting an
+            # upload never blocks the thread that finished the conversion.
+            self._uploads = UploadPipeline(
+                service_factory,
+                workers=upload_workers or DEFAULT_UPLOAD_WORKERS,
+                max_pending=max_queue,
+            )
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._running = {}
+        self._waiting = {}
+        self._lock = Lock()
+
+    def submit(self, notebook_path, output_dir=None, upload=True):
+        """
+        Queues a notebook for conversion.
+
+        Args:
+            notebook_path (str): Absolute path of the notebook.
+            output_dir (str, optional): Directory for the Markdown file, next
+                to the notebook by default.
+            upload (bool): Upload the result if Drive is enabled.
+
+        Returns:
+            Job: The new job, or the waiting job it was coalesced into.
+
+        Raises:
+            TypeError: If `notebook_path` or `output_dir` is not a string.
+            ValueError: If `notebook_path` is not a notebook file.
+            QueueFull: If `max_queue` jobs are already unfinished.
+        """
+        if not isinstance(notebook_path, str) or not isinstance(
+            output_dir, (str, type(None))
+        ):
+            raise TypeError("Paths must be strings")
+        if not notebook_path.endswith(".ipynb") or not os.path.isfile(
+            notebook_path
+        ):
+            raise ValueError(f"Invalid notebook path: {notebook_path}")
+        output_path = get_output_path(notebook_path, output_dir)
+        upload = bool(upload and self._uploads)
+        with self._lock:
+            waiting = self._waiting.get(output_path)
+            if waiting:
+                waiting.upload = waiting.upload or upload
+                return waiting
+            if len(self._running) + len(self._waiting) >= self.max_queue:
+                raise QueueFull(
+                    f"{self.max_queue} jobs are already queued; retry later"
+                )
+            job = Job(str(next(self._ids)), notebook_path, output_path, upload)
+            self._jobs[job.id] = job
+            if output_path in self._running:
+                self._waiting[output_path] = job
+                return job
+            self._running[output_path] = job
+        self._start(job)
+        return job
+
+    def get(self, job_id):
+        """The job with `job_id`, or None if unknown or forgotten."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self):
+        with self._lock:
+            queued = len(self._running) + len(self._waiting)
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "jobs": self.jobs,
+            "queued": queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "upload": self._uploads is not None,
+        }
+
+    def _start(self, job):
+        log_message(INFO, "Processing notebook: %s", job.notebook_path)
+        try:
+            future = self._pool.submit(
+                _convert_job,
+                job.notebook_path,
+                job.output_path,
+                self.template_name,
+            )
+        except RuntimeError as e:
+            # The pool is shutting down.
+            job.fail("convert", e)
+            self._finish(job)
+            return
+        future.add_done_callback(lambda f: self._converted(job, f))
+
+    def _converted(self, job, future):
+        try:
+            error, job.convert_seconds, profile = future.result()
+            get_profiler().merge(profile)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if error:
+            job.fail("convert", error)
+            self._finish(job)
+            return
+        job.status = "converted"
+        if not job.upload:
+            self._finish(job)
+            return
+        started = time.perf_counter()
+        upload = self._uploads.submit(job.output_path)
+        upload.add_done_callback(lambda f: self._uploaded(job, f, started))
+
+    def _uploaded(self, job, future, started):
+        job.upload_seconds = time.perf_counter() - started
+        try:
+            job.drive_file_id = future.result()
+            job.status = "uploaded"
+            self._flush_folder_cache()
+        except Exception as e:
+            job.fail("upload", e)
+        self._finish(job)
+
+    def _finish(self, job):
+        if job.status == "failed":
+            log_message(
+                ERROR,
+                f"{job.notebook_path} failed during {job.stage}: {job.error}",
+            )
+        else:
+            log_message(
+                INFO,
+                f"{job.status.capitalize()} {job.notebook_path} in "
+                f"{job.convert_seconds + job.upload_seconds:.2f}s",
+            )
+        with self._lock:
+            if job.status == "failed":
+                self.failed += 1
+            else:
+                self.completed += 1
+            del self._running[job.output_path]
+            waiting = self._waiting.pop(job.output_path, None)
+            if waiting:
+                self._running[job.output_path] = waiting
+            finished = [j for j in self._jobs.values() if j.done]
+            for old in finished[: max(0, len(finished) + 1 - JOB_HISTORY)]:
+                del self._jobs[old.id]
+        job._done.set()
+        if waiting:
+            self._start(waiting)
+
+    def close(self):
+        """Finishes queued jobs and uploads, then releases the workers."""
+        self._pool.shutdown(wait=True)
+        if self._uploads:
+            self._uploads.shutdown(wait=True)
+            self._flush_folder_cache()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON API of the server:
+
+    - ``POST /convert`` with ``{"notebook_path", "output_dir", "upload",
+      "wait"}`` queues a job, replying with it once finished (200) or at
+      once when ``wait`` is false (202).
+    - ``GET /jobs/<id>`` returns a job; ``GET /status`` the queue state.
+    - ``POST /shutdown`` stops the server after the queued jobs.
+
+    POSTs must be sent as ``application/json`` and without an ``Origin``
+    header. Browsers add that header to requests from web pages and cannot
+    send JSON to another origin without a CORS preflight, which this
+    server never answers, so pages the user visits cannot drive it.
+    """
+
+    server_version = "notebookify"
+
+    def do_GET(self):
+        app = self.server.app
+        if self.path == "/status":
+            self._reply(200, app.status())
+        elif self.path.startswith("/jobs/"):
+            job = app.get(self.path[len("/jobs/") :])
+            if job:
+                self._reply(200, job.as_dict())
+            else:
+                self._reply(404, {"error": "Unknown job"})
+        else:
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.headers.get("Origin") is not None:
+            self._reply(403, {"error": "Cross-origin requests are refused"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, {"error": "Requests must be application/json"})
+            return
+        if self.path == "/shutdown":
+            self._reply(200, {"status": "stopping"})
+            Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if self.path != "/convert":
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError("Request too large")
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job = self.server.app.submit(
+                body["notebook_path"],
+                body.get("output_dir"),
+                body.get("upload", True),
+            )
+        except QueueFull as e:
+            self._reply(503, {"error": str(e)})
+            return
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {"error": f"Bad request: {e}"})
+            return
+        if body.get("wait", True):
+            job.wait()
+            self._reply(200, job.as_dict())
+        else:
+            self._reply(202, job.as_dict())
+
+    def _reply(self, status, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Jobs are logged by the server; skip the per-request access log.
+        pass
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address.
+        return request, ("local", 0)
+
+
+def _bind_unix(path):
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            # Left behind by a server that did not shut down cleanly.
+            os.remove(path)
+        else:
+            raise OSError(f"A server is already listening on {path}")
+        finally:
+            probe.close()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Created owner-only, so other local users cannot connect between the
+    # bind and a later chmod.
+    umask = os.umask(0o177)
+    try:
+        return _UnixServer(path, _Handler)
+    finally:
+        os.umask(umask)
+
+
+def bind(app, address):
+    """
+    Opens the server socket for `app`.
+
+    Args:
+        app (ConversionServer): The conversion service.
+        address (str): Unix socket path or ``[HOST:]PORT`` (see
+            `notebookify_client.parse_address`).
+
+    Returns:
+        The HTTP server, to pass to `run`.
+    """
+    kind, target = parse_address(address)
+    if kind == "unix":
+        httpd = _bind_unix(target)
+    else:
+        if target[0] not in ("127.0.0.1", "localhost", "::1"):
+            log_message(
+                WARNING,
+                f"Serving on {target[0]}; anyone who can reach it can "
+                "convert files readable by this process.",
+            )
+        httpd = _TCPServer(target, _Handler)
+    httpd.app = app
+    httpd.address = address
+    httpd.socket_path = target if kind == "unix" else None
+    return httpd
+
+
+def run(httpd):
+    """
+    Serves requests until ``POST /shutdown`` or Ctrl+C, then finishes the
+    queued jobs and removes the socket.
+    """
+    app = httpd.app
+    log_message(
+        INFO,
+        f"Serving on {httpd.address} with {app.jobs} conversion worker(s); "
+        "send notebooks with notebookify_client.py.",
+    )
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+        if httpd.socket_path and os.path.exists(httpd.socket_path):
+            os.remove(httpd.socket_path)
+        app.close()
+        log_message(INFO, "Server stopped.")
+
+
+def serve(app, address):
+    """Serves `app` on `address` until stopped (see `bind` and `run`)."""
+    run(bind(app, address))
@@ -0,0 +1,39 @@
+import hashlib
+import os
+
+import jinja2
+from jinja2.bccache import Bucket, FileSystemBytecodeCache
+
+from logger import log_message, WARNING
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """
+    Persistent cache of compiled Jinja templates, keyed by a hash of the
+    template name, its source and the Jinja version.
+
+    Jinja's own key is the template's name and path, so a moved checkout or
+    a copy of the template compiles again; keying by content lets identical
+    templates share one entry, and an edited template never finds stale
+    bytecode. The name stays in the key so errors name the right template. Entries are written atomically by Jinja, and a cache
+    that cannot be written only costs the compile.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory, "%s.jinja.cache")
+
+    def get_bucket(self, environment, name, filename, source):
+        digest = hashlib.sha256(jinja2.__version__.encode("utf-8"))
+        digest.update(name.encode("utf-8") + b"\0")
+        digest.update(source.encode("utf-8"))
+        key = digest.hexdigest()
+        bucket = Bucket(environment, key, key)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError as e:
+            log_message(WARNING, f"Could not cache compiled template: {e}")
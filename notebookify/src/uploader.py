@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock, local
+
+from drive import (
+    upsert_to_google_drive,
+    ensure_drive_folders,
+    validate_folder_ids,
+    refresh_file_records,
+    UPLOAD_UNCHANGED,
+)
+from scheduler import get_scheduler
+from profiler import get_profiler
+from logger import log_message, INFO
+
+DEFAULT_UPLOAD_WORKERS = 4
+MAX_PENDING_UPLOADS = 32
+
+
+class UploadPipeline:
+    """
+    Bounded pool of concurrent Drive uploads.
+
+    Every worker thread builds its own Drive client with `service_factory`,
+    so each thread reuses one kept-alive HTTP connection instead of sharing a
+    client that is not thread-safe. Large files are sent as chunked resumable
+    uploads (see `drive.upsert_to_google_drive`), and folder metadata is
+    prepared up front with batch HTTP requests. Files are upserted: known
+    files are updated in place, or skipped when their content is unchanged.
+    """
+
+    def __init__(
+        self,
+        service_factory,
+        workers=DEFAULT_UPLOAD_WORKERS,
+        max_pending=MAX_PENDING_UPLOADS,
+        refresh=False,
+    ):
+        self.service_factory = service_factory
+        self.workers = workers
+        self.refresh = refresh
+        self.uploaded = 0
+        self.unchanged = 0
+        self.bytes_sent = 0
+        self.seconds = 0.0
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="upload"
+        )
+        self._slots = BoundedSemaphore(max_pending)
+        self._local = local()
+        self._services = []
+        self._refreshed = set()
+        self._lock = Lock()
+
+    def service(self):
+        """
+        The calling thread's Drive client, built on first use.
+        """
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+            with self._lock:
+                self._services.append(service)
+        return service
+
+    def prepare(self, file_paths, sync_folders=False):
+        """
+        Resolves the Drive folders for `file_paths` with batched metadata
+        calls before any upload starts.
+
+        With `sync_folders`, the whole folder tree is listed and missing
+        folders are created in bulk; otherwise only cached folder IDs due
+        for validation are checked. With `refresh`, the recorded checksums
+        of already uploaded files are re-read in the same way, and their
+        uploads skip the per-file refresh. May be called once per chunk of
+        files.
+        """
+        if sync_folders:
+            ensure_drive_folders(self.service(), file_paths)
+        else:
+            validate_folder_ids(self.service(), file_paths)
+        if self.refresh:
+            refresh_file_records(self.service(), file_paths)
+            with self._lock:
+                self._refreshed.update(file_paths)
+
+    def submit(self, file_path):
+        """
+        Queues `file_path` for upload, blocking while `max_pending` uploads
+        are already waiting. Returns a Future resolving to the Drive file ID.
+        """
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._upload, file_path)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _upload(self, file_path):
+        start = time.perf_counter()
+        with self._lock:
+            refreshed = file_path in self._refreshed
+            self._refreshed.discard(file_path)
+        file_id, action = upsert_to_google_drive(
+            self.service(), file_path, refresh=self.refresh and not refreshed
+        )
+        elapsed = time.perf_counter() - start
+        size = 0 if action == UPLOAD_UNCHANGED else os.path.getsize(file_path)
+        with self._lock:
+            self.seconds += elapsed
+            if action == UPLOAD_UNCHANGED:
+                self.unchanged += 1
+            else:
+                self.uploaded += 1
+                self.bytes_sent += size
+        get_profiler().count("uploads", label=action)
+        get_profiler().count("bytes_uploaded", size)
+        return file_id
+
+    def shutdown(self, wait=True):
+        """
+        Waits for queued uploads and closes every worker's connection.
+        """
+        self._pool.shutdown(wait=wait)
+        with self._lock:
+            services, self._services = self._services, []
+        for service in services:
+            close = getattr(service, "close", None)
+            if close:
+                close()
+        if self.uploaded or self.unchanged:
+            log_message(
+                INFO,
+                f"Uploaded {self.uploaded} files "
+                f"({self.bytes_sent / 1024:.0f} KB) with "
+                f"{self.workers} upload worker(s); "
+                f"{self.unchanged} unchanged.",
+            )
+            get_scheduler().log_stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
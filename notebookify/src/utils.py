@@ -1,10 +1,16 @@
 import os
 from pathlib import Path
 import shutil
-import json
-from logger import log_message, INFO, ERROR, WARNING
+import stat
+from logger import log_message, preview, DEBUG, INFO, ERROR, WARNING
+from metadata_store import get_metadata_store
 from colorama import Fore, Style
 
+# Read once at import: the umask can only be read by setting it, which is
+# unsafe once other threads create files.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 def ensure_folder_exists(folder_path):
     """
@@ -14,9 +20,9 @@ def ensure_folder_exists(folder_path):
     try:
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
-            log_message(INFO, f"Created folder: {folder_path}")
+            log_message(DEBUG, "Created folder: %s", folder_path)
         else:
-            log_message(INFO, f"Folder already exists: {folder_path}")
+            log_message(DEBUG, "Folder already exists: %s", folder_path)
     except OSError as e:
         log_message(ERROR, f"Failed to create folder {folder_path}: {e}")
         raise
@@ -29,12 +35,24 @@ def safe_create_folder(folder_path):
     try:
         folder = Path(folder_path)
         folder.mkdir(parents=True, exist_ok=True)
-        log_message(INFO, f"Created folder: {folder}")
+        log_message(DEBUG, "Created folder: %s", folder)
     except Exception as e:
         log_message(ERROR, f"Error creating folder {folder_path}: {e}")
         raise
 
 
+def file_mode(path):
+    """
+    Permissions for a file written to a temporary name and renamed to
+    `path`: those of the file it replaces, or what ``open()`` gives a new
+    file under the umask.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
 def cleanup_folder(folder_path):
     """
     Remove a folder and its contents if it exists.
@@ -54,8 +72,14 @@ def handle_unsupported_output(output):
     """
     Logs unsupported output types and skips processing.
     """
-    log_message(WARNING, f"Unsupported output type encountered: {output}")
-    return f"<!-- Unsupported output type: {output} -->"
+    log_message(
+        WARNING, "Unsupported output type encountered: %s", preview(output)
+    )
+    kind = output.get("output_type", "unknown")
+    mime_types = ", ".join(output.get("data", {}))
+    if mime_types:
+        kind = f"{kind} ({mime_types})"
+    return f"<!-- Unsupported output type: {kind} -->"
 
 
 def get_metadata_path():
@@ -65,39 +89,97 @@ def get_metadata_path():
     return os.path.join(script_dir, "drive_metadata.json")
 
 
+def get_metadata_db_path():
+    """SQLite metadata database, replacing the JSON file it is migrated from."""
+    return os.path.join(
+        os.path.dirname(get_metadata_path()), "drive_metadata.db"
+    )
+
+
+def get_metadata():
+    """The metadata store, migrating the JSON metadata on first use."""
+    return get_metadata_store(get_metadata_db_path(), get_metadata_path())
+
+
+def get_cache_dir():
+    """Directory for the persistent cell render cache."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, ".notebookify_cache", "cells")
+
+
+def get_template_cache_dir():
+    """Directory for compiled Jinja templates."""
+    return os.path.join(os.path.dirname(get_cache_dir()), "templates")
+
+
+def get_image_cache_dir():
+    """Optimized images, named after their source and settings."""
+    return os.path.join(os.path.dirname(get_cache_dir()), "images")
+
+
+def get_dir_index_path():
+    """Cached folder listings used to find notebooks in batch mode."""
+    return os.path.join(os.path.dirname(get_cache_dir()), "dir_index.json")
+
+
+def get_manifest_path():
+    """Build manifest path, stored next to the drive metadata."""
+    return os.path.join(
+        os.path.dirname(get_metadata_path()), "build_manifest.json"
+    )
+
+
 def load_metadata():
     """Load drive metadata."""
-    metadata_path = get_metadata_path()
-    if os.path.exists(metadata_path):
-        try:
-            with open(metadata_path, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            log_message(
-                WARNING, f"Metadata file corrupted. Initializing new metadata."
-            )
-            return {}
-    return {}
+    return get_metadata().as_dict()
 
 
 def save_metadata(metadata):
-    """Save metadata."""
-    metadata_path = get_metadata_path()
-    with open(metadata_path, "w") as f:
-        json.dump(metadata, f, indent=4)
+    """Save metadata, replacing what was stored."""
+    get_metadata().replace(metadata)
+
+
+# Folder -> repository root (or None) for every folder visited while
+# detecting roots, so sibling and nested notebooks resolve without touching
+# the file system again.
+_repo_roots = {}
 
 
-# Detect GitHub root directory
 def detect_github_root(notebook_path):
-    current_dir = os.path.dirname(notebook_path)
-    while current_dir:
-        if ".git" in os.listdir(current_dir):
-            return current_dir
+    """
+    Finds the repository root of a notebook: the nearest folder above it
+    containing ``.git`` (a folder, or a file in worktrees and submodules).
+
+    Each folder costs one stat instead of a full listing, and the answer is
+    remembered for every folder visited on the way up. Folders that do not
+    exist yet, such as planned output folders, are passed over.
+
+    Returns:
+        str or None: The root folder, or None outside a repository.
+    """
+    current_dir = os.path.dirname(os.path.abspath(notebook_path))
+    visited = []
+    root = None
+    while True:
+        if current_dir in _repo_roots:
+            root = _repo_roots[current_dir]
+            break
+        visited.append(current_dir)
+        if os.path.lexists(os.path.join(current_dir, ".git")):
+            root = current_dir
+            break
         parent_dir = os.path.dirname(current_dir)
         if parent_dir == current_dir:
             break
         current_dir = parent_dir
-    return None
+    for folder in visited:
+        _repo_roots[folder] = root
+    return root
+
+
+def forget_repo_roots():
+    """Clears the memoized repository roots."""
+    _repo_roots.clear()
 
 
 def get_template_path(template_name="index.md.j2"):
@@ -126,14 +208,47 @@ def print_help(script_name="Notebookify"):
     {Fore.YELLOW}Options:{Style.RESET_ALL}
         {Fore.GREEN}-h, --help{Style.RESET_ALL}          Show this help message and exit
         {Fore.GREEN}-b, --batch DIRECTORY{Style.RESET_ALL} Process all notebooks in a directory (recursively)
+        {Fore.GREEN}-j, --jobs N{Style.RESET_ALL}        Number of parallel conversion workers for batch mode
         {Fore.GREEN}-t, --template PATH{Style.RESET_ALL}  Specify a custom Jinja2 template for Markdown conversion
+        {Fore.GREEN}--include GLOB{Style.RESET_ALL}      Only process notebooks matching a glob in batch mode (repeatable)
+        {Fore.GREEN}--exclude GLOB{Style.RESET_ALL}      Skip notebooks and folders matching a glob in batch mode (repeatable)
+        {Fore.GREEN}--no-gitignore{Style.RESET_ALL}      Also process notebooks ignored by .gitignore files
+        {Fore.GREEN}--scan-workers N{Style.RESET_ALL}    Folders listed in parallel while looking for notebooks (default 1)
+        {Fore.GREEN}--force{Style.RESET_ALL}             Rebuild all notebooks in batch mode, ignoring the build manifest
         {Fore.GREEN}--no-drive{Style.RESET_ALL}          Skip Google Drive upload
+        {Fore.GREEN}--folder-cache-ttl SECONDS{Style.RESET_ALL} Trust cached Drive folder IDs for this long (default 86400)
+        {Fore.GREEN}--sync-folders{Style.RESET_ALL}      List the Drive folder tree once and create missing folders in bulk
+        {Fore.GREEN}--upload-workers N{Style.RESET_ALL}  Number of concurrent Drive uploads in batch mode (default 4)
+        {Fore.GREEN}--drive-rate N{Style.RESET_ALL}      Maximum Drive API calls per second (default 10)
+        {Fore.GREEN}--drive-endpoint URL{Style.RESET_ALL} Send Drive API calls to another base URL, e.g. a local test server
+        {Fore.GREEN}--no-cache{Style.RESET_ALL}          Disable the cell render and compiled template caches
+        {Fore.GREEN}--cache-size MB{Style.RESET_ALL}     Maximum size of the cell render cache (default 512)
+        {Fore.GREEN}--stream{Style.RESET_ALL}            Read notebooks cell by cell to bound memory on very large files
+        {Fore.GREEN}--plotly-snapshots KIND{Style.RESET_ALL} Render Plotly outputs as svg (default, no browser), browser (PNG via headless Chrome) or none
+        {Fore.GREEN}--browsers N{Style.RESET_ALL}        Number of warm headless browsers for snapshots (default 2)
+        {Fore.GREEN}--optimize-images{Style.RESET_ALL}   Recompress extracted PNGs losslessly before writing them
+        {Fore.GREEN}--max-image-width PX{Style.RESET_ALL} Also downscale wider images (requires Pillow)
+        {Fore.GREEN}--webp{Style.RESET_ALL}              Also convert images to lossless WebP (requires Pillow)
+        {Fore.GREEN}--image-workers N{Style.RESET_ALL}   Processes optimizing images (default: CPU count)
+        {Fore.GREEN}--profile{Style.RESET_ALL}           Time each stage and print p50/p95 per notebook at the end
+        {Fore.GREEN}--profile-output PATH{Style.RESET_ALL} Write the profile as JSON, or Prometheus text format for .prom files
+        {Fore.GREEN}--watch DIRECTORY{Style.RESET_ALL}   Convert and upload notebooks in a directory as they are saved
+        {Fore.GREEN}--debounce SECONDS{Style.RESET_ALL}  Wait for saves to settle this long before converting (default 0.5)
+        {Fore.GREEN}--poll{Style.RESET_ALL}              Watch by polling instead of inotify, e.g. on network file systems
+        {Fore.GREEN}--serve [ADDRESS]{Style.RESET_ALL}   Keep converters warm and take jobs from notebookify_client.py on a Unix socket or [HOST:]PORT
+        {Fore.GREEN}--max-queue N{Style.RESET_ALL}       Unfinished jobs the server accepts before refusing more (default 64)
         {Fore.GREEN}--clean{Style.RESET_ALL}             Clear notebook outputs after Markdown conversion
         {Fore.GREEN}-o, --output-dir PATH{Style.RESET_ALL} Specify an output directory for Markdown and assets
+        {Fore.GREEN}-v, --verbose{Style.RESET_ALL}       Also log debug messages
+        {Fore.GREEN}-q, --quiet{Style.RESET_ALL}         Log only warnings and errors; twice for errors only
+        {Fore.GREEN}--log-format FORMAT{Style.RESET_ALL} Log as colored text (default) or json, one object per line
 
     {Fore.MAGENTA}Examples:{Style.RESET_ALL}
         {script_name.lower()} -h
         {script_name.lower()} --clean "path/to/notebook.ipynb"
         {script_name.lower()} --batch "path/to/notebooks/" --no-drive
+        {script_name.lower()} --watch "path/to/notebooks/"
+        {script_name.lower()} --serve --no-drive -j 2
     """
-    log_message(INFO, help_text)
+    # Printed directly, so --quiet and --log-format do not affect it.
+    print(help_text)
@@ -0,0 +1,293 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from discovery import IGNORED_DIRS
+from logger import log_message, INFO, WARNING
+
+DEFAULT_DEBOUNCE = 0.5
+POLL_INTERVAL = 1.0
+# A batch is released after this long even if saves keep arriving.
+MAX_BATCH_DELAY = 10.0
+
+# From <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+
+def _ignored(name):
+    """Checkpoints, hidden files and folders (.git, editor temp files)."""
+    return name in IGNORED_DIRS or name.startswith(".")
+
+
+def _is_notebook(name):
+    return name.endswith(".ipynb") and not _ignored(name)
+
+
+def _walk(root):
+    """Yields every watched folder below `root` with its notebook names."""
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not _ignored(d)]
+        yield folder, [f for f in files if _is_notebook(f)]
+
+
+class _InotifyBackend:
+    """
+    Change events from Linux inotify, through libc with ctypes. Every
+    folder of the tree gets a watch; folders created or moved in later are
+    added as they appear.
+    """
+
+    name = "inotify"
+
+    def __init__(self, root):
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._folders = {}
+        self.since = time.time()
+        try:
+            self._add_tree(root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_tree(self, root):
+        """Watches `root` and its subfolders; returns the notebooks found."""
+        notebooks = []
+        for folder, names in _walk(root):
+            wd = self._libc.inotify_add_watch(
+                self.fd, os.fsencode(folder), WATCH_MASK
+            )
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(
+                        error,
+                        "inotify watch limit reached; raise "
+                        "fs.inotify.max_user_watches or use --poll",
+                    )
+                # The folder vanished while being walked.
+                continue
+            self._folders[wd] = folder
+            notebooks += [os.path.join(folder, n) for n in names]
+        return notebooks
+
+    def _forget_tree(self, root):
+        prefix = root + os.sep
+        for wd, folder in list(self._folders.items()):
+            if folder == root or folder.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._folders[wd]
+
+    def read(self, timeout):
+        """Notebooks changed within `timeout` seconds (None waits)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changed += self._rescan()
+                continue
+            if mask & IN_IGNORED:
+                self._folders.pop(wd, None)
+                continue
+            folder = self._folders.get(wd)
+            if folder is None or _ignored(name):
+                continue
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    self._forget_tree(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    changed += self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and name.endswith(
+                ".ipynb"
+            ):
+                changed.append(path)
+        return changed
+
+    def _rescan(self):
+        """After lost events, every notebook modified since the last read."""
+        log_message(WARNING, "inotify queue overflowed; rescanning.")
+        since, self.since = self.since, time.time()
+        changed = []
+        for folder in list(self._folders.values()):
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            changed += [
+                e.path
+                for e in entries
+                if _is_notebook(e.name)
+                and e.is_file()
+                and e.stat().st_mtime >= since
+            ]
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """
+    Change detection by comparing the size and mtime of every notebook each
+    `interval` seconds, for systems or file systems without inotify.
+    """
+
+    name = "poll"
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self._state = self._scan()
+
+    def _scan(self):
+        state = {}
+        for folder, names in _walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def read(self, timeout):
+        """Notebooks changed within `timeout` seconds (None waits)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+            state = self._scan()
+            changed = [
+                path
+                for path, signature in state.items()
+                if self._state.get(path) != signature
+            ]
+            self._state = state
+            if changed or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                return changed
+
+    def close(self):
+        pass
+
+
+class NotebookWatcher:
+    """
+    Reports notebooks below `root` that were written, in debounced batches:
+    a batch is released once no further change arrived for `debounce`
+    seconds, so a burst of saves converts each notebook once.
+
+    Uses inotify on Linux and falls back to polling elsewhere, when the
+    watch limit is reached, or with `poll`. Checkpoint folders and hidden
+    files and folders are ignored.
+    """
+
+    def __init__(
+        self,
+        root,
+        debounce=DEFAULT_DEBOUNCE,
+        poll=False,
+        interval=POLL_INTERVAL,
+    ):
+        self.root = os.path.abspath(root)
+        if not os.path.isdir(self.root):
+            raise ValueError(f"Not a directory: {root}")
+        self.debounce = debounce
+        self._backend = None
+        if not poll and sys.platform.startswith("linux"):
+            try:
+                self._backend = _InotifyBackend(self.root)
+            except (OSError, AttributeError) as e:
+                log_message(
+                    WARNING, f"inotify unavailable ({e}); polling instead."
+                )
+        if self._backend is None:
+            self._backend = _PollingBackend(self.root, interval)
+
+    @property
+    def backend(self):
+        return self._backend.name
+
+    def next_batch(self, timeout=None):
+        """
+        Waits for changes and returns the changed notebooks once they have
+        settled, or an empty list after `timeout` seconds without changes.
+        """
+        started = time.monotonic()
+        first_change = None
+        changed = set()
+        while True:
+            now = time.monotonic()
+            if changed:
+                if now - first_change >= MAX_BATCH_DELAY:
+                    break
+                wait = self.debounce
+            elif timeout is None:
+                wait = None
+            else:
+                wait = timeout - (now - started)
+                if wait <= 0:
+                    return []
+            paths = self._backend.read(wait)
+            if paths:
+                if not changed:
+                    first_change = time.monotonic()
+                changed.update(paths)
+            elif changed:
+                break
+        # Notebooks deleted or renamed away before settling are dropped.
+        return sorted(path for path in changed if os.path.isfile(path))
+
+    def __iter__(self):
+        log_message(
+            INFO,
+            f"Watching {self.root} for notebook changes ({self.backend}).",
+        )
+        while True:
+            batch = self.next_batch()
+            if batch:
+                yield batch
+
+    def close(self):
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
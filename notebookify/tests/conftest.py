@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# Modules under src/ import each other as top-level modules.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+
+@pytest.fixture(autouse=True)
+def repo_roots():
+    """Forgets repository roots memoized by earlier tests."""
+    import utils
+
+    utils.forget_repo_roots()
+
+
+@pytest.fixture
+def metadata_path(tmp_path, monkeypatch):
+    """Keeps Drive metadata, and the run-wide folder cache, inside tmp_path."""
+    import drive
+    import utils
+
+    path = tmp_path / "drive_metadata.json"
+    monkeypatch.setattr(utils, "get_metadata_path", lambda: str(path))
+    monkeypatch.setattr(drive, "_folder_cache", None)
+    return path
@@ -0,0 +1,318 @@
+"""
+In-memory fake of the Drive v3 HTTP API for tests and benchmarks.
+
+Supports what notebookify uses: metadata create/get/list/update, multipart,
+media and resumable uploads (including updates), and batch requests. Point a
+client at it with ``build_drive_service(api_endpoint=server.url)``.
+"""
+
+import email.parser
+import email.policy
+import hashlib
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+_FILE_PATH = re.compile(r"^/(?:upload/)?drive/v3/files(?:/([^/]+))?$")
+
+
+class FakeDrive(ThreadingHTTPServer):
+    """
+    Threaded HTTP server holding Drive files in memory.
+
+    Attributes:
+        files (dict): File ID to metadata (plus ``content`` bytes).
+        requests (list): ``(method, path, uploadType)`` for every HTTP request,
+            batch parts included.
+        failures (list): Status codes returned, in order, by the next API
+            calls instead of handling them. Calls inside a batch fail on
+            their own; the batch request itself always succeeds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.files = {}
+        self.requests = []
+        self.failures = []
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._sessions = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, method=None, upload_type=None):
+        """Number of recorded requests matching `method` and `upload_type`."""
+        return sum(
+            1
+            for m, _, u in self.requests
+            if (method is None or m == method)
+            and (upload_type is None or u == upload_type)
+        )
+
+    def add_file(self, name, parents=(), mime_type=None, content=None):
+        """Creates a file directly, returning its metadata."""
+        with self.lock:
+            return self._store(
+                {
+                    "name": name,
+                    "parents": list(parents),
+                    "mimeType": mime_type,
+                },
+                content,
+            )
+
+    def _store(self, metadata, content=None, file_id=None):
+        file_id = file_id or f"file-{next(self._ids)}"
+        entry = self.files.setdefault(file_id, {"id": file_id})
+        entry.update({k: v for k, v in metadata.items() if v is not None})
+        entry.setdefault("mimeType", "application/octet-stream")
+        entry.setdefault("parents", [])
+        if content is not None:
+            entry["content"] = content
+            entry["size"] = str(len(content))
+            entry["md5Checksum"] = hashlib.md5(content).hexdigest()
+        return entry
+
+    def handle_call(self, method, target, headers, body):
+        """
+        Handles one API call. Returns ``(status, headers, json_or_None)``.
+        """
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        with self.lock:
+            self.requests.append((method, url.path, query.get("uploadType")))
+        if url.path == "/batch/drive/v3" and method == "POST":
+            return self._batch(headers, body)
+        with self.lock:
+            if self.failures:
+                return _injected_error(self.failures.pop(0))
+        match = _FILE_PATH.match(url.path)
+        if not match:
+            return 404, {}, _not_found(url.path)
+        file_id = match.group(1)
+        with self.lock:
+            if "upload_id" in query:
+                return self._resumable_chunk(query["upload_id"], headers, body)
+            if method == "GET" and file_id:
+                return self._get(file_id)
+            if method == "GET":
+                return self._list(query)
+            if method in ("POST", "PATCH"):
+                if file_id and file_id not in self.files:
+                    return 404, {}, _not_found(file_id)
+                return self._write(method, file_id, query, headers, body)
+            if method == "DELETE" and file_id in self.files:
+                del self.files[file_id]
+                return 204, {}, None
+        return 404, {}, _not_found(url.path)
+
+    def _get(self, file_id):
+        entry = self.files.get(file_id)
+        if not entry:
+            return 404, {}, _not_found(file_id)
+        return 200, {}, _public(entry)
+
+    def _list(self, query):
+        q = query.get("q", "")
+        matches = [
+            _public(entry)
+            for entry in self.files.values()
+            if _matches(entry, q)
+        ]
+        start = int(query.get("pageToken") or 0)
+        size = int(query.get("pageSize") or 100)
+        response = {"files": matches[start : start + size]}
+        if start + size < len(matches):
+            response["nextPageToken"] = str(start + size)
+        return 200, {}, response
+
+    def _write(self, method, file_id, query, headers, body):
+        upload_type = query.get("uploadType")
+        content = None
+        if upload_type == "multipart":
+            metadata, content = _parse_multipart(headers, body)
+        elif upload_type == "media":
+            metadata = {"mimeType": headers.get("Content-Type")}
+            content = body
+        else:
+            metadata = json.loads(body or b"{}")
+        if upload_type == "resumable":
+            metadata.setdefault(
+                "mimeType", headers.get("X-Upload-Content-Type")
+            )
+            session = f"upload-{next(self._ids)}"
+            self._sessions[session] = {
+                "file_id": file_id,
+                "metadata": metadata,
+                "data": bytearray(),
+            }
+            location = f"{self.url}upload/drive/v3/files?upload_id={session}"
+            return 200, {"Location": location}, None
+        if method == "PATCH" and "parents" in metadata:
+            metadata.pop("parents")
+        entry = self._store(metadata, content, file_id)
+        return 200, {}, _public(entry)
+
+    def _resumable_chunk(self, session_id, headers, body):
+        session = self._sessions.get(session_id)
+        if not session:
+            return 404, {}, _not_found(session_id)
+        content_range = headers.get("Content-Range", "")
+        match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", content_range)
+        if match:
+            start = int(match.group(1))
+            del session["data"][start:]
+            session["data"].extend(body)
+            total = match.group(3)
+        else:  # "bytes */total": a status query
+            total = content_range.rpartition("/")[2]
+        received = len(session["data"])
+        if total == "*" or received < int(total):
+            return 308, {"Range": f"bytes=0-{received - 1}"}, None
+        del self._sessions[session_id]
+        entry = self._store(
+            session["metadata"], bytes(session["data"]), session["file_id"]
+        )
+        return 200, {}, _public(entry)
+
+    def _batch(self, headers, body):
+        message = _parse_mime(headers["Content-Type"], body)
+        parts = []
+        for part in message.iter_parts():
+            request = part.get_payload(decode=True)
+            head, _, part_body = request.partition(b"\r\n\r\n")
+            if not part_body and b"\n\n" in head:
+                head, _, part_body = request.partition(b"\n\n")
+            lines = head.decode().splitlines()
+            method, target, _ = lines[0].split(" ", 2)
+            part_headers = dict(
+                line.split(": ", 1) for line in lines[1:] if ": " in line
+            )
+            status, extra, payload = self.handle_call(
+                method, target, part_headers, part_body
+            )
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(_http_part(content_id, status, payload))
+        boundary = "batch_fake_drive"
+        response = "".join(f"--{boundary}\r\n{part}" for part in parts)
+        response += f"--{boundary}--\r\n"
+        return (
+            200,
+            {"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            response.encode(),
+        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.server.handle_call(
+            self.command, self.path, self.headers, body
+        )
+        if isinstance(payload, bytes):
+            data = payload
+        else:
+            data = b"" if payload is None else json.dumps(payload).encode()
+            headers.setdefault("Content-Type", "application/json")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _injected_error(status):
+    reason = {403: "userRateLimitExceeded", 429: "rateLimitExceeded"}.get(
+        status, "backendError"
+    )
+    error = {
+        "code": status,
+        "message": "Injected failure",
+        "errors": [{"reason": reason, "message": "Injected failure"}],
+    }
+    return status, {}, {"error": error}
+
+
+def _not_found(what):
+    return {"error": {"code": 404, "message": f"File not found: {what}"}}
+
+
+def _public(entry):
+    return {k: v for k, v in entry.items() if k != "content"}
+
+
+def _matches(entry, q):
+    """Evaluates the subset of Drive's query language notebookify uses."""
+    for clause in filter(None, (c.strip() for c in q.split(" and "))):
+        if clause == "trashed=false":
+            continue
+        match = re.fullmatch(r"(\w+)\s*=\s*'(.*)'", clause)
+        if match and entry.get(match.group(1)) != match.group(2):
+            return False
+        match = re.fullmatch(r"'(.*)' in parents", clause)
+        if match and match.group(1) not in entry["parents"]:
+            return False
+    return True
+
+
+def _parse_mime(content_type, body):
+    parser = email.parser.BytesParser(policy=email.policy.HTTP)
+    return parser.parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+
+
+def _parse_multipart(headers, body):
+    metadata_part, media_part = _parse_mime(
+        headers["Content-Type"], body
+    ).iter_parts()
+    metadata = json.loads(metadata_part.get_payload(decode=True))
+    metadata.setdefault("mimeType", media_part.get_content_type())
+    return metadata, media_part.get_payload(decode=True)
+
+
+def _http_part(content_id, status, payload):
+    body = "" if payload is None else json.dumps(payload)
+    return (
+        "Content-Type: application/http\r\n"
+        f"Content-ID: {content_id}\r\n\r\n"
+        f"HTTP/1.1 {status} OK\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+        f"{body}\r\n"
+    )
@@ -0,0 +1,101 @@
+import base64
+import os
+import stat
+
+import nbformat
+
+import utils
+from assets import AssetWriter
+from markdown_converter import MarkdownConverter
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"fake image payload"
+
+
+def _image_output(output_type="display_data"):
+    output = nbformat.v4.new_output(
+        output_type,
+        data={"image/png": base64.b64encode(PNG_BYTES).decode("ascii")},
+    )
+    if output_type == "execute_result":
+        output["execution_count"] = 1
+    return output
+
+
+def test_identical_images_are_written_once(tmp_path):
+    writer = AssetWriter(str(tmp_path))
+    first = writer.write_bytes(PNG_BYTES, "png")
+    second = writer.write_bytes(PNG_BYTES, "png")
+
+    assert first == second
+    assert os.listdir(tmp_path / "images") == [first]
+    assert (tmp_path / "images" / first).read_bytes() == PNG_BYTES
+
+
+def test_assets_respect_the_umask(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_UMASK", 0o027)
+    name = AssetWriter(str(tmp_path)).write_bytes(PNG_BYTES, "png")
+    mode = (tmp_path / "images" / name).stat().st_mode
+    assert stat.S_IMODE(mode) == 0o640
+
+
+def test_process_output_references_extracted_file(tmp_path):
+    writer = AssetWriter(str(tmp_path))
+    output = _image_output("execute_result")
+
+    rendered = MarkdownConverter._process_output(output, writer)
+
+    assert rendered == f"![Image](images/{output['image_name']})"
+    assert "base64" not in rendered
+    assert (tmp_path / "images" / output["image_name"]).exists()
+
+
+class _SlowRenderer:
+    """Plotly renderer that writes its snapshots from a thread pool."""
+
+    name = "test"
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.rendered = []
+
+    def _render(self, figure, path):
+        with open(path, "w") as f:
+            f.write(str(figure))
+        self.rendered.append(path)
+
+    def snapshot(self, figure, assets):
+        return assets.write_deferred(
+            repr(figure).encode(),
+            "svg",
+            lambda path: self.pool.submit(self._render, figure, path),
+        )
+
+
+def test_deferred_assets_land_before_the_markdown(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    figure = {"data": [{"type": "bar", "y": [1, 2]}], "layout": {}}
+    cell = nbformat.v4.new_code_cell("fig")
+    cell.outputs = [
+        nbformat.v4.new_output(
+            "display_data",
+            data={"application/vnd.plotly.v1+json": figure},
+        )
+        for _ in range(2)
+    ]
+    notebook = tmp_path / "nb.ipynb"
+    nbformat.write(nbformat.v4.new_notebook(cells=[cell]), str(notebook))
+    template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+    with ThreadPoolExecutor(2) as pool:
+        converter = MarkdownConverter(template_dir)
+        converter.plotly_renderer = renderer = _SlowRenderer(pool)
+        converter.convert(str(notebook), str(tmp_path / "nb.md"))
+
+    (name,) = os.listdir(tmp_path / "images")
+    assert len(renderer.rendered) == 1
+    assert name.endswith(".svg")
+    assert (
+        f"![Static Plotly Snapshot](images/{name})"
+        in (tmp_path / "nb.md").read_text()
+    )
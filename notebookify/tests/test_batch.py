@@ -0,0 +1,128 @@
+import os
+
+import nbformat
+import pytest
+
+import batch
+import drive
+from batch import run_batch
+from fake_drive import FakeDrive, FOLDER_MIME_TYPE
+from markdown_converter import process_batch_notebooks
+from synthetic import write_tree
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+@pytest.fixture
+def template_dir(tmp_path):
+    """A minimal template, so the tests do not depend on the shipped one."""
+    folder = tmp_path / "templates"
+    folder.mkdir()
+    (folder / "template.jinja2").write_text(
+        "{% for cell in cells %}{{ cell.source }}\n{% endfor %}"
+    )
+    return str(folder)
+
+
+def _write_notebooks(folder, count):
+    folder.mkdir()
+    paths = []
+    for i in range(count):
+        notebook = nbformat.v4.new_notebook(
+            cells=[nbformat.v4.new_markdown_cell(f"# Notebook {i}")]
+        )
+        path = str(folder / f"notebook_{i}.ipynb")
+        nbformat.write(notebook, path)
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_results_follow_input_order(tmp_path, template_dir, jobs):
+    paths = _write_notebooks(tmp_path / "notebooks", 6)
+    output_dir = str(tmp_path / "out")
+    os.makedirs(output_dir)
+
+    summary = run_batch(iter(paths), output_dir, template_dir, jobs=jobs)
+
+    assert [r.notebook_path for r in summary.results] == paths
+    assert not summary.failed
+    for i, result in enumerate(summary.results):
+        assert result.status == "converted"
+        with open(result.output_path, encoding="utf-8") as f:
+            assert f"# Notebook {i}" in f.read()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failures_are_isolated(tmp_path, template_dir, jobs):
+    paths = _write_notebooks(tmp_path / "notebooks", 3)
+    broken = tmp_path / "notebooks" / "broken.ipynb"
+    broken.write_text("{not json")
+    paths.insert(1, str(broken))
+
+    summary = run_batch(paths, None, template_dir, jobs=jobs)
+
+    assert [r.notebook_path for r in summary.results] == paths
+    assert [r.notebook_path for r in summary.failed] == [str(broken)]
+    assert summary.failed[0].stage == "convert"
+    assert len(summary.succeeded) == 3
+    assert summary.as_dict()["failed"] == 1
+
+
+def test_batch_converts_and_uploads_a_tree(tmp_path, metadata_path):
+    paths = write_tree(
+        str(tmp_path / "repo"), notebooks=6, depth=2, fanout=2, cells=8
+    )
+
+    with FakeDrive() as server:
+        root = server.add_file("root", mime_type=FOLDER_MIME_TYPE)
+        drive.get_folder_cache().set("root_folder_id", root["id"])
+        summary = process_batch_notebooks(
+            paths,
+            None,
+            TEMPLATE_DIR,
+            jobs=1,
+            force=True,
+            service_factory=lambda: drive.build_drive_service(
+                api_endpoint=server.url
+            ),
+            sync_folders=True,
+        )
+
+    assert not summary.failed
+    uploaded = {
+        f["name"] for f in server.files.values() if f["name"].endswith(".md")
+    }
+    assert uploaded == {
+        os.path.basename(p).replace(".ipynb", ".md") for p in paths
+    }
+
+
+def test_uploads_consume_discovery_lazily(
+    tmp_path, template_dir, metadata_path, monkeypatch
+):
+    paths = _write_notebooks(tmp_path / "notebooks", 6)
+    first_output = paths[0].replace(".ipynb", ".md")
+    converted_before_last = []
+
+    def discover():
+        yield from paths[:-1]
+        converted_before_last.append(os.path.exists(first_output))
+        yield paths[-1]
+
+    monkeypatch.setattr(batch, "PREPARE_CHUNK", 2)
+    with FakeDrive() as server:
+        root = server.add_file("root", mime_type=FOLDER_MIME_TYPE)
+        drive.get_folder_cache().set("root_folder_id", root["id"])
+        summary = run_batch(
+            discover(),
+            None,
+            template_dir,
+            jobs=1,
+            service_factory=lambda: drive.build_drive_service(
+                api_endpoint=server.url
+            ),
+        )
+
+    assert [r.status for r in summary.results] == ["uploaded"] * 6
+    assert converted_before_last == [True]
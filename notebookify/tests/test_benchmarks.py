@@ -0,0 +1,36 @@
+import json
+
+import nbformat
+
+from run_benchmarks import compare, main
+from synthetic import generate_notebook
+
+
+def test_generated_notebook_follows_the_requested_shape():
+    notebook = generate_notebook(
+        cells=40,
+        outputs_per_cell=2,
+        images=5,
+        mime_mix={"stream": 1},
+        markdown_ratio=0,
+    )
+    nbformat.validate(notebook)
+    outputs = [o for cell in notebook.cells for o in cell.outputs]
+    assert len(notebook.cells) == 40
+    assert sum(o.output_type == "stream" for o in outputs) == 80
+    assert sum("image/png" in o.get("data", {}) for o in outputs) == 5
+
+
+def test_benchmark_run_writes_comparable_results(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    args = ["--cells", "5", "--runs", "2", "--notebooks", "3", "-j", "1"]
+
+    assert main(args + ["-o", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results["results"]["single"]["seconds"]["p50"] > 0
+    assert results["results"]["batch"]["failed"] == 0
+    assert results["results"]["batch"]["drive_requests"] > 0
+
+    slower = json.loads(output.read_text())
+    slower["results"]["single"]["seconds"]["p50"] *= 2
+    assert compare(results, slower) == ["single.seconds.p50"]
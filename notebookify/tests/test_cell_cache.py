@@ -0,0 +1,33 @@
+import os
+import time
+
+from cell_cache import CellCache
+
+
+def test_round_trip_and_key_salt(tmp_path):
+    cache = CellCache(str(tmp_path))
+    cell = {"cell_type": "code", "source": "1 + 1", "outputs": []}
+    key = cache.key(cell, "v1")
+
+    assert cache.get(key) is None
+    cache.put(key, {"fragment": "2"})
+
+    assert cache.get(key) == {"fragment": "2"}
+    assert cache.key(cell, "v2") != key
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CellCache(str(tmp_path), max_bytes=300)
+    keys = [cache.key({"source": str(i)}) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, {"fragment": "x" * 100})
+        past = time.time() - 100 + i
+        os.utime(cache._path(key), (past, past))
+
+    cache.get(keys[0])
+    cache.put(keys[2], {"fragment": "x" * 100})
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
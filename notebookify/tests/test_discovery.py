@@ -0,0 +1,107 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import discovery
+from discovery import DirectoryIndex, NotebookFinder, parse_gitignore
+
+
+def _touch(root, *paths):
+    for path in paths:
+        full = root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text("{}")
+
+
+def _found(root, **options):
+    return sorted(
+        os.path.relpath(p, root) for p in NotebookFinder(str(root), **options)
+    )
+
+
+@pytest.fixture
+def tree(tmp_path):
+    _touch(
+        tmp_path,
+        "a.ipynb",
+        "docs/b.ipynb",
+        "docs/draft/c.ipynb",
+        "docs/.ipynb_checkpoints/b-checkpoint.ipynb",
+        "node_modules/pkg/d.ipynb",
+        "env/pyvenv.cfg",
+        "env/lib/e.ipynb",
+        ".hidden/f.ipynb",
+        "build/out.ipynb",
+        "build/keep.ipynb",
+        "notes.txt",
+    )
+    (tmp_path / ".gitignore").write_text("# output\nbuild/*\n!keep.ipynb\n")
+    (tmp_path / "docs" / ".gitignore").write_text("/draft/\n")
+    return tmp_path
+
+
+def test_skips_checkpoints_environments_and_gitignored_files(tree):
+    assert _found(tree) == ["a.ipynb", "build/keep.ipynb", "docs/b.ipynb"]
+    assert _found(tree, gitignore=False) == [
+        "a.ipynb",
+        "build/keep.ipynb",
+        "build/out.ipynb",
+        "docs/b.ipynb",
+        "docs/draft/c.ipynb",
+    ]
+
+
+def test_include_and_exclude_globs(tree):
+    assert _found(tree, include=["docs/**"]) == ["docs/b.ipynb"]
+    assert _found(tree, exclude=["docs", "keep.*"]) == ["a.ipynb"]
+
+
+def test_parallel_traversal_finds_the_same_notebooks(tree):
+    for i in range(20):
+        _touch(tree, f"wide/{i}/n{i}.ipynb")
+    assert _found(tree, workers=4) == _found(tree)
+
+
+def test_parallel_traversal_keeps_notebooks_of_slow_parents(
+    tmp_path, monkeypatch
+):
+    _touch(tmp_path, "a.ipynb", "b.ipynb", "c.ipynb")
+    (tmp_path / "empty").mkdir()
+
+    class SlowSubmits(ThreadPoolExecutor):
+        # Children finish before their parent is done submitting them.
+        def submit(self, *args, **kwargs):
+            future = super().submit(*args, **kwargs)
+            time.sleep(0.05)
+            return future
+
+    monkeypatch.setattr(discovery, "ThreadPoolExecutor", SlowSubmits)
+    assert _found(tmp_path, workers=4) == ["a.ipynb", "b.ipynb", "c.ipynb"]
+
+
+def test_gitignore_patterns():
+    rules = parse_gitignore("*.ipynb\n!/keep.ipynb\nlogs/\n", base="sub")
+    assert rules[0].matches("sub/x/a.ipynb", "a.ipynb", False)
+    assert rules[1].matches("sub/keep.ipynb", "keep.ipynb", False)
+    assert not rules[1].matches("sub/x/keep.ipynb", "keep.ipynb", False)
+    assert rules[2].matches("sub/logs", "logs", True)
+    assert not rules[2].matches("sub/logs", "logs", False)
+
+
+def test_index_reuses_listings_of_unchanged_folders(tree, tmp_path_factory):
+    index_path = str(tmp_path_factory.mktemp("index") / "index.json")
+    past = time.time() - 60
+    for folder, _, _ in os.walk(tree):
+        os.utime(folder, (past, past))
+
+    expected = _found(tree, index=DirectoryIndex(index_path))
+    index = DirectoryIndex(index_path)
+    assert _found(tree, index=index) == expected
+    assert index.misses == 0 and index.hits > 0
+
+    _touch(tree, "docs/new.ipynb")
+    index = DirectoryIndex(index_path)
+    assert "docs/new.ipynb" in _found(tree, index=index)
+    assert index.misses == 1
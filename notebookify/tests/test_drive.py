@@ -0,0 +1,147 @@
+import json
+
+import drive
+import utils
+
+
+class _Request:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeFiles:
+    """Minimal stand-in for `service.files()` that counts API calls."""
+
+    def __init__(self, folders=(), page_size=2):
+        self.calls = []
+        self.created = 0
+        self.folders = list(folders)
+        self.page_size = page_size
+
+    def list(self, q, spaces, fields, pageSize, pageToken=None):
+        self.calls.append(("list", pageToken))
+        start = int(pageToken or 0)
+        end = start + self.page_size
+        response = {"files": self.folders[start:end]}
+        if end < len(self.folders):
+            response["nextPageToken"] = str(end)
+        return _Request(response)
+
+    def get(self, fileId, fields):
+        self.calls.append(("get", fileId))
+        return _Request({"id": fileId})
+
+    def create(self, body, fields, media_body=None):
+        self.calls.append(("create", body["name"]))
+        self.created += 1
+        return _Request({"id": f"id-{self.created}"})
+
+
+class FakeBatch:
+    def __init__(self, files, callback):
+        self.files = files
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.files.calls.append(("batch", len(self.requests)))
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(), None)
+
+
+class FakeService:
+    def __init__(self, folders=()):
+        self._files = FakeFiles(folders)
+
+    def files(self):
+        return self._files
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self._files, callback)
+
+
+def test_cached_folders_skip_the_api_until_expired(metadata_path):
+    service = FakeService()
+    cache = drive.FolderCache(ttl=3600)
+
+    first = drive.get_or_create_drive_folder(
+        service, "docs", "root", cache=cache
+    )
+    again = drive.get_or_create_drive_folder(
+        service, "docs", "root", cache=cache
+    )
+    assert first == again
+    assert service.files().calls == [("create", "docs")]
+
+    cache.expire("root/docs")
+    drive.get_or_create_drive_folder(service, "docs", "root", cache=cache)
+    assert service.files().calls[-1] == ("get", first)
+
+
+def test_flush_writes_metadata_once(metadata_path):
+    metadata_path.write_text(json.dumps({"root_folder_id": "root"}))
+    cache = drive.FolderCache()
+    service = FakeService()
+
+    for name in ("a", "b", "c"):
+        drive.get_or_create_drive_folder(service, name, "root", cache=cache)
+    store = utils.get_metadata()
+    assert store.as_dict() == {"root_folder_id": "root"}
+
+    cache.flush()
+    assert store.get("root/a") == "id-1"
+    assert store.get("root_folder_id") == "root"
+    for key in ("root/a", "root/b", "root/c"):
+        assert store.get_entry(key)[1] > 0
+
+    reloaded = drive.FolderCache()
+    drive.get_or_create_drive_folder(service, "b", "root", cache=reloaded)
+    assert service.files().created == 3
+
+
+def test_bulk_sync_creates_only_missing_folders_per_level(
+    metadata_path, tmp_path, monkeypatch
+):
+    metadata_path.write_text(json.dumps({"root_folder_id": "root"}))
+    repo = tmp_path / "repo"
+    (repo / ".git").mkdir(parents=True)
+    existing = [
+        {"id": "f-docs", "name": "docs", "parents": ["root"]},
+        {"id": "f-api", "name": "api", "parents": ["f-docs"]},
+        {"id": "f-other", "name": "other", "parents": ["elsewhere"]},
+    ]
+    service = FakeService(existing)
+    cache = drive.FolderCache()
+    files = [
+        repo / "docs" / "api" / "a.md",
+        repo / "docs" / "guide" / "intro" / "b.md",
+        repo / "docs" / "guide" / "c.md",
+        repo / "src" / "d.md",
+    ]
+
+    created = drive.ensure_drive_folders(
+        service, [str(f) for f in files], cache=cache
+    )
+
+    calls = service.files().calls
+    assert created == 3
+    assert [c for c in calls if c[0] == "list"] == [
+        ("list", None),
+        ("list", "2"),
+    ]
+    # One batch per depth level: src, docs/guide, docs/guide/intro
+    assert [c for c in calls if c[0] == "batch"] == [("batch", 1)] * 3
+    assert cache.get("f-docs/api") == "f-api"
+    assert cache.get("f-docs/guide") is not None
+
+    calls.clear()
+    drive._resolve_folder_path(
+        service, "root", ["docs", "guide", "intro"], cache
+    )
+    assert calls == []
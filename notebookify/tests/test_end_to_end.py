@@ -1,31 +1,23 @@
 import os
-import shutil
-from notebookify.src.markdown_converter import (
-    convert_to_markdown_with_template,
-    ensure_folder_exists,
-)
 
+from markdown_converter import MarkdownConverter
 
-def test_end_to_end():
+PACKAGE_DIR = os.path.join(os.path.dirname(__file__), "..")
+EXAMPLE = os.path.join(PACKAGE_DIR, "examples", "example_notebook.ipynb")
+TEMPLATE_DIR = os.path.join(PACKAGE_DIR, "templates")
+
+
+def test_end_to_end(tmp_path):
     """
-    End-to-end test for notebook-to-Markdown conversion with folder management.
+    Converts the example notebook and checks the Markdown and its images.
     """
-    notebook_path = "example_notebook.ipynb"
-    output_dir = "test_outputs"
-    template_path = "template.jinja2"
-    output_file = os.path.join(output_dir, "example_output.md")
+    output_file = tmp_path / "out" / "example_output.md"
 
-    try:
-        # Ensure output directory exists
-        ensure_folder_exists(output_dir)
+    MarkdownConverter(TEMPLATE_DIR).convert(EXAMPLE, str(output_file))
 
-        # Convert notebook
-        convert_to_markdown_with_template(
-            notebook_path, output_file, template_path
-        )
-        assert os.path.exists(output_file)
-        print(f"Test passed: {output_file} created successfully.")
-    finally:
-        # Cleanup test directory
-        if os.path.exists(output_dir):
-            shutil.rmtree(output_dir)
+    markdown = output_file.read_text()
+    assert "``` python" in markdown
+    images = os.listdir(tmp_path / "out" / "images")
+    assert images
+    for name in images:
+        assert f"images/{name}" in markdown
@@ -1,28 +1,43 @@
 import os
-import pytest
-from notebookify.src.markdown_converter import (
-    ensure_folder_exists,
-    MarkdownConverter,
-)
-
-
-def test_ensure_folder_exists():
-    test_folder = "test_outputs"
-    try:
-        # Test folder creation
-        ensure_folder_exists(test_folder)
-        assert os.path.exists(test_folder)
-    finally:
-        # Cleanup
-        if os.path.exists(test_folder):
-            os.rmdir(test_folder)
-
-
-def test_cleanup_folder():
-    test_folder = "test_cleanup"
-    os.makedirs(test_folder, exist_ok=True)
-    assert os.path.exists(test_folder)
-
-    # Test cleanup
-    MarkdownConverter.cleanup_folder(test_folder)
-    assert not os.path.exists(test_folder)
+
+import utils
+from utils import cleanup_folder, detect_github_root, safe_create_folder
+
+
+def test_safe_create_folder_creates_parents(tmp_path):
+    folder = tmp_path / "a" / "b"
+    safe_create_folder(str(folder))
+    safe_create_folder(str(folder))
+    assert folder.is_dir()
+
+
+def test_cleanup_folder(tmp_path):
+    folder = tmp_path / "cleanup"
+    (folder / "nested").mkdir(parents=True)
+    (folder / "nested" / "file.md").write_text("x")
+
+    cleanup_folder(str(folder))
+    assert not folder.exists()
+    # A missing folder is only logged.
+    cleanup_folder(str(folder))
+
+
+def test_detect_github_root_memoizes_every_visited_folder(
+    tmp_path, monkeypatch
+):
+    repo = tmp_path / "repo"
+    (repo / ".git").mkdir(parents=True)
+    (repo / "a" / "b").mkdir(parents=True)
+    monkeypatch.setattr(utils, "_repo_roots", {})
+
+    assert detect_github_root(str(repo / "a" / "b" / "nb.ipynb")) == str(repo)
+    assert utils._repo_roots[str(repo / "a")] == str(repo)
+    # Output folders that do not exist yet resolve through their parents.
+    assert detect_github_root(str(repo / "new" / "nb.md")) == str(repo)
+    assert detect_github_root(str(tmp_path / "nb.ipynb")) in (None, "/")
+
+    def no_stat(path):
+        raise AssertionError(f"{path} checked again")
+
+    monkeypatch.setattr(os.path, "lexists", no_stat)
+    assert detect_github_root(str(repo / "a" / "other.ipynb")) == str(repo)
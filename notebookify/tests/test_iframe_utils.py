@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from iframe_utils import BrowserPool
+
+
+class _FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class _FakePool(BrowserPool):
+    def _start_driver(self):
+        return _FakeDriver()
+
+
+def test_failed_snapshots_do_not_leak_browsers():
+    with _FakePool(size=1) as pool:
+        for error in (RuntimeError("bug"), KeyboardInterrupt()):
+            with pytest.raises(type(error)):
+                with pool.driver() as driver:
+                    raise error
+            assert driver.quit_called
+            assert pool._started == 0
+        with pool.driver() as driver:
+            pass
+        with pool.driver() as reused:
+            assert reused is driver
@@ -0,0 +1,84 @@
+import base64
+import importlib.util
+import struct
+import zlib
+
+import nbformat
+import pytest
+
+from assets import AssetWriter
+from image_optimizer import ImageOptimizer, recompress_png, _chunks
+from markdown_converter import MarkdownConverter
+
+
+def _png(width=64, height=64, level=1):
+    """A grayscale gradient PNG, deflated at `level`, with a text chunk."""
+
+    def chunk(kind, body):
+        crc = zlib.crc32(kind + body)
+        return (
+            struct.pack(">I", len(body)) + kind + body + struct.pack(">I", crc)
+        )
+
+    rows = b"".join(
+        b"\x00" + bytes((x * y) % 256 for x in range(width))
+        for y in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"tEXt", b"Software\x00matplotlib")
+        + chunk(b"IDAT", zlib.compress(rows, level))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _pixels(png):
+    return zlib.decompress(
+        b"".join(body for kind, body in _chunks(png) if kind == b"IDAT")
+    )
+
+
+def test_recompression_is_lossless_and_smaller():
+    original = _png()
+    packed = recompress_png(original)
+    assert len(packed) < len(original)
+    assert _pixels(packed) == _pixels(original)
+    assert b"tEXt" not in packed
+    assert recompress_png(packed) == packed
+    assert recompress_png(b"not a png") == b"not a png"
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_extracted_images_are_optimized_once(tmp_path, workers):
+    optimizer = ImageOptimizer(
+        workers=workers, cache_dir=str(tmp_path / "cache")
+    )
+    original = _png()
+    encoded = base64.b64encode(original).decode("ascii")
+    try:
+        names = []
+        for folder in ("a", "b"):
+            assets = AssetWriter(str(tmp_path / folder), optimizer=optimizer)
+            output = nbformat.v4.new_output(
+                "display_data", data={"image/png": encoded}
+            )
+            rendered = MarkdownConverter._process_output(output, assets)
+            assets.wait()
+            names.append(output["image_name"])
+            assert rendered == f"![Image](images/{output['image_name']})"
+            written = (tmp_path / folder / "images" / names[-1]).read_bytes()
+            assert written == recompress_png(original)
+        assert names[0] == names[1]
+        assert len(optimizer._memo) == 1
+        assert len(list((tmp_path / "cache").iterdir())) == 1
+    finally:
+        optimizer.close()
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("PIL") is not None, reason="Pillow installed"
+)
+def test_resizing_requires_pillow():
+    with pytest.raises(ImportError, match="Pillow"):
+        ImageOptimizer(max_width=800)
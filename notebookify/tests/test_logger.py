@@ -0,0 +1,71 @@
+import json
+
+import nbformat
+import pytest
+
+import logger
+from logger import (
+    configure_logging,
+    flush_logs,
+    log_message,
+    preview,
+    DEBUG,
+    INFO,
+    WARNING,
+    ERROR,
+)
+from utils import handle_unsupported_output
+
+
+@pytest.fixture
+def output(capsys):
+    """Reads what is logged, restoring the default settings afterwards."""
+    yield lambda: capsys.readouterr().out
+    configure_logging()
+
+
+class _Exploding:
+    def __str__(self):
+        raise AssertionError("formatted a filtered message")
+
+
+def test_levels_below_the_threshold_are_not_formatted(output):
+    configure_logging(verbosity=-1)
+    log_message(INFO, "Processing %s", _Exploding())
+    log_message(WARNING, "Kept %d of %d", 1, 2)
+    flush_logs()
+    assert output() == f"{WARNING} Kept 1 of 2\n"
+
+    configure_logging(verbosity=1)
+    assert logger.is_enabled(DEBUG)
+    assert logger.logging_config()["verbosity"] == 1
+
+
+def test_background_writer_keeps_order(output):
+    for i in range(1000):
+        log_message(ERROR, "line %d", i)
+    flush_logs()
+    lines = output().splitlines()
+    assert lines == [f"{ERROR} line {i}" for i in range(1000)]
+
+
+def test_json_lines_strip_colors(output):
+    configure_logging(json_lines=True)
+    log_message(INFO, f"{logger.Fore.RED}red{logger.Style.RESET_ALL} %s", 1)
+    flush_logs()
+    record = json.loads(output())
+    assert record["level"] == "info"
+    assert record["message"] == "red 1"
+
+
+def test_unsupported_outputs_are_previewed(output):
+    payload = nbformat.from_dict(
+        {"output_type": "display_data", "data": {"x/y": "A" * 10**6}}
+    )
+    comment = handle_unsupported_output(payload)
+    flush_logs()
+    assert comment == "<!-- Unsupported output type: display_data (x/y) -->"
+    logged = output()
+    assert len(logged) < 1000
+    assert "characters)" in logged
+    assert str(preview("short")) == "short"
@@ -0,0 +1,68 @@
+import os
+
+import nbformat
+
+from batch import run_batch
+from manifest import BuildManifest, CURRENT, NEEDS_UPLOAD, STALE
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+def _build(tmp_path):
+    notebook = tmp_path / "nb.ipynb"
+    output = tmp_path / "nb.md"
+    notebook.write_text('{"cells": []}')
+    output.write_text("# nb")
+    return str(notebook), str(output)
+
+
+def test_unchanged_notebook_is_current(tmp_path):
+    notebook, output = _build(tmp_path)
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record(notebook, output, "tpl", "0.1", drive_file_id="abc")
+    manifest.save()
+
+    reloaded = BuildManifest(str(tmp_path / "manifest.json"))
+    assert (
+        reloaded.check(notebook, output, "tpl", "0.1", upload=True) == CURRENT
+    )
+
+
+def test_changes_invalidate_entry(tmp_path):
+    notebook, output = _build(tmp_path)
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record(notebook, output, "tpl", "0.1")
+
+    assert (
+        manifest.check(notebook, output, "tpl", "0.1", upload=True)
+        == NEEDS_UPLOAD
+    )
+    assert manifest.check(notebook, output, "other", "0.1") == STALE
+    assert manifest.check(notebook, output, "tpl", "0.2") == STALE
+
+    (tmp_path / "nb.ipynb").write_text('{"cells": [1]}')
+    assert manifest.check(notebook, output, "tpl", "0.1") == STALE
+
+
+def test_other_converter_options_rebuild_notebooks(tmp_path):
+    notebook = str(tmp_path / "nb.ipynb")
+    nbformat.write(nbformat.v4.new_notebook(), notebook)
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+
+    def build(**options):
+        summary = run_batch(
+            [notebook],
+            None,
+            TEMPLATE_DIR,
+            jobs=1,
+            manifest=manifest,
+            converter_options=options,
+        )
+        return summary.results[0].status
+
+    assert build() == "converted"
+    assert build() == "skipped"
+    assert build(optimize_images=True) == "converted"
+    assert build(optimize_images=True, image_workers=0) == "skipped"
+    assert build(optimize_images=True, plotly_snapshots="svg") == "converted"
+    assert build(plotly_snapshots="none") == "converted"
@@ -0,0 +1,90 @@
+import os
+import shutil
+import stat
+
+import pytest
+
+import utils
+from markdown_converter import MarkdownConverter, get_converter
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+def test_save_markdown_writes_chunks(tmp_path):
+    output = tmp_path / "out" / "nb.md"
+
+    MarkdownConverter._save_markdown(
+        str(output), iter(["# Title", "\n", "body"])
+    )
+
+    assert output.read_text() == "# Title\nbody"
+    assert [p.name for p in output.parent.iterdir()] == ["nb.md"]
+
+
+def test_saved_markdown_respects_umask_and_existing_mode(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(utils, "_UMASK", 0o077)
+    output = tmp_path / "nb.md"
+    MarkdownConverter._save_markdown(str(output), "new")
+    assert stat.S_IMODE(output.stat().st_mode) == 0o600
+
+    output.chmod(0o640)
+    MarkdownConverter._save_markdown(str(output), "replaced")
+    assert stat.S_IMODE(output.stat().st_mode) == 0o640
+
+
+def test_failed_render_keeps_previous_file(tmp_path):
+    output = tmp_path / "nb.md"
+    output.write_text("previous")
+
+    def chunks():
+        yield "partial"
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        MarkdownConverter._save_markdown(str(output), chunks())
+
+    assert output.read_text() == "previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["nb.md"]
+
+
+def test_converters_are_shared_per_template_dir_and_options():
+    converter = get_converter(TEMPLATE_DIR, stream=True)
+
+    assert get_converter(TEMPLATE_DIR + os.sep, stream=True) is converter
+    assert get_converter(TEMPLATE_DIR, stream=False) is not converter
+
+
+def test_compiled_templates_are_cached_by_content(tmp_path):
+    cache_dir = tmp_path / "compiled"
+    copy = tmp_path / "copy"
+    shutil.copytree(TEMPLATE_DIR, copy)
+
+    MarkdownConverter(
+        TEMPLATE_DIR, template_cache_dir=str(cache_dir)
+    ).env.get_template("template.jinja2")
+    (entry,) = cache_dir.iterdir()
+    written = entry.stat().st_mtime_ns
+
+    # An identical template elsewhere reuses the compiled code.
+    MarkdownConverter(
+        str(copy), template_cache_dir=str(cache_dir)
+    ).env.get_template("template.jinja2")
+    assert list(cache_dir.iterdir()) == [entry]
+    assert entry.stat().st_mtime_ns == written
+
+    (copy / "template.jinja2").write_text("{{ cells | length }}")
+    template = MarkdownConverter(
+        str(copy), template_cache_dir=str(cache_dir)
+    ).env.get_template("template.jinja2")
+    assert template.render(cells=[1, 2]) == "2"
+    assert len(list(cache_dir.iterdir())) == 2
+
+    # Identical text under another name is compiled under that name.
+    (copy / "other.jinja2").write_text("{{ cells | length }}")
+    template = MarkdownConverter(
+        str(copy), template_cache_dir=str(cache_dir)
+    ).env.get_template("other.jinja2")
+    assert template.name == "other.jinja2"
+    assert len(list(cache_dir.iterdir())) == 3
@@ -0,0 +1,54 @@
+import json
+import multiprocessing
+
+from metadata_store import MetadataStore
+
+
+def _write_folders(db_path, worker):
+    store = MetadataStore(db_path)
+    for i in range(50):
+        store.write({f"{worker}/folder-{i}": f"id-{worker}-{i}"})
+
+
+def test_json_metadata_is_migrated_once(tmp_path):
+    legacy = tmp_path / "drive_metadata.json"
+    legacy.write_text(
+        json.dumps(
+            {
+                "root_folder_id": "root",
+                "root/docs": "docs-id",
+                "folder_validated_at": {"root/docs": 123.0},
+            }
+        )
+    )
+    db_path = str(tmp_path / "drive_metadata.db")
+
+    store = MetadataStore(db_path, str(legacy))
+    assert store.as_dict() == {
+        "root_folder_id": "root",
+        "root/docs": "docs-id",
+    }
+    assert store.get_entry("root/docs") == ("docs-id", 123.0)
+
+    store.write({"root/docs": None, "root/new": "new-id"})
+    legacy.write_text(json.dumps({"root/stale": "stale-id"}))
+    reopened = MetadataStore(db_path, str(legacy))
+    assert reopened.as_dict() == {
+        "root_folder_id": "root",
+        "root/new": "new-id",
+    }
+
+
+def test_parallel_processes_keep_every_write(tmp_path):
+    db_path = str(tmp_path / "drive_metadata.db")
+    MetadataStore(db_path)
+    workers = [
+        multiprocessing.Process(target=_write_folders, args=(db_path, worker))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    assert len(MetadataStore(db_path).as_dict()) == 200
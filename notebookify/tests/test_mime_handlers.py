@@ -0,0 +1,87 @@
+import base64
+
+import nbformat
+
+from assets import AssetWriter
+from markdown_converter import MarkdownConverter
+from mime_handlers import (
+    MimeHandler,
+    MimeRegistry,
+    RenderContext,
+    get_mime_registry,
+)
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg"><rect width="1"/></svg>'
+
+
+def _render(output, assets=None):
+    return MarkdownConverter._process_output(output, assets)
+
+
+def test_stream_and_error_outputs_are_rendered(capsys):
+    stream = nbformat.v4.new_output(
+        "stream", name="stdout", text="hello\n```\n"
+    )
+    error = nbformat.v4.new_output(
+        "error",
+        ename="ValueError",
+        evalue="bad",
+        traceback=["\x1b[0;31mValueError\x1b[0m: bad"],
+    )
+    assert _render(stream) == "````\nhello\n```\n````"
+    assert _render(error) == "```\nValueError: bad\n```"
+    assert "WARNING" not in capsys.readouterr().out
+
+
+def test_richest_mime_type_wins(tmp_path):
+    assets = AssetWriter(str(tmp_path))
+    html = nbformat.v4.new_output(
+        "execute_result",
+        data={"text/plain": "df", "text/html": "<table></table>"},
+        execution_count=1,
+    )
+    svg = nbformat.v4.new_output(
+        "display_data", data={"text/plain": "fig", "image/svg+xml": SVG}
+    )
+    assert _render(html, assets) == "<table></table>"
+    assert _render(svg, assets) == f"![Image](images/{svg['image_name']})"
+    assert (tmp_path / "images" / svg["image_name"]).read_text() == SVG
+
+    inlined = _render(nbformat.v4.new_output("display_data", data=svg.data))
+    encoded = base64.b64encode(SVG.encode()).decode()
+    assert inlined == f"![Image](data:image/svg+xml;base64,{encoded})"
+
+
+def test_plugins_override_builtins_and_are_counted():
+    registry = MimeRegistry()
+    for handler in get_mime_registry().handlers:
+        registry.register(
+            MimeHandler(
+                handler.name, handler.keys, handler.render, handler.priority
+            )
+        )
+
+    @registry.handler("text/plain", "application/geo+json", priority=75)
+    def geo(output, value, context):
+        return f"map of {len(value)} features"
+
+    output = {
+        "output_type": "display_data",
+        "data": {"text/html": "<div/>", "application/geo+json": [1, 2]},
+    }
+    for _ in range(3):
+        assert registry.render(output, RenderContext()) == "map of 2 features"
+    plain = {"output_type": "display_data", "data": {"text/plain": "x"}}
+    assert registry.render(plain, RenderContext()) == "map of 1 features"
+    assert registry.render({"output_type": "unknown"}, None) is None
+
+    stats = registry.stats()
+    assert stats["geo"]["calls"] == 4
+    assert stats["html"]["calls"] == 0
+
+
+def test_unknown_outputs_still_fall_back():
+    output = {"output_type": "display_data", "data": {"x/unknown": "?"}}
+    assert _render(output) == (
+        "<!-- Unsupported output type: display_data (x/unknown) -->"
+    )
@@ -0,0 +1,33 @@
+import nbformat
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook
+
+from notebook_stream import StreamedNotebook
+
+
+def test_streamed_cells_match_nbformat(tmp_path):
+    notebook = new_notebook(metadata={"language_info": {"name": "python"}})
+    notebook.cells = [
+        new_markdown_cell('Brackets ] } and "quotes" \\ in text'),
+        new_code_cell("print('[{')", outputs=[]),
+        new_code_cell(""),
+    ]
+    notebook.cells[1].outputs = [
+        nbformat.v4.new_output("stream", name="stdout", text="a\nb\\\n")
+    ]
+    path = tmp_path / "nb.ipynb"
+    nbformat.write(notebook, str(path))
+
+    with StreamedNotebook(str(path)) as streamed:
+        cells = list(streamed.iter_cells())
+        assert streamed.nbformat == 4
+        assert streamed.header["metadata"]["language_info"]["name"] == "python"
+
+    assert cells == nbformat.read(str(path), as_version=4).cells
+
+
+def test_empty_cell_list(tmp_path):
+    path = tmp_path / "empty.ipynb"
+    nbformat.write(new_notebook(), str(path))
+
+    with StreamedNotebook(str(path)) as streamed:
+        assert list(streamed.iter_cells()) == []
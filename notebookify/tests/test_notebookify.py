@@ -1,21 +1,29 @@
 import os
-from notebookify.src.markdown_converter import MarkdownConverter
+import subprocess
+import sys
 
+PACKAGE_DIR = os.path.join(os.path.dirname(__file__), "..")
+MAIN = os.path.join(PACKAGE_DIR, "src", "notebookify_main.py")
+EXAMPLE = os.path.join(PACKAGE_DIR, "examples", "example_notebook.ipynb")
 
-def test_conversion():
-    converter = MarkdownConverter(template_dir="templates/")
-    converter.convert("example_notebook.ipynb", "output.md", "template.jinja2")
-    assert os.path.exists("output.md"), "Markdown file was not created!"
 
+def test_cli_converts_a_notebook_without_drive(tmp_path):
+    result = subprocess.run(
+        [
+            sys.executable,
+            MAIN,
+            EXAMPLE,
+            "--no-drive",
+            "--no-cache",
+            "-o",
+            str(tmp_path),
+            "-t",
+            os.path.join(PACKAGE_DIR, "templates"),
+        ],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
 
-def test_cleanup():
-    temp_folder = "temp_test/"
-    os.makedirs(temp_folder, exist_ok=True)
-    MarkdownConverter.cleanup_folder(temp_folder)
-    assert not os.path.exists(temp_folder), "Temporary folder was not deleted!"
-
-
-if __name__ == "__main__":
-    test_conversion()
-    test_cleanup()
-    print("All tests passed!")
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert (tmp_path / "example_notebook.md").exists()
@@ -0,0 +1,159 @@
+import base64
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from assets import AssetWriter
+from logger import flush_logs
+from markdown_converter import MarkdownConverter
+from mime_handlers import PLOTLY_MIME_TYPE
+from plotly_svg import (
+    SvgPlotlyRenderer,
+    decimate_line,
+    decimate_markers,
+    render_figure,
+)
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def _parse(svg):
+    return ET.fromstring(svg)
+
+
+def test_renders_common_trace_types():
+    figure = {
+        "data": [
+            {"type": "scatter", "x": [1, 2, 3], "y": [4, 1, 9], "name": "a"},
+            {"type": "bar", "x": ["p", "q"], "y": [3, 5], "name": "b"},
+            {"type": "histogram", "x": list(np.random.randn(500))},
+            {"type": "heatmap", "z": [[1, 2], [3, 4]]},
+        ],
+        "layout": {"title": {"text": "Mixed <traces>"}},
+    }
+    root = _parse(render_figure(figure))
+
+    assert root.find(f".//{SVG}polyline") is not None
+    assert root.find(f".//{SVG}image") is not None
+    texts = [t.text for t in root.iter(f"{SVG}text")]
+    assert "Mixed <traces>" in texts
+    assert "a" in texts and "b" in texts
+
+
+def test_decodes_typed_arrays():
+    y = np.arange(4, dtype="f8")
+    figure = {
+        "data": [
+            {
+                "type": "scatter",
+                "y": {
+                    "dtype": "f8",
+                    "bdata": base64.b64encode(y.tobytes()).decode(),
+                },
+            }
+        ]
+    }
+    assert _parse(render_figure(figure)).find(f".//{SVG}polyline") is not None
+
+
+def test_large_line_is_decimated_but_keeps_extremes():
+    x = np.linspace(0, 1, 200_000)
+    y = np.sin(x * 50)
+    y[123_456] = 10.0
+    px, py = decimate_line(x * 600, y, 600)
+
+    assert len(px) <= 4 * 601
+    assert py.max() == 10.0
+    assert np.all(np.diff(px) >= 0)
+
+
+def test_large_marker_cloud_is_thinned():
+    points = np.random.rand(2, 100_000) * 500
+    px, py = decimate_markers(*points, limit=5000)
+    assert len(px) <= 5000
+
+
+def test_unsupported_figure_keeps_placeholder(tmp_path):
+    assets = AssetWriter(str(tmp_path))
+    figure = {"data": [{"type": "sunburst"}]}
+    assert SvgPlotlyRenderer().snapshot(figure, assets) is None
+
+
+def test_degenerate_figures():
+    # A histogram without samples is skipped like other unsupported traces.
+    figure = {
+        "data": [{"type": "histogram"}, {"type": "scatter", "y": [1, 2]}],
+        "layout": {"yaxis": {"range": [1, 1]}},
+    }
+    root = _parse(render_figure(figure))
+    assert root.find(f".//{SVG}polyline") is not None
+
+    log_axis = {"data": [{"y": [1, 10]}], "layout": {"xaxis": {"type": "log"}}}
+    assert render_figure(log_axis) is None
+
+
+def test_categorical_histograms_are_counted():
+    figure = {
+        "data": [
+            {
+                "type": "histogram",
+                "x": ["b", "a", "b", None, "b"],
+                "opacity": None,
+                "xbins": {"size": "1"},
+            }
+        ],
+        "layout": {"xaxis": {"range": ["a", "b"]}, "width": "wide"},
+    }
+    root = _parse(render_figure(figure))
+    path = root.find(f".//{SVG}path[@fill='#636efa']").get("d")
+    heights = [
+        float(rect.split("v")[1].split("h")[0])
+        for rect in path[1:-1].split("zM")
+    ]
+    # "b" is three times as tall as "a".
+    assert heights[0] == pytest.approx(3 * heights[1], rel=0.02)
+    labels = [t.text for t in root.iter(f"{SVG}text")]
+    assert labels[:2] == ["b", "a"]
+
+
+def test_numeric_fields_fall_back_to_defaults():
+    figure = {
+        "data": [
+            {
+                "type": "histogram",
+                "x": [1, 2, 2, 3],
+                "xbins": {"start": "x", "size": "big"},
+                "nbinsx": "many",
+            },
+            {"y": [1, 2], "line": {"width": "thick"}, "marker": {"size": "s"}},
+        ],
+        "layout": {"margin": {"l": None}, "xaxis": {"range": [None, 2]}},
+    }
+    assert render_figure(figure).startswith("<svg")
+
+
+def test_date_axes_are_not_drawn(capsys):
+    dates = {"data": [{"x": ["2024-01-01", "2024-01-05"], "y": [1, 2]}]}
+    typed = {
+        "data": [{"x": [1, 2], "y": [1, 2]}],
+        "layout": {"xaxis": {"type": "date"}},
+    }
+    histogram = {"data": [{"type": "histogram", "x": ["2024-01-01"]}]}
+    for figure in (dates, typed, histogram):
+        assert render_figure(figure) is None
+    flush_logs()
+    assert "date axes are not drawn" in capsys.readouterr().out
+
+
+def test_process_output_fills_plotly_snapshot(tmp_path):
+    assets = AssetWriter(str(tmp_path))
+    output = {
+        "output_type": "display_data",
+        "data": {PLOTLY_MIME_TYPE: {"data": [{"y": [1, 3, 2]}]}},
+    }
+    MarkdownConverter._process_output(output, assets, SvgPlotlyRenderer())
+
+    name = output["plotly_snapshot"]
+    assert name.endswith(".svg")
+    _parse((tmp_path / "images" / name).read_text())
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+import nbformat
+import pytest
+
+import profiler as profiler_module
+from batch import run_batch
+from profiler import Profiler, enable_profiling, percentile
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setattr(profiler_module, "_profiler", Profiler())
+    return enable_profiling()
+
+
+def test_nested_stages_record_exclusive_time():
+    profiler = Profiler(enabled=True)
+    with profiler.stage("outer"):
+        time.sleep(0.02)
+        with profiler.stage("inner"):
+            time.sleep(0.05)
+
+    assert profiler.samples["inner"][0] >= 0.05
+    assert 0.02 <= profiler.samples["outer"][0] < 0.05
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile([], 0.5) == 0.0
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    with profiler.stage("load_notebook"):
+        profiler.count("bytes_read", 10)
+    assert not profiler.samples and not profiler.counters
+
+
+def test_batch_profile_covers_stages_and_outputs(tmp_path, profiler):
+    notebook = nbformat.v4.new_notebook()
+    notebook.cells = [
+        nbformat.v4.new_code_cell(
+            "print(1)",
+            outputs=[nbformat.v4.new_output("stream", text="1\n")],
+        )
+    ]
+    paths = []
+    for name in ("a", "b"):
+        path = tmp_path / f"{name}.ipynb"
+        nbformat.write(notebook, str(path))
+        paths.append(str(path))
+
+    run_batch(paths, None, TEMPLATE_DIR, jobs=1)
+    report = profiler.report()
+
+    assert report["notebooks"] == 2
+    assert report["notebook_seconds"]["p95"] > 0
+    for stage in ("load_notebook", "process_cells", "render", "save_markdown"):
+        assert report["stages"][stage]["count"] == 2
+    assert report["counters"]["outputs"] == {"stream": 2}
+    assert report["counters"]["bytes_read"] == sum(
+        os.path.getsize(p) for p in paths
+    )
+
+    profiler.write(str(tmp_path / "profile.json"))
+    assert (
+        json.loads((tmp_path / "profile.json").read_text())["notebooks"] == 2
+    )
+    profiler.write(str(tmp_path / "notebookify.prom"))
+    metrics = (tmp_path / "notebookify.prom").read_text()
+    assert 'notebookify_stage_seconds_count{stage="notebook"} 2' in metrics
+    assert 'notebookify_outputs_total{type="stream"} 2' in metrics
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import drive
+import scheduler
+from fake_drive import FakeDrive, FOLDER_MIME_TYPE
+from googleapiclient.errors import HttpError
+
+
+@pytest.fixture
+def drive_scheduler(monkeypatch):
+    instance = scheduler.DriveScheduler(rate=1000, burst=1000, base_delay=0)
+    monkeypatch.setattr(scheduler, "_scheduler", instance)
+    return instance
+
+
+@pytest.fixture
+def server():
+    with FakeDrive() as server:
+        yield server
+
+
+@pytest.fixture
+def service(server):
+    return drive.build_drive_service(api_endpoint=server.url)
+
+
+def test_rate_limited_calls_are_retried(
+    drive_scheduler, server, service, metadata_path
+):
+    root = server.add_file("root", mime_type=FOLDER_MIME_TYPE)["id"]
+    server.failures.extend([429, 403, 503])
+
+    folder_id = drive.get_or_create_drive_folder(
+        service, "docs", root, cache=drive.FolderCache()
+    )
+
+    assert server.files[folder_id]["name"] == "docs"
+    stats = drive_scheduler.stats()
+    assert stats["retries"] == 3
+    assert stats["throttled"] == 2
+    assert stats["failures"] == 0
+
+
+def test_other_errors_are_not_retried(drive_scheduler, service):
+    with pytest.raises(HttpError):
+        drive_scheduler.execute(service.files().get(fileId="missing"))
+    assert drive_scheduler.retries == 0
+    assert drive_scheduler.failures == 1
+
+
+def test_transport_errors_are_retried(drive_scheduler):
+    failures = [ConnectionResetError(), TimeoutError(), OSError("down")]
+
+    def call():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert drive_scheduler.call(call) == "ok"
+    assert drive_scheduler.retries == 3
+
+    def read_missing_file():
+        open("/nonexistent/notebook.md")
+
+    with pytest.raises(FileNotFoundError):
+        drive_scheduler.call(read_missing_file)
+    assert drive_scheduler.retries == 3
+    assert drive_scheduler.failures == 1
+
+
+def test_throttled_batch_calls_are_sent_again(
+    drive_scheduler, server, service
+):
+    root = server.add_file("root", mime_type=FOLDER_MIME_TYPE)["id"]
+    server.failures.extend([429, 429])
+
+    created = drive._create_folders_batch(
+        service, [(name, root) for name in ("a", "b", "c")]
+    )
+
+    assert sorted(server.files[i]["name"] for i in created) == ["a", "b", "c"]
+    assert server.count("POST", None) == 2 + 5  # two batches, five parts
+    assert drive_scheduler.retries == 1
+
+
+def test_concurrency_follows_the_error_rate(drive_scheduler):
+    response = type("Response", (), {"status": 429, "reason": ""})()
+    throttled = HttpError(response, json.dumps({}).encode())
+
+    drive_scheduler.observe(throttled)
+    assert drive_scheduler.limit == scheduler.DEFAULT_MAX_CONCURRENCY // 2
+
+    for _ in range(scheduler.ERROR_WINDOW):
+        drive_scheduler.observe(None)
+    assert drive_scheduler.limit == scheduler.DEFAULT_MAX_CONCURRENCY // 2 + 1
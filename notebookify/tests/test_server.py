@@ -0,0 +1,146 @@
+import http.client
+import json
+import os
+import stat
+import threading
+
+import nbformat
+import pytest
+
+import drive
+import notebookify_client
+from fake_drive import FakeDrive, FOLDER_MIME_TYPE
+from notebookify_client import parse_address
+from server import ConversionServer, bind, run
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+def _notebook(path, source="print(1)"):
+    notebook = nbformat.v4.new_notebook()
+    notebook.cells = [nbformat.v4.new_code_cell(source)]
+    nbformat.write(notebook, str(path))
+    return str(path)
+
+
+def _start(app, address):
+    thread = threading.Thread(target=run, args=(bind(app, address),))
+    thread.start()
+    return thread
+
+
+def test_parse_address():
+    assert parse_address("/tmp/n.sock") == ("unix", "/tmp/n.sock")
+    assert parse_address("unix:n.sock") == ("unix", "n.sock")
+    assert parse_address("8765") == ("tcp", ("127.0.0.1", 8765))
+    assert parse_address("localhost:90") == ("tcp", ("localhost", 90))
+    with pytest.raises(ValueError):
+        parse_address("nowhere")
+
+
+def test_client_converts_over_unix_socket(tmp_path):
+    address = str(tmp_path / "server.sock")
+    path = _notebook(tmp_path / "nb.ipynb")
+    thread = _start(ConversionServer(TEMPLATE_DIR), address)
+    try:
+        assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+        status, job = notebookify_client.convert(
+            path, address, output_dir=str(tmp_path / "out")
+        )
+        assert status == 200
+        assert job["status"] == "converted" and job["done"]
+        assert (tmp_path / "out" / "nb.md").exists()
+
+        status, job = notebookify_client.convert(
+            str(tmp_path / "missing.ipynb"), address
+        )
+        assert status == 400
+        status, _ = notebookify_client.request(
+            address, "POST", "/convert", {"notebook_path": 42}
+        )
+        assert status == 400
+
+        _, info = notebookify_client.request(address, "GET", "/status")
+        assert info["completed"] == 1 and info["queued"] == 0
+    finally:
+        notebookify_client.request(address, "POST", "/shutdown")
+        thread.join(10)
+    assert not thread.is_alive()
+    assert not os.path.exists(address)
+
+
+def test_cross_site_posts_are_refused(tmp_path):
+    path = _notebook(tmp_path / "nb.ipynb")
+    httpd = bind(ConversionServer(TEMPLATE_DIR), "127.0.0.1:0")
+    address = f"127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=run, args=(httpd,))
+    thread.start()
+    body = json.dumps({"notebook_path": path})
+    try:
+        for headers, expected in (
+            ({"Content-Type": "text/plain"}, 415),
+            ({}, 415),
+            (
+                {
+                    "Content-Type": "application/json",
+                    "Origin": "https://example.com",
+                },
+                403,
+            ),
+        ):
+            connection = http.client.HTTPConnection(*parse_address(address)[1])
+            for target in ("/convert", "/shutdown"):
+                connection.request("POST", target, body, headers)
+                response = connection.getresponse()
+                response.read()
+                assert response.status == expected
+            connection.close()
+        assert thread.is_alive()
+        assert not (tmp_path / "nb.md").exists()
+    finally:
+        notebookify_client.request(address, "POST", "/shutdown")
+        thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_jobs_for_one_output_are_serialized_and_coalesced(tmp_path):
+    path = _notebook(tmp_path / "nb.ipynb")
+    app = ConversionServer(TEMPLATE_DIR, max_queue=4)
+    release = threading.Event()
+    app._pool.submit(release.wait)
+    try:
+        first = app.submit(path)
+        second = app.submit(path)
+        assert app.submit(path) is second
+        assert second is not first
+        assert app.status()["queued"] == 2
+    finally:
+        release.set()
+    assert first.wait(30) and second.wait(30)
+    assert second.status == "converted"
+    app.close()
+
+
+def test_server_uploads_with_a_warm_drive_client(tmp_path, metadata_path):
+    (tmp_path / "repo" / ".git").mkdir(parents=True)
+    path = _notebook(tmp_path / "repo" / "nb.ipynb")
+    with FakeDrive() as fake:
+        root = fake.add_file("root", mime_type=FOLDER_MIME_TYPE)
+        drive.get_folder_cache().set("root_folder_id", root["id"])
+        app = ConversionServer(
+            TEMPLATE_DIR,
+            service_factory=lambda: drive.build_drive_service(
+                api_endpoint=fake.url
+            ),
+        )
+        try:
+            first = app.submit(path)
+            assert first.wait(30) and first.status == "uploaded", first.error
+            _notebook(path, source="print(2)")
+            second = app.submit(path)
+            assert second.wait(30) and second.status == "uploaded"
+        finally:
+            app.close()
+
+        assert second.drive_file_id == first.drive_file_id
+        assert b"print(2)" in fake.files[first.drive_file_id]["content"]
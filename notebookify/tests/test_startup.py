@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+
+import nbformat
+
+PACKAGE_DIR = os.path.join(os.path.dirname(__file__), "..")
+SRC_DIR = os.path.join(PACKAGE_DIR, "src")
+MAIN = os.path.join(SRC_DIR, "notebookify_main.py")
+# Modules only needed for uploads and Plotly snapshots.
+HEAVY_MODULES = (
+    "googleapiclient",
+    "google.auth",
+    "selenium",
+    "plotly",
+    "numpy",
+)
+# Generous, so only an accidental eager import of a heavy module trips it.
+IMPORT_BUDGET_SECONDS = 1.5
+
+RUN_AND_REPORT = """
+import json, runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+def test_no_drive_run_skips_heavy_imports(tmp_path):
+    notebook = nbformat.v4.new_notebook()
+    notebook.cells = [
+        nbformat.v4.new_code_cell(
+            "print(1)", outputs=[nbformat.v4.new_output("stream", text="1\n")]
+        )
+    ]
+    path = tmp_path / "small.ipynb"
+    nbformat.write(notebook, str(path))
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            RUN_AND_REPORT,
+            MAIN,
+            str(path),
+            "--no-drive",
+            "--no-cache",
+            "-o",
+            str(tmp_path / "out"),
+            "-t",
+            os.path.join(PACKAGE_DIR, "templates"),
+        ],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+    assert (tmp_path / "out" / "small.md").exists(), result.stdout
+    modules = json.loads(result.stderr.strip().splitlines()[-1])
+    loaded = [
+        name
+        for name in modules
+        for heavy in HEAVY_MODULES
+        if name == heavy or name.startswith(heavy + ".")
+    ]
+    assert not loaded
+
+
+def test_cli_imports_within_budget():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import time; started = time.perf_counter(); "
+            "import notebookify_main; "
+            "print(time.perf_counter() - started)",
+        ],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert float(result.stdout) < IMPORT_BUDGET_SECONDS
+
+
+def test_help_is_shown_when_quiet():
+    result = subprocess.run(
+        [sys.executable, MAIN, "-q", "--help"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "--batch" in result.stdout
@@ -0,0 +1,180 @@
+import json
+import os
+
+import pytest
+
+import drive
+from batch import run_batch
+from fake_drive import FakeDrive, FOLDER_MIME_TYPE
+from uploader import UploadPipeline
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+
+@pytest.fixture
+def server():
+    with FakeDrive() as server:
+        yield server
+
+
+@pytest.fixture
+def repo(tmp_path, metadata_path, server):
+    """A repository whose Drive root folder exists on the fake server."""
+    (tmp_path / "repo" / ".git").mkdir(parents=True)
+    root = server.add_file("root", mime_type=FOLDER_MIME_TYPE)
+    metadata_path.write_text(json.dumps({"root_folder_id": root["id"]}))
+    return tmp_path / "repo"
+
+
+def _factory(server):
+    return lambda: drive.build_drive_service(api_endpoint=server.url)
+
+
+def test_pipeline_uploads_concurrently_and_chunks_large_files(
+    repo, server, monkeypatch
+):
+    monkeypatch.setattr(drive, "RESUMABLE_THRESHOLD", 512 * 1024)
+    monkeypatch.setattr(drive, "UPLOAD_CHUNK_SIZE", 256 * 1024)
+    (repo / "docs").mkdir()
+    paths = []
+    for i in range(6):
+        path = repo / "docs" / f"note{i}.md"
+        path.write_text(f"# Note {i}\n")
+        paths.append(str(path))
+    large = repo / "docs" / "large.md"
+    large.write_bytes(b"x" * (600 * 1024))
+    paths.append(str(large))
+
+    with UploadPipeline(_factory(server), workers=3) as uploads:
+        uploads.prepare(paths, sync_folders=True)
+        futures = [uploads.submit(path) for path in paths]
+        file_ids = [f.result() for f in futures]
+
+    docs = [f for f in server.files.values() if f["name"] == "docs"]
+    assert len(docs) == 1
+    for path, file_id in zip(paths, file_ids):
+        uploaded = server.files[file_id]
+        assert uploaded["parents"] == [docs[0]["id"]]
+        with open(path, "rb") as f:
+            assert uploaded["content"] == f.read()
+    assert server.count("POST", "multipart") == 6
+    assert server.count("POST", "resumable") == 1
+    # 600 KB in 256 KB chunks.
+    assert server.count("PUT") == 3
+    assert uploads.uploaded == 7
+    assert len(uploads._services) <= 3
+
+
+def test_concurrent_uploads_create_each_folder_once(repo, server):
+    (repo / "docs" / "sub").mkdir(parents=True)
+    paths = []
+    for i in range(12):
+        path = repo / "docs" / "sub" / f"note{i}.md"
+        path.write_text(f"# Note {i}\n")
+        paths.append(str(path))
+
+    with UploadPipeline(_factory(server), workers=4) as uploads:
+        uploads.prepare(paths)
+        futures = [uploads.submit(path) for path in paths]
+        for future in futures:
+            future.result()
+
+    names = [
+        f["name"]
+        for f in server.files.values()
+        if f.get("mimeType") == FOLDER_MIME_TYPE
+    ]
+    assert sorted(names) == ["docs", "root", "sub"]
+
+
+def test_stale_folder_ids_are_validated_in_one_batch(repo, server):
+    cache = drive.get_folder_cache(ttl=0)
+    root_id = cache.get("root_folder_id")
+    kept = server.add_file("kept", [root_id], FOLDER_MIME_TYPE)["id"]
+    cache.set(f"{root_id}/kept", kept)
+    cache.set(f"{root_id}/gone", "deleted-id")
+    paths = [str(repo / "kept" / "a.md"), str(repo / "gone" / "b.md")]
+
+    checked = drive.validate_folder_ids(
+        drive.build_drive_service(api_endpoint=server.url), paths
+    )
+
+    assert checked == 2
+    assert server.count("POST") == 1  # the batch request
+    assert cache.get(f"{root_id}/kept") == kept
+    assert cache.get(f"{root_id}/gone") is None
+
+
+def test_run_batch_uploads_through_the_pipeline(repo, server):
+    notebook = repo / "nb.ipynb"
+    notebook.write_text(
+        json.dumps(
+            {
+                "cells": [
+                    {
+                        "cell_type": "markdown",
+                        "metadata": {},
+                        "source": "# Hello",
+                    }
+                ],
+                "metadata": {},
+                "nbformat": 4,
+                "nbformat_minor": 4,
+            }
+        )
+    )
+
+    summary = run_batch(
+        [str(notebook)],
+        None,
+        TEMPLATE_DIR,
+        jobs=1,
+        service_factory=_factory(server),
+        upload_workers=2,
+    )
+
+    (result,) = summary.results
+    assert result.status == "uploaded", result.error
+    assert server.files[result.drive_file_id]["name"] == "nb.md"
+
+
+def test_uploads_update_in_place_and_skip_unchanged_files(repo, server):
+    path = repo / "nb.md"
+    path.write_text("first")
+    service = drive.build_drive_service(api_endpoint=server.url)
+
+    file_id, action = drive.upsert_to_google_drive(service, str(path))
+    assert action == drive.UPLOAD_CREATED
+
+    requests = len(server.requests)
+    assert drive.upsert_to_google_drive(service, str(path)) == (
+        file_id,
+        drive.UPLOAD_UNCHANGED,
+    )
+    assert len(server.requests) == requests
+
+    path.write_text("second")
+    assert drive.upsert_to_google_drive(service, str(path)) == (
+        file_id,
+        drive.UPLOAD_UPDATED,
+    )
+    assert server.count("PATCH", "media") == 1
+    assert server.files[file_id]["content"] == b"second"
+    assert [f["name"] for f in server.files.values()].count("nb.md") == 1
+
+
+def test_files_deleted_on_drive_are_uploaded_again(repo, server):
+    path = repo / "nb.md"
+    path.write_text("content")
+    service = drive.build_drive_service(api_endpoint=server.url)
+    file_id = drive.upload_to_google_drive(service, str(path))
+    del server.files[file_id]
+
+    # The stored checksum still matches, so only a refresh notices.
+    new_id, action = drive.upsert_to_google_drive(
+        service, str(path), refresh=True
+    )
+
+    assert action == drive.UPLOAD_CREATED
+    assert new_id != file_id
+    assert drive.get_file_record(str(path))["id"] == new_id
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+from watcher import NotebookWatcher
+
+BACKENDS = ["poll"]
+if sys.platform.startswith("linux"):
+    BACKENDS.append("inotify")
+
+
+@pytest.fixture(params=BACKENDS)
+def watcher(request, tmp_path):
+    (tmp_path / "docs").mkdir()
+    watcher = NotebookWatcher(
+        str(tmp_path),
+        debounce=0.2,
+        poll=request.param == "poll",
+        interval=0.05,
+    )
+    assert watcher.backend == request.param
+    yield watcher
+    watcher.close()
+
+
+def test_reports_saved_notebooks_once_per_burst(watcher, tmp_path):
+    path = tmp_path / "docs" / "nb.ipynb"
+    for i in range(3):
+        path.write_text(f"{{{i}}}")
+    (tmp_path / "docs" / "notes.txt").write_text("ignored")
+
+    assert watcher.next_batch(timeout=5) == [str(path)]
+    assert watcher.next_batch(timeout=0.3) == []
+
+
+def test_ignores_checkpoints_and_hidden_files(watcher, tmp_path):
+    checkpoints = tmp_path / "docs" / ".ipynb_checkpoints"
+    checkpoints.mkdir()
+    (checkpoints / "nb-checkpoint.ipynb").write_text("{}")
+    (tmp_path / "docs" / ".~nb.ipynb").write_text("{}")
+
+    assert watcher.next_batch(timeout=0.5) == []
+
+
+def test_follows_atomic_saves_and_new_folders(watcher, tmp_path):
+    tmp = tmp_path / "docs" / "draft.tmp"
+    tmp.write_text("{}")
+    os.replace(tmp, tmp_path / "docs" / "saved.ipynb")
+    new = tmp_path / "new" / "deeper"
+    new.mkdir(parents=True)
+    (new / "fresh.ipynb").write_text("{}")
+
+    expected = {
+        str(tmp_path / "docs" / "saved.ipynb"),
+        str(new / "fresh.ipynb"),
+    }
+    changed = set()
+    for _ in range(3):
+        changed.update(watcher.next_batch(timeout=2))
+        if changed >= expected:
+            break
+    assert changed == expected